@@ -0,0 +1,235 @@
+"""
+API_KEYS.PY - CHAVES DE API PARA DISPOSITIVOS
+=============================================
+Chaves de longa duração e com âmbito limitado para clientes máquina
+(quiosques do salão, painel do profissional em modo de ecrã).
+
+- A chave só é mostrada uma vez; guarda-se apenas HMAC-SHA256(SECRET_KEY, chave)
+- A verificação é um HMAC + lookup num dicionário em memória, mais a
+  leitura do dono no índice de utilizadores do db (O(1); o arquivo
+  users.json só é relido quando muda): sem bcrypt e sem JWT
+- O âmbito (scopes) é uma máscara de Permission, limitada às permissões
+  da role atual do dono da chave; dono inexistente ou inativo invalida a chave
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Annotated, Dict, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
+
+from .auth import SECRET_KEY, get_current_user
+from .database import db
+from .models import User
+from .permissions import Permission, compile_mask, role_mask
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+API_KEY_PREFIX = "salao"
+API_KEY_HEADER = "X-API-Key"
+
+api_key_header = APIKeyHeader(name=API_KEY_HEADER, auto_error=False)
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
+
+
+def hash_api_key(plain_key: str) -> str:
+    """Verificador rápido da chave (HMAC-SHA256 com a chave do servidor)"""
+    return hmac.new(SECRET_KEY.encode(), plain_key.encode(), hashlib.sha256).hexdigest()
+
+
+def parse_scopes(scopes: List[str]) -> int:
+    """Converte nomes de permissões (ex: "VIEW_PROFESSIONAL_AGENDA") numa máscara"""
+    try:
+        return compile_mask(Permission[name.upper()] for name in scopes)
+    except KeyError as e:
+        raise ValueError(f"Scope desconhecido: {e.args[0]}")
+
+
+# ====================================================================
+# REGISTO DE CHAVES
+# ====================================================================
+
+class ApiKeyRegistry:
+    """
+    Índice em memória das chaves não revogadas: hash -> (registo, máscara).
+
+    É carregado uma vez do arquivo api_keys.json e atualizado pelas
+    operações de criação/revogação. O dono não fica em cache: é lido a
+    cada verificação do índice de utilizadores do db (O(1)), para que uma
+    mudança de role ou a desativação do dono valham de imediato.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_hash: Optional[Dict[str, Tuple[Dict, int]]] = None
+
+    def _load(self) -> Dict[str, Tuple[Dict, int]]:
+        return {
+            record["key_hash"]: (record, record.get("scope_mask", 0))
+            for record in db._read_file("api_keys")
+            if not record.get("revoked_at")
+        }
+
+    @staticmethod
+    def _owner(record: Dict) -> Optional[User]:
+        """User atual do dono da chave (None se não existir ou estiver inativo)"""
+        owner = db.get_user_by_id(record.get("user_id", ""))
+        if not owner or not owner.get("is_active", True):
+            return None
+
+        owner = {k: v for k, v in owner.items() if k not in ("senha", "hashed_password")}
+        return User(**owner)
+
+    def _index(self) -> Dict[str, Tuple[Dict, int]]:
+        if self._by_hash is None:
+            with self._lock:
+                if self._by_hash is None:
+                    self._by_hash = self._load()
+        return self._by_hash
+
+    def reload(self):
+        """Descarta o índice (ex: após alterar api_keys.json manualmente)"""
+        with self._lock:
+            self._by_hash = None
+
+    def create_key(self, nome: str, user_id: str, scopes: List[str],
+                   expires_in_days: Optional[int] = None) -> Tuple[str, Dict]:
+        """
+        Cria uma chave nova.
+
+        Returns:
+            (chave em texto simples - mostrar uma única vez, registo guardado)
+        """
+        key_id = uuid.uuid4().hex[:8]
+        plain_key = f"{API_KEY_PREFIX}_{key_id}_{secrets.token_urlsafe(32)}"
+
+        record = {
+            "id": key_id,
+            "nome": nome,
+            "user_id": user_id,
+            "scopes": [s.upper() for s in scopes],
+            "scope_mask": parse_scopes(scopes),
+            "key_hash": hash_api_key(plain_key),
+            "created_at": datetime.now().isoformat(),
+            "expires_at": (
+                (datetime.now() + timedelta(days=expires_in_days)).isoformat()
+                if expires_in_days else None
+            ),
+            "revoked_at": None,
+        }
+
+        if self._owner(record) is None:
+            raise ValueError("Utilizador dono da chave não encontrado ou inativo")
+
+        index = self._index()
+        with self._lock:
+            records = db._read_file("api_keys")
+            records.append(record)
+            db._write_file("api_keys", records)
+            index[record["key_hash"]] = (record, record["scope_mask"])
+
+        return plain_key, record
+
+    def revoke(self, key_id: str) -> Optional[Dict]:
+        """Revoga uma chave pelo id"""
+        index = self._index()
+        with self._lock:
+            records = db._read_file("api_keys")
+            revoked = None
+            for record in records:
+                if record.get("id") == key_id and not record.get("revoked_at"):
+                    record["revoked_at"] = datetime.now().isoformat()
+                    revoked = record
+                    break
+
+            if revoked:
+                db._write_file("api_keys", records)
+                index.pop(revoked["key_hash"], None)
+            return revoked
+
+    def list_keys(self) -> List[Dict]:
+        """Lista as chaves (sem o hash)"""
+        return [
+            {k: v for k, v in record.items() if k != "key_hash"}
+            for record in db._read_file("api_keys")
+        ]
+
+    def verify(self, plain_key: str) -> Optional[Tuple[User, int]]:
+        """Devolve (User do dono, máscara efetiva) ou None se a chave for inválida"""
+        entry = self._index().get(hash_api_key(plain_key))
+        if entry is None:
+            return None
+
+        record, scope_mask = entry
+        expires_at = record.get("expires_at")
+        if expires_at:
+            try:
+                expires = datetime.fromisoformat(expires_at)
+            except ValueError:
+                return None
+            if expires <= datetime.now(expires.tzinfo):
+                return None
+
+        user = self._owner(record)
+        if user is None:
+            return None
+
+        return user, scope_mask & role_mask(user.role)
+
+
+# Instância global
+api_key_registry = ApiKeyRegistry()
+
+
+# ====================================================================
+# DEPENDÊNCIAS
+# ====================================================================
+
+def require_scopes(*permissions: Permission, detail: str = "Acesso negado"):
+    """
+    Como require_permissions, mas aceita também X-API-Key.
+
+    Indicado para endpoints de leitura consultados em polling por
+    quiosques e painéis: com chave de API o pedido não decodifica JWT;
+    o dono é lido do índice de utilizadores em memória.
+    """
+    required = compile_mask(permissions)
+
+    async def dependency(
+        api_key: Annotated[Optional[str], Depends(api_key_header)],
+        token: Annotated[Optional[str], Depends(optional_oauth2_scheme)],
+    ) -> User:
+        if api_key:
+            principal = api_key_registry.verify(api_key)
+            if principal is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Chave de API inválida ou expirada",
+                )
+            user, mask = principal
+        elif token:
+            user = await get_current_user(token)
+            mask = role_mask(user.role)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Não foi possível validar as credenciais",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        if mask & required != required:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=detail
+            )
+        return user
+
+    return dependency
@@ -0,0 +1,156 @@
+"""
+APPOINTMENT_EVENTS.PY - EVENTOS DA AGENDA EM TEMPO REAL
+=======================================================
+Pub/sub em processo para o stream SSE (/appointments/stream).
+
+- Cada mutação de appointments (listener do db) vira um evento
+  "created" / "confirmed" / "cancelled" / "completed" / "updated",
+  difundido uma vez a todos os subscritores
+- Cada cliente tem uma fila limitada no seu event loop; se um cliente
+  lento a enche, os eventos pendentes são trocados por um único "resync"
+  (deve recarregar a agenda) em vez de fazer crescer a memória do servidor
+- Filtros por profissional e/ou dia aplicados na difusão
+- O stream só envia os campos de agenda (STREAM_FIELDS): questionário
+  médico, notas e ids de clientes ficam de fora
+"""
+
+import asyncio
+import itertools
+import threading
+from typing import Dict, List, Optional
+
+from .appointment_service import normalize_appointment
+from .database import db
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+EVENT_BY_STATUS = {
+    "confirmado": "confirmed",
+    "cancelado": "cancelled",
+    "concluido": "completed",
+    "faltou": "no_show",
+}
+
+
+# Campos enviados no stream (o resto do registo não sai do servidor)
+STREAM_FIELDS = (
+    "id", "profissional_id", "data_hora", "data_hora_ts", "status",
+    "servico", "servicos", "total_duration", "overbooked",
+)
+
+
+def stream_view(appointment: Optional[Dict]) -> Optional[Dict]:
+    """Cópia do registo só com STREAM_FIELDS (None para eventos "resync")"""
+    if appointment is None:
+        return None
+    return {k: appointment[k] for k in STREAM_FIELDS if k in appointment}
+
+
+def event_type(action: str, appointment: Dict) -> str:
+    """Tipo do evento a partir da ação do db e do novo status"""
+    if action == "created":
+        return "created"
+    return EVENT_BY_STATUS.get(appointment.get("status"), "updated")
+
+
+# ====================================================================
+# SUBSCRITOR
+# ====================================================================
+
+class Subscription:
+    """Fila limitada de um cliente, ligada ao event loop que a consome"""
+
+    def __init__(self, professional_id: Optional[str] = None, day: Optional[str] = None,
+                 max_queue: int = SUBSCRIBER_QUEUE_SIZE):
+        self.professional_id = str(professional_id) if professional_id else None
+        self.day = day
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def matches(self, event: Dict) -> bool:
+        appointment = event["appointment"]
+        if self.professional_id and str(appointment.get("profissional_id")) != self.professional_id:
+            return False
+        if self.day and not (appointment.get("data_hora") or "").startswith(self.day):
+            return False
+        return True
+
+    def _offer(self, event: Dict):
+        """Corre no loop do cliente; fila cheia vira um único "resync" """
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.dropped += 1
+            self.queue.put_nowait({"id": event["id"], "type": "resync", "appointment": None})
+            return
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: Dict):
+        """Entrega thread-safe (as escritas podem vir do threadpool)"""
+        try:
+            self.loop.call_soon_threadsafe(self._offer, event)
+        except RuntimeError:
+            # Loop já fechado: o cliente desligou-se
+            pass
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+# ====================================================================
+# DIFUSÃO
+# ====================================================================
+
+class AppointmentEventBroker:
+    """Difunde as mutações de agendamentos aos streams abertos"""
+
+    def __init__(self, database=db):
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._sequence = itertools.count(1)
+        database.add_listener("appointments", self._on_change)
+
+    def subscribe(self, professional_id: Optional[str] = None, day: Optional[str] = None) -> Subscription:
+        subscription = Subscription(professional_id, day)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, action: str, appointment: Dict):
+        appointment = normalize_appointment(appointment)
+        event = {
+            "id": next(self._sequence),
+            "type": event_type(action, appointment),
+            "appointment": appointment,
+        }
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.matches(event):
+                subscription.deliver(event)
+
+    def _on_change(self, action: str, appointment: Dict):
+        if self._subscribers:
+            self.publish(action, appointment)
+
+
+# Instância global
+appointment_events = AppointmentEventBroker()
@@ -0,0 +1,548 @@
+"""
+APPOINTMENT_SERVICE.PY - SERVIÇO ÚNICO DE AGENDAMENTOS
+======================================================
+Ponto único de leitura e escrita de agendamentos, usado por todos os
+routers (appointments, routes/appointments, appointments_enhanced) e
+pelo controller.
+
+- Cache de appointments.json em memória com índices por id, cliente e
+  profissional, atualizada pelas mutações do db e recarregada se o arquivo
+  mudar por outro caminho
+- Os índices são listas ordenadas por (data_hora_ts, id), com o instante
+  em epoch UTC (salon_time): listagens com paginação por cursor (keyset)
+  custam um bisect + `limit` registos e comparam só inteiros
+- Escritas validadas contra o horário (schedule_templates) e a agenda
+  (availability_index) com o lock/versão por profissional de booking_holds,
+  tanto na criação como no reagendamento (update de data_hora, profissional
+  ou duração);
+  com overbook=True a política de no_show deixa partilhar horários de
+  agendamentos com alta probabilidade de falta
+- Formato único dos registos, o do modelo Appointment: cliente_id,
+  profissional_id, data_hora, servicos e status de AppointmentStatus;
+  registos antigos (usuario_id, "agendado", "scheduled", só
+  services_details) são normalizados na leitura
+- Mudanças de status validadas pela máquina de estados (appointment_states)
+  e registadas na auditoria
+"""
+
+import base64
+import json
+import threading
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from .assignment import AssignmentEngine, assignment_engine
+from .availability import CANCELLED_STATUSES, AvailabilityIndex, appointment_duration, availability_index
+from .availability_cache import AvailabilityCache, availability_cache
+from .booking_holds import SlotHoldRegistry, slot_holds
+from .appointment_states import (
+    STATUS_ALIASES, TRANSITIONS, AppointmentStateMachine, appointment_states, normalize_status
+)
+from .database import db
+from .no_show import OverbookingPolicy, overbooking_policy
+from .salon_time import appointment_epoch, day_bounds, local_naive, now_epoch, stamp_appointment
+from .schedule_templates import ScheduleTemplates, schedule_templates
+from .slot_calendar import QUANTUM_MINUTES, free_starts, grid_mask, minutes_to_quantum, time_mask
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+# Paginação das listagens
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Limites de Servico.duracao_estimada (a duração real fica em total_duration)
+MIN_SERVICE_MINUTES = 15
+MAX_SERVICE_MINUTES = 480
+
+# Campos que mudam o horário ocupado: alterá-los é um reagendamento
+SCHEDULE_FIELDS = frozenset({
+    "data_hora", "data_hora_ts", "profissional_id", "total_duration", "servicos", "services_details"
+})
+
+
+class OutsideOpeningHoursError(Exception):
+    """O serviço começa ou termina fora do horário do profissional"""
+    pass
+
+
+def normalize_appointment(appointment: Dict) -> Dict:
+    """Cópia do registo com os nomes de campos e estados unificados"""
+    normalized = dict(appointment)
+    normalized["cliente_id"] = normalized.get("cliente_id") or normalized.get("usuario_id") or ""
+    status = normalized.get("status")
+    normalized["status"] = STATUS_ALIASES.get(status, status)
+    if normalized.get("data_hora_ts") is None:
+        stamp_appointment(normalized)
+
+    if not normalized.get("servicos"):
+        details = normalized.get("services_details") or []
+        if not details and normalized.get("servico"):
+            details = [{"name": normalized["servico"], "duration": appointment_duration(normalized)}]
+        normalized["servicos"] = [
+            {
+                "tipo": s.get("name", ""),
+                "duracao_estimada": min(MAX_SERVICE_MINUTES, max(MIN_SERVICE_MINUTES, int(s.get("duration") or 0))),
+                "preco": s.get("price"),
+                "requer_teste_mecha": bool(s.get("requiresTest", False)),
+            }
+            for s in details
+        ]
+    return normalized
+
+
+SortKey = Tuple[int, str]
+
+
+def sort_key(appointment: Dict) -> SortKey:
+    """Chave de ordenação e de cursor: (data_hora_ts, id)"""
+    return appointment_epoch(appointment) or 0, str(appointment.get("id"))
+
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    """
+    Raises:
+        ValueError: cursor inválido
+    """
+    try:
+        ts, appointment_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return int(ts), str(appointment_id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+# ====================================================================
+# SERVIÇO
+# ====================================================================
+
+class AppointmentService:
+    """Agendamentos com cache partilhada e índices por cliente/profissional"""
+
+    def __init__(self, database=db, index: AvailabilityIndex = availability_index,
+                 templates: ScheduleTemplates = schedule_templates,
+                 holds: SlotHoldRegistry = slot_holds,
+                 engine: AssignmentEngine = assignment_engine,
+                 cache: AvailabilityCache = availability_cache,
+                 overbooking: OverbookingPolicy = overbooking_policy,
+                 states: AppointmentStateMachine = appointment_states):
+        self.db = database
+        self.index = index
+        self.templates = templates
+        self.holds = holds
+        self.engine = engine
+        self.cache = cache
+        self.overbooking = overbooking
+        self.states = states
+
+        self._lock = threading.RLock()
+        self._by_id: Dict[str, Dict] = {}
+        self._sorted: List[SortKey] = []
+        self._by_client: Dict[str, List[SortKey]] = {}
+        self._by_professional: Dict[str, List[SortKey]] = {}
+        self._stamp = None
+        self._loaded = False
+
+        database.add_listener("appointments", self._on_change)
+
+    # ----- cache -----
+
+    def _rebuild(self):
+        self._by_id = {}
+        for appointment in self.db._read_file("appointments"):
+            appointment = normalize_appointment(appointment)
+            if appointment.get("id"):
+                self._by_id[appointment["id"]] = appointment
+
+        # Ordenação feita uma vez; depois só insort/remoção por bisect
+        self._sorted = sorted(sort_key(a) for a in self._by_id.values())
+        self._by_client = {}
+        self._by_professional = {}
+        for key in self._sorted:
+            appointment = self._by_id[key[1]]
+            if appointment.get("cliente_id"):
+                self._by_client.setdefault(appointment["cliente_id"], []).append(key)
+            if appointment.get("profissional_id"):
+                self._by_professional.setdefault(str(appointment["profissional_id"]), []).append(key)
+
+        self._stamp = self.db._file_stamp("appointments")
+        self._loaded = True
+
+    def _ensure_fresh(self):
+        with self._lock:
+            if not self._loaded or self.db._file_stamp("appointments") != self._stamp:
+                self._rebuild()
+
+    @staticmethod
+    def _remove_key(keys: Optional[List[SortKey]], key: SortKey):
+        if keys is None:
+            return
+        idx = bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            del keys[idx]
+
+    def _put(self, appointment: Dict):
+        appointment_id = appointment.get("id")
+        if not appointment_id:
+            return
+        self._drop(appointment_id)
+        self._by_id[appointment_id] = appointment
+        key = sort_key(appointment)
+        insort(self._sorted, key)
+        if appointment.get("cliente_id"):
+            insort(self._by_client.setdefault(appointment["cliente_id"], []), key)
+        if appointment.get("profissional_id"):
+            insort(self._by_professional.setdefault(str(appointment["profissional_id"]), []), key)
+
+    def _drop(self, appointment_id: str):
+        old = self._by_id.pop(appointment_id, None)
+        if not old:
+            return
+        key = sort_key(old)
+        self._remove_key(self._sorted, key)
+        self._remove_key(self._by_client.get(old.get("cliente_id")), key)
+        self._remove_key(self._by_professional.get(str(old.get("profissional_id"))), key)
+
+    def _on_change(self, action: str, appointment: Dict):
+        with self._lock:
+            if not self._loaded:
+                return
+            # Ocorrências recorrentes não vivem no arquivo
+            if appointment.get("recurring"):
+                return
+            self._put(normalize_appointment(appointment))
+            self._stamp = self.db._file_stamp("appointments")
+
+    def _keys(self, client_id: Optional[str], professional_id: Optional[str]) -> List[SortKey]:
+        if client_id:
+            keys = self._by_client.get(client_id, [])
+            if professional_id:
+                return [k for k in keys if str(self._by_id[k[1]].get("profissional_id")) == str(professional_id)]
+            return keys
+        if professional_id:
+            return self._by_professional.get(str(professional_id), [])
+        return self._sorted
+
+    # ----- leitura -----
+
+    def get(self, appointment_id: str) -> Optional[Dict]:
+        self._ensure_fresh()
+        appointment = self._by_id.get(appointment_id)
+        return dict(appointment) if appointment else None
+
+    def list_all(self, status: Optional[str] = None) -> List[Dict]:
+        return self.page(status=status, limit=None)[0]
+
+    def list_for_client(self, client_id: str, status: Optional[str] = None) -> List[Dict]:
+        return self.page(client_id=client_id, status=status, limit=None)[0]
+
+    def list_for_professional(self, professional_id: str, day: Optional[str] = None,
+                              status: Optional[str] = None) -> List[Dict]:
+        return self.page(professional_id=professional_id, status=status,
+                         first_day=day, last_day=day, limit=None)[0]
+
+    def page(self, client_id: Optional[str] = None, professional_id: Optional[str] = None,
+             status: Optional[str] = None, first_day: Optional[str] = None,
+             last_day: Optional[str] = None, cursor: Optional[str] = None,
+             limit: Optional[int] = DEFAULT_PAGE_SIZE) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Página por ordem de (data_hora_ts, id), a seguir ao cursor.
+
+        first_day/last_day (YYYY-MM-DD, dias locais do salão, inclusive)
+        limitam a data;
+        limit=None devolve tudo. O custo é um bisect mais os registos
+        percorridos, independente do tamanho do histórico (exceto com
+        filtro de status muito seletivo).
+
+        Returns:
+            (agendamentos, cursor da página seguinte ou None)
+
+        Raises:
+            ValueError: cursor inválido
+        """
+        after = decode_cursor(cursor) if cursor else None
+        self._ensure_fresh()
+        items: List[Dict] = []
+        next_cursor = None
+
+        lower = day_bounds(first_day)[0] if first_day else 0
+        upper = day_bounds(last_day)[1] if last_day else None
+
+        with self._lock:
+            keys = self._keys(client_id, professional_id)
+            start = bisect_left(keys, (lower, ""))
+            if after:
+                start = max(start, bisect_right(keys, after))
+
+            for idx in range(start, len(keys)):
+                key = keys[idx]
+                if upper is not None and key[0] >= upper:
+                    break
+                appointment = self._by_id[key[1]]
+                if status and appointment.get("status") != status:
+                    continue
+                if limit is not None and len(items) == limit:
+                    next_cursor = encode_cursor(sort_key(items[-1]))
+                    break
+                items.append(dict(appointment))
+
+        return items, next_cursor
+
+    def count_by_status(self, day: Optional[str] = None) -> Dict[str, int]:
+        """Contagens por status (e dia local), O(1) por estado (appointment_states)"""
+        if day:
+            counts = {status: self.states.count(status, day) for status in TRANSITIONS}
+            return {status: n for status, n in counts.items() if n}
+        return self.states.counts()
+
+    # ----- disponibilidade -----
+
+    def find_conflict(self, professional_id: str, start: datetime, duration: int) -> Optional[str]:
+        return self.index.find_conflict(professional_id, start, duration)
+
+    def check_opening_hours(self, professional_id: str, start: datetime, duration: int):
+        """
+        Raises:
+            OutsideOpeningHoursError: se o serviço sair do horário do profissional
+        """
+        if time_mask(start, duration) & ~self.templates.open_mask(professional_id, start.date()):
+            raise OutsideOpeningHoursError("Horário fora do período de atendimento do profissional")
+
+    def available_starts(self, day: date, professional_ids: List[str], duration: int,
+                         step_minutes: int) -> Tuple[int, int]:
+        """
+        (inícios livres, inícios dentro do horário) em bitset, para a
+        união dos profissionais indicados (cache por profissional-dia).
+        """
+        opening = 0
+        available = 0
+        for professional_id in professional_ids:
+            free, open_starts = self.cache.starts(professional_id, day, duration, step_minutes)
+            available |= free
+            opening |= open_starts
+        return available, opening
+
+    def overbooking_starts(self, day: date, professional_ids: List[str], duration: int,
+                           step_minutes: int) -> int:
+        """
+        Inícios (bitset) que só cabem partilhando um agendamento com alta
+        probabilidade de falta (0 com a política de overbooking desligada).
+        """
+        if not self.overbooking.enabled:
+            return 0
+        day_iso = day.isoformat()
+        grid = grid_mask(step_minutes)
+        extra = 0
+        for professional_id in professional_ids:
+            soft = self.overbooking.soft_mask(professional_id, day_iso)
+            if not soft:
+                continue
+            busy = self.index.busy_mask(professional_id, day_iso)
+            open_mask = self.templates.open_mask(professional_id, day)
+            extra |= free_starts(busy & ~soft, open_mask, duration, grid)
+        available, _ = self.available_starts(day, professional_ids, duration, step_minutes)
+        return extra & ~available
+
+    def overbooking_professional(self, servicos: List[str], start: datetime, duration: int) -> Optional[str]:
+        """Primeiro profissional que aceita o horário em overbooking"""
+        quantum = minutes_to_quantum(start.hour * 60 + start.minute)
+        for professional_id in self.candidate_professionals(servicos):
+            mask = self.overbooking_starts(start.date(), [professional_id], duration, QUANTUM_MINUTES)
+            if (mask >> quantum) & 1:
+                return professional_id
+        return None
+
+    def candidate_professionals(self, servicos: List[str]) -> List[str]:
+        """Profissionais que fazem os serviços (toda a equipa se nenhum corresponder)"""
+        candidatos = self.engine.candidates(servicos) or self.engine.candidates([])
+        return [str(p["id"]) for p in candidatos]
+
+    def assign_professional(self, servicos: List[str], start: datetime, duration: int) -> Optional[str]:
+        return self.engine.assign(servicos, start, duration)
+
+    # ----- escrita -----
+
+    @staticmethod
+    def build_from_booking(booking: Dict, booking_code: Optional[str], professional_id: str,
+                           start: datetime, notes: Optional[str], client_id: Optional[str],
+                           appointment_id: Optional[str] = None) -> Dict:
+        """Registo a partir de um booking preparado (/prepare)"""
+        return {
+            "id": appointment_id or str(uuid.uuid4()),
+            "cliente_id": client_id,
+            "profissional_id": professional_id,
+            "servico": ", ".join([s["name"] for s in booking.get("services", [])]),
+            "data_hora": start.isoformat(),
+            "status": "confirmado",
+            # Dados adicionais
+            "booking_code": booking_code,
+            "services_details": booking.get("services", []),
+            "total_price": booking.get("total_price", 0),
+            "total_duration": booking.get("total_duration", 0),
+            "medical_questionnaire": booking.get("medical_questionnaire"),
+            "notes": notes,
+            "requires_test": booking.get("requires_test", False)
+        }
+
+    def _prepare_record(self, appointment: Dict) -> Dict:
+        record = normalize_appointment(appointment)
+        record.setdefault("id", str(uuid.uuid4()))
+        if not record.get("created_at"):
+            # Instante da escrita (created_at é hora do servidor, sem fuso)
+            record["created_at"] = datetime.now().isoformat()
+            record["created_at_ts"] = now_epoch()
+        stamp_appointment(record)
+        record["status"] = record.get("status") or "pendente"
+        return record
+
+    def _persist(self, records: List[Dict]):
+        """Uma única escrita (append) para todos os registos; avisa os observadores"""
+        self.db.create_appointments(records)
+        self.states.record_created(records)
+
+    def create(self, appointment: Dict, hold_id: Optional[str] = None,
+               overbook: bool = False) -> Dict:
+        """
+        Cria um agendamento se o horário estiver livre.
+
+        overbook: aceita partilhar o horário com um agendamento que
+        provavelmente vai falhar (OverbookingPolicy); o registo fica com
+        overbooked=True se de facto se sobrepuser a outro.
+
+        Raises:
+            OutsideOpeningHoursError, SlotUnavailableError, HoldNotFoundError
+        """
+        record = self._prepare_record(appointment)
+        professional_id = str(record["profissional_id"])
+        start = local_naive(record["data_hora_ts"])
+        duration = appointment_duration(record)
+
+        self.check_opening_hours(professional_id, start, duration)
+        soft_mask = self.overbooking.soft_mask(professional_id, start.date().isoformat()) if overbook else 0
+
+        def persist():
+            if soft_mask and self.index.find_conflict(professional_id, start, duration):
+                record["overbooked"] = True
+            self._persist([record])
+
+        self.holds.commit(professional_id, start, duration, persist, hold_id=hold_id, soft_mask=soft_mask)
+        return dict(record)
+
+    def create_many(self, appointments: List[Dict]) -> List[Dict]:
+        """
+        Grava registos já validados (ex: lote planeado sob slot_holds.locked)
+        numa única escrita.
+        """
+        records = [self._prepare_record(a) for a in appointments]
+        if records:
+            self._persist(records)
+        return [dict(r) for r in records]
+
+    def update(self, appointment_id: str, fields: Dict, actor: Optional[str] = None) -> Optional[Dict]:
+        """
+        Atualiza campos do agendamento. Mudanças de data_hora, profissional
+        ou duração passam pela mesma validação da criação (horário do
+        profissional, conflitos, reservas, versão do calendário).
+
+        Raises:
+            InvalidTransitionError: se fields mudar o status para um estado não permitido
+            OutsideOpeningHoursError, SlotUnavailableError: reagendamento recusado
+        """
+        fields = dict(fields)
+        status = fields.pop("status", None)
+        updated = None
+        if SCHEDULE_FIELDS & fields.keys():
+            updated = self._reschedule(appointment_id, fields)
+            if not updated:
+                return None
+            fields = {}
+        if status is not None:
+            return self._transition(
+                appointment_id, status,
+                lambda status: self.db.update_appointment(appointment_id, {**fields, "status": status}),
+                actor=actor
+            )
+        if fields:
+            updated = self.db.update_appointment(appointment_id, fields)
+            updated = normalize_appointment(updated) if updated else None
+        return updated or self.get(appointment_id)
+
+    def _reschedule(self, appointment_id: str, fields: Dict) -> Optional[Dict]:
+        """Grava a mudança de horário só se o novo intervalo estiver livre"""
+        current = self.get(appointment_id)
+        if not current:
+            return None
+
+        candidate = {**current, **fields}
+        if "data_hora" in fields:
+            candidate.pop("data_hora_ts", None)
+        stamp_appointment(candidate)
+        professional_id = str(candidate.get("profissional_id"))
+        ts = appointment_epoch(candidate)
+        if ts is None or not candidate.get("profissional_id"):
+            raise ValueError("Data/hora ou profissional inválidos")
+
+        start = local_naive(ts)
+        duration = appointment_duration(candidate)
+        persist = lambda: self.db.update_appointment(appointment_id, fields)
+        if candidate.get("status") in CANCELLED_STATUSES:
+            updated = persist()
+        else:
+            self.check_opening_hours(professional_id, start, duration)
+            updated = self.holds.commit(professional_id, start, duration, persist,
+                                        exclude_appointment_id=appointment_id)
+        return normalize_appointment(updated) if updated else None
+
+    def update_status(self, appointment_id: str, status: str,
+                      professional_id: Optional[str] = None,
+                      actor: Optional[str] = None) -> Optional[Dict]:
+        """
+        Raises:
+            InvalidTransitionError: mudança não permitida pela máquina de estados
+        """
+        return self._transition(
+            appointment_id, status,
+            lambda status: self.db.update_appointment_status(appointment_id, status, professional_id),
+            actor=actor or professional_id
+        )
+
+    def cancel(self, appointment_id: str, actor: Optional[str] = None,
+               reason: Optional[str] = None) -> Optional[Dict]:
+        """Cancela (o índice liberta o horário e a lista de espera é avisada)"""
+        return self._transition(
+            appointment_id, "cancelado",
+            lambda status: self.db.update_appointment(appointment_id, {
+                "status": status,
+                "cancelled_at": datetime.now().isoformat()
+            }),
+            actor=actor, reason=reason
+        )
+
+    def _transition(self, appointment_id: str, status: str, write,
+                    actor: Optional[str] = None, reason: Optional[str] = None) -> Optional[Dict]:
+        """Valida (O(1)), grava com write(status) e regista na auditoria"""
+        status = normalize_status(status)
+        with self._lock:
+            current = self.get(appointment_id)
+            if not current:
+                return None
+            self.states.validate(current["status"], status)
+            if current["status"] == status:
+                return current
+
+            updated = write(status)
+            if not updated:
+                return None
+            self.states.record(appointment_id, current["status"], status, actor=actor, reason=reason)
+        return normalize_appointment(updated)
+
+
+# Instância global
+appointment_service = AppointmentService()
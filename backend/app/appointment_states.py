@@ -0,0 +1,198 @@
+"""
+APPOINTMENT_STATES.PY - MÁQUINA DE ESTADOS DOS AGENDAMENTOS
+===========================================================
+Estados de AppointmentStatus e as transições permitidas entre eles.
+
+- Tabela de transições pré-calculada: validar uma mudança é um lookup
+  num set de pares (de, para)
+- Estados antigos (agendado, scheduled, cancelled) são normalizados antes
+  de validar (STATUS_ALIASES)
+- Contadores por estado e por (estado, dia local do salão), mantidos a
+  cada mutação do db: "quantos confirmados hoje" é O(1)
+- Cada transição fica registada em appointment_audit.json, só por
+  acréscimo (_append_record, sem reescrever o arquivo)
+"""
+
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .database import db
+from .salon_time import appointment_epoch, to_local
+
+
+# ====================================================================
+# ESTADOS E TRANSIÇÕES
+# ====================================================================
+
+STATUS_ALIASES = {
+    "agendado": "confirmado",
+    "scheduled": "confirmado",
+    "cancelled": "cancelado",
+    "no_show": "faltou",
+}
+
+# Para cada estado, os estados seguintes possíveis (concluido, cancelado e faltou são finais).
+# pendente -> concluido cobre a ficha de atendimento de uma marcação nunca confirmada
+TRANSITIONS: Dict[str, FrozenSet[str]] = {
+    "pendente": frozenset({"confirmado", "em_atendimento", "concluido", "cancelado", "faltou"}),
+    "confirmado": frozenset({"em_atendimento", "concluido", "cancelado", "faltou"}),
+    "em_atendimento": frozenset({"concluido"}),
+    "concluido": frozenset(),
+    "cancelado": frozenset(),
+    "faltou": frozenset(),
+}
+
+ALLOWED_TRANSITIONS: FrozenSet[Tuple[str, str]] = frozenset(
+    (source, target) for source, targets in TRANSITIONS.items() for target in targets
+)
+
+FINAL_STATES = frozenset(s for s, targets in TRANSITIONS.items() if not targets)
+
+
+class InvalidTransitionError(Exception):
+    """Mudança de estado não permitida pela máquina de estados"""
+
+    def __init__(self, current: Optional[str], target: str):
+        self.current = current
+        self.target = target
+        allowed = ", ".join(sorted(TRANSITIONS.get(current, ()))) or "nenhuma"
+        super().__init__(
+            f"Transição inválida: {current} -> {target} (permitidas: {allowed})"
+        )
+
+
+def normalize_status(status: Optional[str]) -> Optional[str]:
+    status = getattr(status, "value", status)  # AppointmentStatus
+    return STATUS_ALIASES.get(status, status)
+
+
+def can_transition(current: Optional[str], target: str) -> bool:
+    """Mudança permitida? (manter o mesmo estado é sempre permitido)"""
+    current, target = normalize_status(current), normalize_status(target)
+    return current == target or (current, target) in ALLOWED_TRANSITIONS
+
+
+# ====================================================================
+# ÍNDICES E AUDITORIA
+# ====================================================================
+
+class AppointmentStateMachine:
+    """Valida transições, mantém contadores por estado e escreve a auditoria"""
+
+    def __init__(self, database=db):
+        self.db = database
+        self._lock = threading.RLock()
+        self._status_of: Dict[str, Tuple[str, Optional[str]]] = {}
+        self._by_status: Dict[str, int] = {}
+        self._by_status_day: Dict[Tuple[str, str], int] = {}
+        self._stamp = None
+        self._loaded = False
+
+        database.add_listener("appointments", self._on_change)
+
+    # ----- índices -----
+
+    @staticmethod
+    def _location(appointment: Dict) -> Tuple[str, Optional[str]]:
+        ts = appointment_epoch(appointment)
+        day = to_local(ts).date().isoformat() if ts is not None else None
+        return normalize_status(appointment.get("status")), day
+
+    def _move(self, appointment_id: str, location: Optional[Tuple[str, Optional[str]]]):
+        old = self._status_of.pop(appointment_id, None)
+        if old:
+            self._by_status[old[0]] -= 1
+            if old[1]:
+                self._by_status_day[old] -= 1
+        if location:
+            self._status_of[appointment_id] = location
+            self._by_status[location[0]] = self._by_status.get(location[0], 0) + 1
+            if location[1]:
+                self._by_status_day[location] = self._by_status_day.get(location, 0) + 1
+
+    def _rebuild(self):
+        self._status_of = {}
+        self._by_status = {}
+        self._by_status_day = {}
+        for appointment in self.db._read_file("appointments"):
+            if appointment.get("id"):
+                self._move(appointment["id"], self._location(appointment))
+        self._stamp = self.db._file_stamp("appointments")
+        self._loaded = True
+
+    def ensure_fresh(self):
+        with self._lock:
+            if not self._loaded or self.db._file_stamp("appointments") != self._stamp:
+                self._rebuild()
+
+    def _on_change(self, action: str, appointment: Dict):
+        with self._lock:
+            # Ocorrências recorrentes não vivem no arquivo
+            if not self._loaded or appointment.get("recurring") or not appointment.get("id"):
+                return
+            self._move(appointment["id"], self._location(appointment))
+            self._stamp = self.db._file_stamp("appointments")
+
+    # ----- consultas -----
+
+    def count(self, status: str, day: Optional[str] = None) -> int:
+        """Agendamentos no estado (e no dia local, se indicado)"""
+        self.ensure_fresh()
+        status = normalize_status(status)
+        if day:
+            return self._by_status_day.get((status, day), 0)
+        return self._by_status.get(status, 0)
+
+    def counts(self) -> Dict[str, int]:
+        self.ensure_fresh()
+        return {status: n for status, n in self._by_status.items() if n}
+
+    def status_of(self, appointment_id: str) -> Optional[str]:
+        self.ensure_fresh()
+        location = self._status_of.get(appointment_id)
+        return location[0] if location else None
+
+    # ----- transições -----
+
+    def validate(self, current: Optional[str], target: str):
+        """
+        Raises:
+            InvalidTransitionError: se target não for um estado ou a mudança não for permitida
+        """
+        if normalize_status(target) not in TRANSITIONS or not can_transition(current, target):
+            raise InvalidTransitionError(normalize_status(current), target)
+
+    @staticmethod
+    def _entry(appointment_id: str, current: Optional[str], target: str,
+               actor: Optional[str], reason: Optional[str]) -> Dict:
+        return {
+            "id": str(uuid.uuid4()),
+            "appointment_id": appointment_id,
+            "from": normalize_status(current),
+            "to": normalize_status(target),
+            "actor": actor,
+            "reason": reason,
+            "at": datetime.now().isoformat(),
+        }
+
+    def record(self, appointment_id: str, current: Optional[str], target: str,
+               actor: Optional[str] = None, reason: Optional[str] = None) -> Dict:
+        """Acrescenta a transição à auditoria (current=None na criação)"""
+        entry = self._entry(appointment_id, current, target, actor, reason)
+        self.db._append_record("appointment_audit", entry)
+        return entry
+
+    def record_created(self, records: List[Dict], actor: Optional[str] = None):
+        """Criação de vários agendamentos num único acréscimo à auditoria"""
+        entries = [self._entry(r["id"], None, r.get("status"), actor, None) for r in records]
+        self.db._append_record("appointment_audit", entries)
+
+    def history(self, appointment_id: str) -> List[Dict]:
+        """Transições do agendamento, pela ordem em que aconteceram"""
+        return [e for e in self.db._read_file("appointment_audit") if e.get("appointment_id") == appointment_id]
+
+
+# Instância global
+appointment_states = AppointmentStateMachine()
@@ -1,6 +1,6 @@
 # app/routes/appointments.py - INTEGRADO COM SISTEMA DE ARQUIVOS
 
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status, Depends
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from pydantic import BaseModel
@@ -9,6 +9,16 @@ import json
 import os
 from pathlib import Path
 
+from app.appointment_service import OutsideOpeningHoursError, appointment_service
+from app.availability import SLOT_STEP_MINUTES, appointment_duration, availability_index
+from app.booking_drafts import booking_drafts
+from app.booking_holds import HoldNotFoundError, SlotUnavailableError, slot_holds
+from app.database import db
+from app.appointment_states import InvalidTransitionError, appointment_states
+from app.etags import etag_matches, make_etag, not_modified
+from app.salon_time import salon_now
+from app.slot_calendar import mask_to_times
+
 router = APIRouter()
 
 # ==================== CONFIGURAÇÃO ====================
@@ -18,6 +28,9 @@ DATA_DIR = Path("data")
 EXPORTS_DIR = Path("exports/databricks")
 APPOINTMENTS_FILE = DATA_DIR / "appointments.json"
 
+# Duração assumida nas consultas de horários sem serviço indicado
+DEFAULT_SLOT_DURATION = 30
+
 # Criar diretórios se não existirem
 DATA_DIR.mkdir(exist_ok=True)
 EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
@@ -56,32 +69,10 @@ class ScheduleAppointmentRequest(BaseModel):
     appointment_time: str
     professional_id: Optional[str] = None
     notes: Optional[str] = ""
+    hold_id: Optional[str] = None
 
 # ==================== FUNÇÕES AUXILIARES ====================
 
-def load_appointments():
-    """Carrega agendamentos do arquivo JSON"""
-    if not APPOINTMENTS_FILE.exists():
-        return []
-    
-    try:
-        with open(APPOINTMENTS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"⚠️ Erro ao carregar appointments.json: {e}")
-        return []
-
-def save_appointments(appointments):
-    """Salva agendamentos no arquivo JSON"""
-    try:
-        with open(APPOINTMENTS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(appointments, f, indent=2, ensure_ascii=False)
-        print(f"✅ Salvo em: {APPOINTMENTS_FILE}")
-        return True
-    except Exception as e:
-        print(f"❌ Erro ao salvar appointments.json: {e}")
-        return False
-
 def export_to_databricks(appointment):
     """Exporta agendamento para pasta databricks"""
     try:
@@ -107,9 +98,30 @@ def get_user_id_from_token(token: str = None):
     # TODO: Implementar extração real do token
     return "5aaa0775-8d44-4d89-a789-59553210a0a9"
 
+def build_appointment(booking: Dict, booking_code: Optional[str], professional_id: str,
+                      appointment_datetime: datetime, notes: Optional[str], user_id: str) -> Dict:
+    """Registo de agendamento no formato comum (appointment_service)"""
+    return appointment_service.build_from_booking(
+        booking, booking_code, professional_id, appointment_datetime, notes, user_id
+    )
+
+def booking_service_names(booking: Dict) -> List[str]:
+    """Nomes dos serviços de um booking preparado"""
+    return [s.get("name", "") for s in booking.get("services", [])]
+
+def assign_professional(booking: Dict, start: datetime, duration: int) -> str:
+    """Escolhe um profissional livre que faça os serviços (sem professional_id)"""
+    professional_id = appointment_service.assign_professional(booking_service_names(booking), start, duration)
+    if not professional_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Nenhum profissional disponível neste horário para os serviços escolhidos"
+        )
+    return professional_id
+
 # ==================== STORAGE TEMPORÁRIO ====================
 
-pending_bookings = {}
+# Bookings preparados ficam em booking_drafts (TTL, limite de tamanho, SQLite)
 
 # ==================== ENDPOINTS ====================
 
@@ -135,7 +147,7 @@ async def prepare_appointment(data: PrepareAppointmentRequest):
             "created_at": datetime.now().isoformat()
         }
         
-        pending_bookings[booking_code] = booking_data
+        booking_drafts.put(booking_code, booking_data)
         
         print(f"✅ Agendamento preparado: {booking_code}")
         
@@ -161,69 +173,58 @@ async def schedule_appointment(data: ScheduleAppointmentRequest):
     try:
         # Validar data
         appointment_datetime = datetime.fromisoformat(f"{data.appointment_date}T{data.appointment_time}")
-        if appointment_datetime < datetime.now():
+        if appointment_datetime < salon_now():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Data e hora não podem estar no passado"
             )
         
         # Buscar booking preparado
-        booking = pending_bookings.get(data.booking_code, {})
+        booking = booking_drafts.get(data.booking_code) or {}
+        duration = appointment_duration(booking)
         
-        # Gerar ID único
-        appointment_id = str(uuid.uuid4())
+        # Profissional: o pedido, o da reserva, ou atribuição automática
+        professional_id = data.professional_id
+        if not professional_id and data.hold_id:
+            hold = slot_holds.get(data.hold_id)
+            professional_id = hold["professional_id"] if hold else None
+        if not professional_id:
+            professional_id = assign_professional(booking, appointment_datetime, duration)
         
         # Obter user_id (você pode passar no token)
         user_id = get_user_id_from_token()
         
         # Criar agendamento no formato do seu sistema
-        new_appointment = {
-            "id": appointment_id,
-            "usuario_id": user_id,
-            "profissional_id": data.professional_id or "1",  # ID do profissional (default: 1)
-            "servico": ", ".join([s["name"] for s in booking.get("services", [])]),
-            "data_hora": appointment_datetime.isoformat(),
-            "status": "agendado",
-            "created_at": datetime.now().isoformat(),
-            # Dados adicionais
-            "booking_code": data.booking_code,
-            "services_details": booking.get("services", []),
-            "total_price": booking.get("total_price", 0),
-            "total_duration": booking.get("total_duration", 0),
-            "medical_questionnaire": booking.get("medical_questionnaire"),
-            "notes": data.notes,
-            "requires_test": booking.get("requires_test", False)
-        }
-        
-        # Carregar agendamentos existentes
-        appointments = load_appointments()
-        
-        # Adicionar novo agendamento
-        appointments.append(new_appointment)
-        
-        # Salvar no arquivo JSON principal
-        if not save_appointments(appointments):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Erro ao salvar agendamento"
-            )
+        new_appointment = build_appointment(
+            booking, data.booking_code, professional_id, appointment_datetime, data.notes, user_id
+        )
+        appointment_id = new_appointment["id"]
+        
+        # Gravar só se o horário continuar livre, dentro do horário do profissional
+        try:
+            new_appointment = appointment_service.create(new_appointment, hold_id=data.hold_id)
+        except OutsideOpeningHoursError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except HoldNotFoundError as e:
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+        except SlotUnavailableError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
         
         # Exportar para databricks
         export_to_databricks(new_appointment)
         
         # Atualizar booking
-        if data.booking_code in pending_bookings:
-            pending_bookings[data.booking_code]["status"] = "scheduled"
-            pending_bookings[data.booking_code]["appointment_id"] = appointment_id
+        booking_drafts.update(data.booking_code, status="scheduled", appointment_id=appointment_id)
         
         print(f"✅ Agendamento salvo: {appointment_id}")
         print(f"   Data: {data.appointment_date} às {data.appointment_time}")
-        print(f"   Profissional: {data.professional_id or '1'}")
+        print(f"   Profissional: {new_appointment['profissional_id']}")
         print(f"   Serviço: {new_appointment['servico']}")
         
         return {
             "appointment_id": appointment_id,
             "status": "agendado",
+            "professional_id": professional_id,
             "appointment_datetime": appointment_datetime.isoformat(),
             "message": "Agendamento confirmado e salvo com sucesso",
             "saved_to_file": True,
@@ -241,138 +242,87 @@ async def schedule_appointment(data: ScheduleAppointmentRequest):
             detail=f"Erro ao agendar: {str(e)}"
         )
 
-@router.get("/list")
-async def list_appointments(usuario_id: Optional[str] = None):
-    """
-    Lista agendamentos do arquivo JSON.
-    Se usuario_id for fornecido, filtra por usuário.
-    """
-    try:
-        appointments = load_appointments()
-        
-        # Filtrar por usuário se fornecido
-        if usuario_id:
-            appointments = [apt for apt in appointments if apt.get("usuario_id") == usuario_id]
-        
-        # Ordenar por data (mais recente primeiro)
-        appointments.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-        
-        return {
-            "appointments": appointments,
-            "total": len(appointments)
-        }
-        
-    except Exception as e:
-        print(f"❌ Erro ao listar agendamentos: {e}")
-        return {
-            "appointments": [],
-            "total": 0
-        }
-
 @router.get("/available-slots/{date}")
-async def get_available_slots(date: str):
+async def get_available_slots(
+    date: str,
+    request: Request,
+    response: Response,
+    professional_id: Optional[str] = None,
+    duration: Optional[int] = None,
+    booking_code: Optional[str] = None
+):
     """
     Retorna horários disponíveis para uma data específica.
+    Um horário só é livre se o serviço inteiro (duration, ou a duração do
+    booking_code preparado) couber no calendário do profissional.
+    Sem professional_id: horários em que algum profissional que faz os
+    serviços do booking está livre (atribuição automática no /schedule).
     """
     try:
         target_date = datetime.fromisoformat(date).date()
-        
-        # Horários de funcionamento: 9h às 18h, intervalos de 30min
-        all_slots = []
-        current_time = datetime.combine(target_date, datetime.min.time()).replace(hour=9)
-        end_time = datetime.combine(target_date, datetime.min.time()).replace(hour=18)
-        
-        while current_time < end_time:
-            all_slots.append(current_time.strftime("%H:%M"))
-            current_time += timedelta(minutes=30)
-        
-        # Carregar agendamentos
-        appointments = load_appointments()
-        
-        # Verificar slots ocupados nesta data
-        occupied_slots = []
-        for apt in appointments:
-            try:
-                apt_datetime = datetime.fromisoformat(apt["data_hora"])
-                if apt_datetime.date() == target_date and apt["status"] == "agendado":
-                    occupied_slots.append(apt_datetime.strftime("%H:%M"))
-            except:
-                continue
-        
-        # Filtrar disponíveis
-        available_slots = [slot for slot in all_slots if slot not in occupied_slots]
-        
-        return {
-            "date": date,
-            "available_slots": available_slots,
-            "occupied_slots": occupied_slots
-        }
-        
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Formato de data inválido. Use YYYY-MM-DD"
         )
-
-@router.delete("/{appointment_id}")
-async def cancel_appointment(appointment_id: str):
-    """
-    Cancela um agendamento no arquivo JSON.
-    """
-    try:
-        appointments = load_appointments()
-        
-        # Encontrar agendamento
-        found = False
-        for apt in appointments:
-            if apt["id"] == appointment_id:
-                apt["status"] = "cancelado"
-                apt["cancelled_at"] = datetime.now().isoformat()
-                found = True
-                break
-        
-        if not found:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Agendamento não encontrado"
-            )
-        
-        # Salvar
-        save_appointments(appointments)
-        
-        print(f"✅ Agendamento cancelado: {appointment_id}")
-        
-        return {
-            "message": "Agendamento cancelado com sucesso",
-            "appointment_id": appointment_id
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ Erro ao cancelar: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Erro ao cancelar: {str(e)}"
-        )
+    
+    booking = booking_drafts.get(booking_code) if booking_code else None
+    if not duration and booking:
+        duration = appointment_duration(booking)
+    duration = duration or DEFAULT_SLOT_DURATION
+    
+    # ETag das versões do dia, antes de calcular os horários
+    day = target_date.isoformat()
+    if professional_id:
+        occupancy = availability_index.day_version(professional_id, day)
+        services = None
+    else:
+        occupancy = (availability_index.date_version(day), db.collection_version("professionals"))
+        services = booking_service_names(booking or {})
+    etag = make_etag(
+        "slots", day, professional_id, duration, services, occupancy,
+        db.collection_version("schedule_templates"), SLOT_STEP_MINUTES
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
+    if professional_id:
+        professional_ids = [professional_id]
+    else:
+        professional_ids = appointment_service.candidate_professionals(services)
+    
+    # Horário de cada profissional nesse dia e ocupação pelo índice (sem reler o JSON)
+    available, opening_starts = appointment_service.available_starts(
+        target_date, professional_ids, duration, SLOT_STEP_MINUTES
+    )
+    
+    return {
+        "date": date,
+        "professional_id": professional_id,
+        "duration": duration,
+        "available_slots": mask_to_times(available),
+        "occupied_slots": mask_to_times(opening_starts & ~available)
+    }
 
 @router.get("/health")
 async def appointments_health():
     """
     Health check com estatísticas.
     """
-    appointments = load_appointments()
+    counts = appointment_service.count_by_status()
     
-    total = len(appointments)
-    agendados = len([a for a in appointments if a.get("status") == "agendado"])
-    cancelados = len([a for a in appointments if a.get("status") == "cancelado"])
+    total = sum(counts.values())
+    agendados = counts.get("confirmado", 0)
+    cancelados = counts.get("cancelado", 0)
     
     return {
         "status": "ok",
         "total_appointments": total,
         "agendados": agendados,
         "cancelados": cancelados,
-        "pending_bookings": len(pending_bookings),
+        "confirmados_hoje": appointment_states.count("confirmado", salon_now().date().isoformat()),
+        "pending_bookings": len(booking_drafts),
         "files": {
             "appointments_json": str(APPOINTMENTS_FILE),
             "exists": APPOINTMENTS_FILE.exists(),
@@ -387,7 +337,7 @@ async def export_all_to_databricks():
     Exporta todos os agendamentos para databricks.
     """
     try:
-        appointments = load_appointments()
+        appointments = appointment_service.list_all()
         exported = 0
         
         for apt in appointments:
@@ -4,16 +4,30 @@ APPOINTMENTS.PY - ROTAS DE AGENDAMENTO COM GOOGLE CALENDAR E I18N
 Versão atualizada com integração do Google Calendar e suporte a idiomas
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends, Query, Header
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Header, Request, Response
 from typing import Annotated, List, Optional
 from datetime import datetime, timedelta
+import json
 
 from app.auth import get_current_user
+from app.permissions import Permission, has_permission
+from app.api_keys import require_scopes
 from app.models import (
     User, Appointment, AppointmentCreate, AppointmentStatus,
-    TimeSlot, AvailabilityResponse, ProfessionalSchedule
+    TimeSlot, AvailabilityResponse, ProfessionalSchedule,
+    SlotSearchResult, SlotSearchResponse
 )
 from app.database import db
+from app.etags import etag_matches, make_etag, not_modified
+from app.appointment_service import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, OutsideOpeningHoursError, appointment_service
+)
+from app.appointment_states import InvalidTransitionError
+from app.booking_holds import SlotUnavailableError
+from app.availability import SLOT_STEP_MINUTES, availability_index, professional_offers
+from app.salon_time import now_epoch, salon_now, to_epoch
+from app.schedule_templates import schedule_templates
+from app.slot_calendar import QUANTUM_MINUTES, grid_mask, iter_bits
 from app.google_calendar import (
     GoogleCalendarIntegration,
     sync_appointment_to_calendar,
@@ -62,25 +76,25 @@ def get_language_from_header(accept_language: Optional[str] = Header(None)) -> L
     return Language.PT
 
 
-def _check_time_conflicts(profissional_id: str, data_hora: datetime, duracao: int) -> Optional[str]:
-    """Verifica conflitos de horário"""
-    data_str = data_hora.date().isoformat()
-    agendamentos = db.get_professional_appointments(profissional_id, data_str)
-    
-    fim_novo = data_hora + timedelta(minutes=duracao)
-    
-    for apt in agendamentos:
-        if apt.get("status") in ["cancelado"]:
-            continue
-        
-        apt_inicio = datetime.fromisoformat(apt["data_hora"])
-        apt_duracao = sum(s.get("duracao_estimada", 60) for s in apt.get("servicos", []))
-        apt_fim = apt_inicio + timedelta(minutes=apt_duracao)
-        
-        if not (fim_novo <= apt_inicio or data_hora >= apt_fim):
-            return f"{apt_inicio.strftime('%H:%M')} - {apt_fim.strftime('%H:%M')}"
-    
-    return None
+# ETag por idioma, calculado uma vez por processo
+_translation_etags = {}
+
+def _translations_etag(language: Language) -> str:
+    if language not in _translation_etags:
+        content = json.dumps(translator.get_all(language), sort_keys=True, ensure_ascii=False)
+        _translation_etags[language] = make_etag("translations", language.value, content)
+    return _translation_etags[language]
+
+
+def _page_or_400(response: Response, **filters) -> List[dict]:
+    """Página do appointment_service; cursor seguinte no header X-Next-Cursor"""
+    try:
+        appointments, next_cursor = appointment_service.page(**filters)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return appointments
 
 
 # ============================================================
@@ -109,41 +123,33 @@ async def create_appointment(
     translator.set_language(language)
     
     # Validação de data/hora
-    try:
-        agendamento_dt = datetime.fromisoformat(new_appointment.data_hora)
-        if agendamento_dt < datetime.now():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=translator.get("error_past_datetime")
-            )
-    except ValueError:
+    # (aceita hora local do salão ou com fuso, p.ex. "...Z"; compara instantes UTC)
+    agendamento_ts = to_epoch(new_appointment.data_hora)
+    if agendamento_ts is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=translator.get("error_invalid_datetime")
         )
-    
-    # Calcula duração total
-    duracao_total = sum(servico.duracao_estimada for servico in new_appointment.servicos)
-    
-    # Verifica conflitos
-    conflitos = _check_time_conflicts(
-        new_appointment.profissional_id,
-        agendamento_dt,
-        duracao_total
-    )
-    
-    if conflitos:
+    if agendamento_ts < now_epoch():
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"{translator.get('error_time_conflict')} {conflitos}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=translator.get("error_past_datetime")
         )
     
-    # Cria agendamento
+    # Cria agendamento (horário e conflitos validados pelo appointment_service)
     appointment_data = new_appointment.dict()
     appointment_data["cliente_id"] = current_user.id
     appointment_data["status"] = "pendente"
     
-    created_appointment = db.create_appointment(appointment_data)
+    try:
+        created_appointment = appointment_service.create(appointment_data)
+    except OutsideOpeningHoursError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except SlotUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{translator.get('error_time_conflict')} {e}"
+        )
     
     # Sincroniza com Google Calendar se solicitado
     google_calendar_event_id = None
@@ -164,7 +170,9 @@ async def create_appointment(
                 if google_calendar_event_id:
                     # Atualiza agendamento com ID do evento do Google
                     created_appointment["google_calendar_event_id"] = google_calendar_event_id
-                    db._write_file("appointments", db.get_all_appointments())
+                    appointment_service.update(created_appointment["id"], {
+                        "google_calendar_event_id": google_calendar_event_id
+                    })
                     print(f"✅ Agendamento sincronizado com Google Calendar: {google_calendar_event_id}")
         except Exception as e:
             print(f"⚠️ Erro ao sincronizar com Google Calendar: {e}")
@@ -206,8 +214,7 @@ async def update_appointment_status(
     translator.set_language(language)
     
     # Busca agendamento
-    appointments = db.get_all_appointments()
-    appointment = next((a for a in appointments if a["id"] == appointment_id), None)
+    appointment = appointment_service.get(appointment_id)
     
     if not appointment:
         raise HTTPException(
@@ -216,9 +223,12 @@ async def update_appointment_status(
         )
     
     # Verifica permissões
-    is_professional = current_user.role == "profissional" and appointment["profissional_id"] == current_user.id
+    is_professional = (
+        has_permission(current_user, Permission.VIEW_PROFESSIONAL_AGENDA)
+        and appointment["profissional_id"] == current_user.id
+    )
     is_client = current_user.role == "cliente" and appointment["cliente_id"] == current_user.id
-    is_admin = current_user.role == "admin"
+    is_admin = has_permission(current_user, Permission.MANAGE_APPOINTMENTS)
     
     if not (is_professional or is_client or is_admin):
         raise HTTPException(
@@ -233,12 +243,16 @@ async def update_appointment_status(
             detail=translator.get("error_client_can_only_cancel")
         )
     
-    # Atualiza status
-    updated = db.update_appointment_status(
-        appointment_id,
-        new_status,
-        current_user.id if is_professional else None
-    )
+    # Atualiza status (transição validada pela máquina de estados)
+    try:
+        updated = appointment_service.update_status(
+            appointment_id,
+            new_status,
+            current_user.id if is_professional else None,
+            actor=current_user.id
+        )
+    except InvalidTransitionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     
     if not updated:
         raise HTTPException(
@@ -286,42 +300,47 @@ async def update_appointment_status(
 @router.get("/my", response_model=List[Appointment])
 async def get_my_appointments(
     current_user: Annotated[User, Depends(get_current_user)],
+    response: Response,
     status: Optional[AppointmentStatus] = None,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor da página anterior"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     accept_language: Optional[str] = Header(None)
 ):
-    """Lista agendamentos do usuário logado"""
+    """
+    Lista agendamentos do usuário logado por data, paginados por cursor
+    (o cursor da página seguinte vem no header X-Next-Cursor)
+    """
     language = get_language_from_header(accept_language)
     translator.set_language(language)
     
-    appointments = db.get_user_appointments(current_user.id)
-    
-    if status:
-        appointments = [a for a in appointments if a.get("status") == status]
+    appointments = _page_or_400(response, client_id=current_user.id, status=status,
+                                cursor=cursor, limit=limit)
     
     return [Appointment(**a) for a in appointments]
 
 
 @router.get("/professional", response_model=List[Appointment])
 async def get_professional_appointments(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(require_scopes(
+        Permission.VIEW_PROFESSIONAL_AGENDA,
+        detail="Apenas profissionais podem ver a agenda"
+    ))],
+    response: Response,
     data: Optional[str] = Query(None, description="Data no formato YYYY-MM-DD"),
     status: Optional[AppointmentStatus] = None,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor da página anterior"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     accept_language: Optional[str] = Header(None)
 ):
-    """Lista agendamentos do profissional"""
+    """
+    Lista agendamentos do profissional por data, paginados por cursor
+    (o cursor da página seguinte vem no header X-Next-Cursor)
+    """
     language = get_language_from_header(accept_language)
     translator.set_language(language)
     
-    if current_user.role not in ["profissional", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail=translator.get("error_only_professionals")
-        )
-    
-    appointments = db.get_professional_appointments(current_user.id, data)
-    
-    if status:
-        appointments = [a for a in appointments if a.get("status") == status]
+    appointments = _page_or_400(response, professional_id=current_user.id, status=status,
+                                first_day=data, last_day=data, cursor=cursor, limit=limit)
     
     return [Appointment(**a) for a in appointments]
 
@@ -331,7 +350,7 @@ async def get_available_times(
     profissional_id: str,
     data: str = Query(..., description="Data no formato YYYY-MM-DD"),
     duracao: int = Query(60, description="Duração em minutos"),
-    current_user: Annotated[User, Depends(get_current_user)] = None,
+    current_user: Annotated[User, Depends(require_scopes())] = None,
     accept_language: Optional[str] = Header(None)
 ):
     """Retorna horários disponíveis"""
@@ -346,22 +365,25 @@ async def get_available_times(
             detail=translator.get("error_invalid_date")
         )
     
-    horarios = []
-    
-    for hora in range(9, 19):
-        for minuto in [0, 30]:
-            horario = data_obj.replace(hour=hora, minute=minuto, second=0, microsecond=0)
-            horario_str = horario.isoformat()
-            
-            conflito = _check_time_conflicts(profissional_id, horario, duracao)
-            disponivel = conflito is None
-            
-            horarios.append(TimeSlot(
-                horario=horario_str,
-                disponivel=disponivel,
-                profissional_id=profissional_id,
-                duracao_disponivel=duracao if disponivel else 0
-            ))
+    # Inícios da grelha dentro do horário do profissional nesse dia
+    inicio_dia = datetime.combine(data_obj.date(), datetime.min.time())
+    aberto = schedule_templates.open_mask(profissional_id, data_obj.date())
+    candidatos = [
+        inicio_dia + timedelta(minutes=q * QUANTUM_MINUTES)
+        for q in iter_bits(grid_mask(SLOT_STEP_MINUTES) & aberto)
+    ]
+    
+    horarios = [
+        TimeSlot(
+            horario=horario.isoformat(),
+            disponivel=disponivel,
+            profissional_id=profissional_id,
+            duracao_disponivel=duracao if disponivel else 0
+        )
+        for horario, disponivel in availability_index.free_starts(
+            profissional_id, data_obj.date(), candidatos, duracao, open_mask=aberto
+        )
+    ]
     
     return AvailabilityResponse(
         data=data,
@@ -370,19 +392,99 @@ async def get_available_times(
     )
 
 
+@router.get("/search", response_model=SlotSearchResponse)
+async def search_available_slots(
+    data_inicio: str = Query(..., description="Data inicial no formato YYYY-MM-DD"),
+    data_fim: Optional[str] = Query(None, description="Data final (padrão: data inicial + 7 dias)"),
+    servico: Optional[str] = Query(None, description="Serviço/especialidade (ex: mechas)"),
+    tipo_servico: Optional[str] = Query(None, description="Tipo de profissional (cabelo, unha)"),
+    duracao: int = Query(60, ge=15, le=480, description="Duração em minutos"),
+    profissional_ids: Optional[List[str]] = Query(None, description="Restringir a estes profissionais"),
+    limite: int = Query(10, ge=1, le=50, description="Número máximo de horários"),
+    current_user: Annotated[User, Depends(require_scopes())] = None,
+    accept_language: Optional[str] = Header(None)
+):
+    """
+    Próximos horários livres para um serviço, entre todos os profissionais
+    que o fazem, numa única chamada.
+    """
+    language = get_language_from_header(accept_language)
+    translator.set_language(language)
+    
+    try:
+        inicio = datetime.fromisoformat(data_inicio).date()
+        fim = datetime.fromisoformat(data_fim).date() if data_fim else inicio + timedelta(days=7)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=translator.get("error_invalid_date")
+        )
+    
+    if fim < inicio or (fim - inicio).days > 62:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Intervalo de datas inválido (máximo 62 dias)"
+        )
+    
+    if tipo_servico:
+        profissionais = db.get_professionals_by_type(tipo_servico.lower())
+    else:
+        profissionais = [p for p in db.get_all_professionals() if p.get("is_active", True)]
+    
+    profissionais = [
+        p for p in profissionais
+        if professional_offers(p, servico)
+        and (not profissional_ids or p["id"] in profissional_ids)
+    ]
+    nomes = {p["id"]: p.get("nome", "") for p in profissionais}
+    
+    encontrados = availability_index.earliest_slots(
+        professional_ids=list(nomes),
+        first_day=inicio,
+        last_day=fim,
+        duration=duracao,
+        limit=limite,
+        not_before=salon_now()
+    )
+    
+    return SlotSearchResponse(
+        servico=servico,
+        duracao=duracao,
+        data_inicio=inicio.isoformat(),
+        data_fim=fim.isoformat(),
+        resultados=[
+            SlotSearchResult(
+                profissional_id=profissional_id,
+                profissional_nome=nomes[profissional_id],
+                inicio=horario.isoformat(),
+                fim=(horario + timedelta(minutes=duracao)).isoformat()
+            )
+            for horario, profissional_id in encontrados
+        ]
+    )
+
+
 # ============================================================
 # ENDPOINT DE TRADUÇÃO
 # ============================================================
 
 @router.get("/translations")
 async def get_translations(
+    request: Request,
+    response: Response,
     language: Language = Query(Language.PT, description="Idioma desejado")
 ):
     """
     Retorna todas as traduções para um idioma específico
     
     Use este endpoint no frontend para carregar traduções
+    (suporta If-None-Match: as traduções só mudam com um novo deploy)
     """
+    etag = _translations_etag(language)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
     return {
         "language": language,
         "translations": translator.get_all(language)
@@ -0,0 +1,117 @@
+"""
+ASSIGNMENT.PY - ATRIBUIÇÃO AUTOMÁTICA DE PROFISSIONAIS
+======================================================
+Escolhe o profissional quando o cliente não indica nenhum.
+
+- Candidatos: profissionais ativos cujas especialidades cobrem os serviços
+- Só conta quem atende nesse horário (schedule_templates) e está livre
+  (índice de disponibilidade e reservas temporárias)
+- Estratégias:
+    "least_loaded": menos minutos marcados no dia (contadores do índice)
+    "best_fit":     encaixa no intervalo livre mais justo, para não
+                    deixar buracos inúteis na agenda
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .availability import AvailabilityIndex, availability_index, professional_offers
+from .booking_holds import SlotHoldRegistry, slot_holds
+from .database import db
+from .schedule_templates import ScheduleTemplates, schedule_templates
+from .slot_calendar import QUANTA_PER_DAY, minutes_to_quantum, time_mask
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+STRATEGY_LEAST_LOADED = "least_loaded"
+STRATEGY_BEST_FIT = "best_fit"
+DEFAULT_STRATEGY = STRATEGY_LEAST_LOADED
+
+
+def free_gap_quanta(free: int, quantum: int) -> int:
+    """Tamanho (em quanta) do bloco livre contínuo que contém `quantum`"""
+    if not (free >> quantum) & 1:
+        return 0
+    left = quantum
+    while left > 0 and (free >> (left - 1)) & 1:
+        left -= 1
+    right = quantum
+    while right < QUANTA_PER_DAY - 1 and (free >> (right + 1)) & 1:
+        right += 1
+    return right - left + 1
+
+
+# ====================================================================
+# MOTOR DE ATRIBUIÇÃO
+# ====================================================================
+
+class AssignmentEngine:
+    """Atribui profissionais com base em especialidades e ocupação diária"""
+
+    def __init__(self, database=db, index: AvailabilityIndex = availability_index,
+                 templates: ScheduleTemplates = schedule_templates,
+                 holds: SlotHoldRegistry = slot_holds):
+        self.db = database
+        self.index = index
+        self.templates = templates
+        self.holds = holds
+
+    def candidates(self, servicos: Iterable[str]) -> List[Dict]:
+        """Profissionais ativos que fazem todos os serviços pedidos"""
+        servicos = [s for s in servicos if s]
+        ativos = [p for p in self.db.get_all_professionals() if p.get("is_active", True)]
+        return [
+            p for p in ativos
+            if all(professional_offers(p, servico) for servico in servicos)
+        ]
+
+    def _score(self, professional_id: str, start: datetime, duration: int,
+               strategy: str) -> Optional[Tuple]:
+        """Pontuação do profissional (menor = melhor), ou None se não puder"""
+        day = start.date()
+        needed = time_mask(start, duration)
+        open_mask = self.templates.open_mask(professional_id, day)
+        busy = self.index.busy_mask(professional_id, day.isoformat())
+
+        if needed & ~open_mask or needed & busy:
+            return None
+        if self.holds.is_held(professional_id, start, duration):
+            return None
+
+        booked = self.index.booked_minutes(professional_id, day.isoformat())
+        if strategy == STRATEGY_BEST_FIT:
+            first = minutes_to_quantum(start.hour * 60 + start.minute)
+            leftover = free_gap_quanta(open_mask & ~busy, first) - bin(needed).count("1")
+            return leftover, booked, professional_id
+        return booked, professional_id
+
+    def assign(self, servicos: Iterable[str], start: datetime, duration: int,
+               strategy: str = DEFAULT_STRATEGY) -> Optional[str]:
+        """
+        Escolhe o profissional para o horário pedido.
+
+        Returns:
+            id do profissional, ou None se nenhum candidato estiver livre
+        """
+        servicos = list(servicos)
+        candidatos = self.candidates(servicos)
+        if not candidatos:
+            # Nomes de serviço sem correspondência nas especialidades: qualquer ativo
+            print(f"⚠️ Nenhuma especialidade corresponde a {servicos}; a considerar toda a equipa")
+            candidatos = self.candidates([])
+
+        best = None
+        for professional in candidatos:
+            professional_id = str(professional["id"])
+            score = self._score(professional_id, start, duration, strategy)
+            if score is not None and (best is None or score < best[0]):
+                best = (score, professional_id)
+
+        return best[1] if best else None
+
+
+# Instância global
+assignment_engine = AssignmentEngine()
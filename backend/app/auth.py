@@ -7,20 +7,20 @@ Sistema de autenticação JWT
 import jwt
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, Annotated
-from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 
 # Imports internos
 from .database import db
 from .models import User
+from .password_hashing import build_crypt_context, load_hash_config
 
 # ====================================================================
 # CONFIGURAÇÕES
 # ====================================================================
 
-# Contexto para hashing de passwords (bcrypt)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Contexto para hashing de passwords (custo calibrado em data/password_hashing.json)
+pwd_context = build_crypt_context(load_hash_config())
 
 # Configurações JWT
 SECRET_KEY = "sua_chave_secreta_muito_longa_e_unica_aqui_mude_em_producao"
@@ -84,9 +84,17 @@ def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
     if not hashed_password:
         return None
     
-    if not verify_password(password, hashed_password):
+    valid, new_hash = pwd_context.verify_and_update(password[:72], hashed_password)
+    
+    if not valid:
         return None
     
+    # Hash com custo/esquema desatualizado: refaz com os parâmetros atuais
+    if new_hash:
+        db.update_user(user_data["id"], {"senha": new_hash})
+        user_data.pop("hashed_password", None)
+        user_data["senha"] = new_hash
+    
     return user_data
 
 
@@ -123,17 +131,3 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Use
     user_data.pop("hashed_password", None)
     
     return User(**user_data)
-
-
-# ====================================================================
-# VERIFICAÇÃO DE ADMIN
-# ====================================================================
-
-async def get_current_admin(current_user: Annotated[User, Depends(get_current_user)]) -> User:
-    """Verifica se o usuário atual é admin"""
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Acesso negado. Requer privilégios de administrador."
-        )
-    return current_user
@@ -0,0 +1,434 @@
+"""
+AVAILABILITY.PY - ÍNDICE DE DISPONIBILIDADE DOS PROFISSIONAIS
+=============================================================
+Intervalos ocupados por (profissional, dia), mantidos em memória.
+
+- Construído uma vez a partir de appointments.json
+- Atualizado incrementalmente pelas mutações do db (criar, cancelar, reagendar)
+- Reconstruído se o arquivo for alterado por outro caminho (mtime/tamanho)
+- Ocorrências de regras recorrentes expandidas só nos dias consultados
+- Conflitos respondidos com bisect em O(log n) por dia
+- Agendamentos que passam da meia-noite são partidos por dia: cada dia
+  tocado vê a sua parte
+- Grelhas de horários livres calculadas sobre o bitset do dia (slot_calendar)
+"""
+
+import re
+import threading
+import unicodedata
+import uuid
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .database import db
+from .recurrence import recurrence_rules
+from .salon_time import appointment_epoch, local_naive
+from .schedule_templates import schedule_templates
+from .slot_calendar import (
+    FULL_DAY_MASK, QUANTUM_MINUTES, fits_mask, duration_to_quanta,
+    minutes_to_quantum, span_mask
+)
+
+
+# Estados que libertam o horário
+CANCELLED_STATUSES = {"cancelado", "cancelled"}
+
+DEFAULT_DURATION_MINUTES = 60
+
+MINUTES_PER_DAY = 24 * 60
+
+# Grelha de inícios usada na pesquisa de horários livres
+SLOT_STEP_MINUTES = 30
+
+
+# ====================================================================
+# FUNÇÕES AUXILIARES
+# ====================================================================
+
+def appointment_duration(appointment: Dict) -> int:
+    """
+    Duração de um agendamento em minutos.
+
+    Aceita os dois formatos em uso: total_duration (fluxo prepare/schedule)
+    ou soma de servicos[].duracao_estimada (fluxo com modelos Appointment).
+    """
+    total = appointment.get("total_duration")
+    if total:
+        return int(total)
+
+    servicos = appointment.get("servicos") or []
+    if servicos:
+        return sum(int(s.get("duracao_estimada", DEFAULT_DURATION_MINUTES)) for s in servicos)
+
+    details = appointment.get("services_details") or []
+    if details:
+        return sum(int(s.get("duration", 0)) for s in details) or DEFAULT_DURATION_MINUTES
+
+    return DEFAULT_DURATION_MINUTES
+
+
+def appointment_interval(appointment: Dict) -> Optional[Tuple[str, str, int, int]]:
+    """
+    (profissional, dia ISO, início, fim) em minutos desde a meia-noite.
+
+    Devolve None para agendamentos cancelados ou com data inválida.
+    """
+    if appointment.get("status") in CANCELLED_STATUSES:
+        return None
+
+    professional_id = appointment.get("profissional_id")
+    ts = appointment_epoch(appointment)
+    if ts is None or not professional_id:
+        return None
+
+    # Dia e minutos na hora de parede do salão (data_hora_ts é UTC)
+    start_dt = local_naive(ts)
+
+    start = start_dt.hour * 60 + start_dt.minute
+    return str(professional_id), start_dt.date().isoformat(), start, start + appointment_duration(appointment)
+
+
+def day_pieces(start_dt: datetime, duration: int) -> List[Tuple[str, int, int]]:
+    """
+    (dia ISO, início, fim) em minutos desde a meia-noite de cada dia tocado
+    pelo intervalo: um serviço das 23:00 às 01:00 dá (dia, 1380, 1440) e
+    (dia seguinte, 0, 60).
+    """
+    day = start_dt.date()
+    start = start_dt.hour * 60 + start_dt.minute
+    end = start + max(duration, 0)
+    pieces = [(day.isoformat(), start, min(end, MINUTES_PER_DAY))]
+    while end > MINUTES_PER_DAY:
+        day += timedelta(days=1)
+        end -= MINUTES_PER_DAY
+        pieces.append((day.isoformat(), 0, min(end, MINUTES_PER_DAY)))
+    return pieces
+
+
+def _format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _normalize_text(text: str) -> str:
+    """Minúsculas e sem acentos, para comparar serviços com especialidades"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def _words(text: str) -> Tuple[str, ...]:
+    return tuple(re.findall(r"\w+", _normalize_text(text)))
+
+
+def _contains_words(haystack: Tuple[str, ...], needle: Tuple[str, ...]) -> bool:
+    """needle aparece em haystack como sequência de palavras inteiras"""
+    n = len(needle)
+    return any(haystack[i:i + n] == needle for i in range(len(haystack) - n + 1))
+
+
+def professional_offers(professional: Dict, servico: Optional[str]) -> bool:
+    """
+    Indica se o profissional faz o serviço, comparando palavras inteiras nos
+    dois sentidos: "mechas" casa com "mechas", "hidratação" com "hidratação
+    profunda" e "corte feminino com mechas" com "mechas"; "luz" não casa com
+    "luzes" e especialidades vazias não casam com nada.
+    """
+    wanted = _words(servico)
+    if not wanted:
+        return True
+    for especialidade in professional.get("especialidades", []):
+        offered = _words(especialidade)
+        if offered and (_contains_words(offered, wanted) or _contains_words(wanted, offered)):
+            return True
+    return False
+
+
+# ====================================================================
+# INTERVALOS DE UM DIA
+# ====================================================================
+
+class DayIntervals:
+    """
+    Intervalos ocupados de um profissional num dia, ordenados pelo início.
+
+    max_ends[i] guarda o maior fim entre os intervalos 0..i, o que permite
+    detetar sobreposições com um único bisect mesmo que existam registos
+    antigos sobrepostos entre si. busy_mask é o mesmo dia em bitset e
+    booked_minutes o contador de ocupação usado na atribuição automática.
+    """
+
+    __slots__ = ("intervals", "starts", "max_ends", "busy_mask", "booked_minutes")
+
+    def __init__(self):
+        self.intervals: List[Tuple[int, int, str]] = []
+        self.starts: List[int] = []
+        self.max_ends: List[int] = []
+        self.busy_mask = 0
+        self.booked_minutes = 0
+
+    def _rebuild_max_ends(self):
+        running = -1
+        self.max_ends = []
+        self.busy_mask = 0
+        self.booked_minutes = 0
+        for start, end, _ in self.intervals:
+            running = max(running, end)
+            self.max_ends.append(running)
+            self.busy_mask |= span_mask(start, end)
+            self.booked_minutes += end - start
+
+    def add(self, start: int, end: int, appointment_id: str):
+        insort(self.intervals, (start, end, appointment_id))
+        self.starts = [i[0] for i in self.intervals]
+        self._rebuild_max_ends()
+
+    def remove(self, appointment_id: str):
+        self.intervals = [i for i in self.intervals if i[2] != appointment_id]
+        self.starts = [i[0] for i in self.intervals]
+        self._rebuild_max_ends()
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Existe algum intervalo com início < end e fim > start?"""
+        idx = bisect_left(self.starts, end)
+        return idx > 0 and self.max_ends[idx - 1] > start
+
+    def find_conflict(self, start: int, end: int,
+                      exclude_id: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """
+        Devolve o primeiro intervalo em conflito, se existir.
+        exclude_id ignora um agendamento (o próprio, num reagendamento).
+        """
+        if not self.overlaps(start, end):
+            return None
+        idx = bisect_left(self.starts, end)
+        for apt_start, apt_end, appointment_id in self.intervals[:idx]:
+            if apt_end > start and appointment_id != exclude_id:
+                return apt_start, apt_end
+        return None
+
+    def __len__(self):
+        return len(self.intervals)
+
+
+# ====================================================================
+# ÍNDICE
+# ====================================================================
+
+class AvailabilityIndex:
+    """Índice (profissional, dia) -> DayIntervals, partilhado pelo processo"""
+
+    def __init__(self, database=db):
+        self.db = database
+        self._lock = threading.RLock()
+        self._days: Dict[Tuple[str, str], DayIntervals] = {}
+        # Agendamento -> dias (profissional, dia) onde tem partes
+        self._locations: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+        self._expanded: Set[Tuple[str, str]] = set()
+        self._stamp = None
+        self._recurrence_stamp = None
+        self._loaded = False
+
+        # Versões para ETags: instância (outros workers têm outra), geração
+        # (cada reconstrução) e contadores por dia
+        self._instance = uuid.uuid4().hex[:8]
+        self._generation = 0
+        self._day_versions: Dict[Tuple[str, str], int] = {}
+        self._date_versions: Dict[str, int] = {}
+
+        database.add_listener("appointments", self._on_appointment_change)
+
+    # ----- construção -----
+
+    def _rebuild(self):
+        self._days = {}
+        self._locations = {}
+        self._expanded = set()
+        for appointment in self.db.get_all_appointments():
+            self._add(appointment)
+        self._stamp = self.db._file_stamp("appointments")
+        self._recurrence_stamp = recurrence_rules.stamp()
+        self._loaded = True
+        self._generation += 1
+        self._day_versions = {}
+        self._date_versions = {}
+
+    def ensure_fresh(self):
+        """Reconstrói se o arquivo foi alterado fora do db (ex: outro worker)"""
+        with self._lock:
+            if (not self._loaded
+                    or self.db._file_stamp("appointments") != self._stamp
+                    or recurrence_rules.stamp() != self._recurrence_stamp):
+                self._rebuild()
+
+    def _day_intervals(self, professional_id: str, day: str) -> Optional[DayIntervals]:
+        """
+        DayIntervals do dia, expandindo as ocorrências recorrentes na 1ª
+        consulta (também as da véspera, que podem passar da meia-noite)
+        """
+        key = (str(professional_id), day)
+        if key not in self._expanded:
+            with self._lock:
+                if key not in self._expanded:
+                    self._expanded.add(key)
+                    target = date.fromisoformat(day)
+                    for occurrence_day in (target - timedelta(days=1), target):
+                        for occurrence in recurrence_rules.occurrences_on(key[0], occurrence_day):
+                            if occurrence.get("id") not in self._locations:
+                                self._add(occurrence)
+        return self._days.get(key)
+
+    # ----- mutações -----
+
+    def _add(self, appointment: Dict):
+        interval = appointment_interval(appointment)
+        appointment_id = appointment.get("id")
+        if interval is None or not appointment_id:
+            return
+
+        professional_id, _, _, _ = interval
+        start_dt = local_naive(appointment_epoch(appointment))
+        keys = []
+        for day, start, end in day_pieces(start_dt, appointment_duration(appointment)):
+            key = (professional_id, day)
+            self._days.setdefault(key, DayIntervals()).add(start, end, appointment_id)
+            keys.append(key)
+        self._locations[appointment_id] = tuple(keys)
+
+    def _remove(self, appointment_id: str):
+        for key in self._locations.pop(appointment_id, ()):
+            if key in self._days:
+                self._days[key].remove(appointment_id)
+                if not self._days[key]:
+                    del self._days[key]
+
+    def _bump(self, keys: Iterable[Tuple[str, str]]):
+        for key in keys:
+            self._day_versions[key] = self._day_versions.get(key, 0) + 1
+            self._date_versions[key[1]] = self._date_versions.get(key[1], 0) + 1
+
+    def upsert(self, appointment: Dict):
+        """Aplica criação, cancelamento ou reagendamento de um agendamento"""
+        with self._lock:
+            if not self._loaded:
+                return
+            self._bump(self._locations.get(appointment.get("id"), ()))
+            self._remove(appointment.get("id"))
+            self._add(appointment)
+            self._bump(self._locations.get(appointment.get("id"), ()))
+
+    def _on_appointment_change(self, action: str, appointment: Dict):
+        with self._lock:
+            if not self._loaded:
+                return
+            self.upsert(appointment)
+            self._stamp = self.db._file_stamp("appointments")
+
+    # ----- consultas -----
+
+    def day_version(self, professional_id: str, day: str) -> str:
+        """Versão da ocupação do profissional no dia (muda a cada alteração)"""
+        self.ensure_fresh()
+        return f"{self._instance}.{self._generation}.{self._day_versions.get((str(professional_id), day), 0)}"
+
+    def date_version(self, day: str) -> str:
+        """Versão da ocupação de todos os profissionais no dia"""
+        self.ensure_fresh()
+        return f"{self._instance}.{self._generation}.{self._date_versions.get(day, 0)}"
+
+    def day(self, professional_id: str, day: str) -> Optional[DayIntervals]:
+        """Intervalos ocupados do profissional no dia (None se livre)"""
+        self.ensure_fresh()
+        return self._day_intervals(professional_id, day)
+
+    def busy_mask(self, professional_id: str, day: str) -> int:
+        """Bitset dos quanta ocupados do profissional no dia"""
+        intervals = self.day(professional_id, day)
+        return intervals.busy_mask if intervals else 0
+
+    def booked_minutes(self, professional_id: str, day: str) -> int:
+        """Minutos já marcados para o profissional no dia"""
+        intervals = self.day(professional_id, day)
+        return intervals.booked_minutes if intervals else 0
+
+    def find_conflict(self, professional_id: str, start_dt: datetime,
+                      duration: int, exclude_id: Optional[str] = None) -> Optional[str]:
+        """
+        Verifica conflito para um novo agendamento (em todos os dias que
+        toca, se passar da meia-noite). exclude_id: agendamento a ignorar
+        (o que está a ser reagendado).
+
+        Returns:
+            "HH:MM - HH:MM" do agendamento em conflito, ou None
+        """
+        for day, start, end in day_pieces(start_dt, duration):
+            intervals = self.day(professional_id, day)
+            conflict = intervals.find_conflict(start, end, exclude_id) if intervals else None
+            if conflict is not None:
+                return f"{_format_minutes(conflict[0])} - {_format_minutes(conflict[1])}"
+        return None
+
+    def free_starts(self, professional_id: str, day: date,
+                    candidates: Iterable[datetime], duration: int,
+                    open_mask: int = FULL_DAY_MASK) -> List[Tuple[datetime, bool]]:
+        """Para cada início candidato, indica se cabe um serviço de `duration` minutos"""
+        fits = fits_mask(
+            open_mask & ~self.busy_mask(professional_id, day.isoformat()),
+            duration_to_quanta(duration)
+        )
+        return [
+            (candidate, bool(fits >> minutes_to_quantum(candidate.hour * 60 + candidate.minute) & 1))
+            for candidate in candidates
+        ]
+
+    def earliest_slots(self, professional_ids: List[str], first_day: date, last_day: date,
+                       duration: int, limit: int, step: int = SLOT_STEP_MINUTES,
+                       not_before: Optional[datetime] = None) -> List[Tuple[datetime, str]]:
+        """
+        Primeiros `limit` horários livres entre vários profissionais e dias.
+
+        Para cada dia calcula, por profissional, o bitset dos inícios onde
+        o serviço cabe dentro do horário do profissional (schedule_templates);
+        depois percorre os inícios da grelha por ordem
+        cronológica, por isso os primeiros resultados já são os mais cedo
+        e a pesquisa pára aí.
+        """
+        self.ensure_fresh()
+        found: List[Tuple[datetime, str]] = []
+        length = duration_to_quanta(duration)
+        step_quanta = max(1, step // QUANTUM_MINUTES)
+        day = first_day
+
+        while day <= last_day and len(found) < limit:
+            day_iso = day.isoformat()
+            day_start = datetime.combine(day, datetime.min.time())
+            fits = []
+            for pid in professional_ids:
+                intervals = self._day_intervals(pid, day_iso)
+                busy = intervals.busy_mask if intervals else 0
+                open_mask = schedule_templates.open_mask(pid, day)
+                fits.append((pid, fits_mask(open_mask & ~busy, length)))
+
+            any_fit = 0
+            for _, mask in fits:
+                any_fit |= mask
+
+            for q in range(0, any_fit.bit_length(), step_quanta):
+                if not (any_fit >> q) & 1:
+                    continue
+                candidate = day_start + timedelta(minutes=q * QUANTUM_MINUTES)
+                if not_before and candidate < not_before:
+                    continue
+
+                for professional_id, mask in fits:
+                    if (mask >> q) & 1:
+                        found.append((candidate, professional_id))
+                        if len(found) >= limit:
+                            return found
+
+            day += timedelta(days=1)
+
+        return found
+
+
+# Instância global
+availability_index = AvailabilityIndex()
@@ -0,0 +1,129 @@
+"""
+AVAILABILITY_CACHE.PY - CACHE DE HORÁRIOS LIVRES
+================================================
+Resultados de free_starts por (profissional, dia, duração em quanta, grelha).
+
+- Cada entrada guarda a versão do dia do profissional
+  (availability_index.day_version) e a dos modelos de horário; uma
+  mutação nesse profissional-dia muda a versão e só essa entrada é
+  recalculada no pedido seguinte
+- Durações com o mesmo número de quanta partilham a entrada (o resultado
+  é idêntico)
+- Aquecida em segundo plano no arranque para os próximos 14 dias
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Iterable, Optional, Tuple
+
+from .availability import SLOT_STEP_MINUTES, AvailabilityIndex, availability_index
+from .database import db
+from .salon_time import salon_now
+from .schedule_templates import ScheduleTemplates, schedule_templates
+from .slot_calendar import duration_to_quanta, free_starts, grid_mask
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+MAX_ENTRIES = 50_000
+PREWARM_DAYS = 14
+
+# Durações aquecidas no arranque (as mais pedidas pelo frontend)
+PREWARM_DURATIONS = (30, 60, 90)
+
+
+class AvailabilityCache:
+    """LRU de bitsets (inícios livres, inícios dentro do horário) por dia"""
+
+    def __init__(self, database=db, index: AvailabilityIndex = availability_index,
+                 templates: ScheduleTemplates = schedule_templates,
+                 max_entries: int = MAX_ENTRIES):
+        self.db = database
+        self.index = index
+        self.templates = templates
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Tuple[Tuple[str, str], int, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _version(self, professional_id: str, day: str) -> Tuple[str, str]:
+        return (
+            self.index.day_version(professional_id, day),
+            self.db.collection_version("schedule_templates"),
+        )
+
+    def starts(self, professional_id: str, day: date, duration: int,
+               step_minutes: int = SLOT_STEP_MINUTES) -> Tuple[int, int]:
+        """
+        (inícios livres, inícios dentro do horário) do profissional no dia,
+        em bitset, para um serviço de `duration` minutos.
+        """
+        professional_id = str(professional_id)
+        day_iso = day.isoformat()
+        key = (professional_id, day_iso, duration_to_quanta(duration), step_minutes)
+        # Versão lida antes do cálculo: uma escrita concorrente nunca fica
+        # escondida atrás de uma versão nova
+        version = self._version(professional_id, day_iso)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        open_mask = self.templates.open_mask(professional_id, day)
+        busy = self.index.busy_mask(professional_id, day_iso)
+        grid = grid_mask(step_minutes)
+        available = free_starts(busy, open_mask, duration, grid)
+        opening = free_starts(0, open_mask, duration, grid)
+
+        with self._lock:
+            self._entries[key] = (version, available, opening)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return available, opening
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ----- aquecimento -----
+
+    def prewarm(self, days: int = PREWARM_DAYS, durations: Iterable[int] = PREWARM_DURATIONS,
+                first_day: Optional[date] = None) -> int:
+        """Calcula as entradas dos próximos `days` dias para os profissionais ativos"""
+        first_day = first_day or salon_now().date()
+        professionals = [
+            str(p["id"]) for p in self.db.get_all_professionals() if p.get("is_active", True)
+        ]
+        computed = 0
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            for professional_id in professionals:
+                for duration in durations:
+                    self.starts(professional_id, day, duration)
+                    computed += 1
+        return computed
+
+    def start_prewarm(self, days: int = PREWARM_DAYS) -> threading.Thread:
+        """Aquece a cache numa thread em segundo plano (não atrasa o arranque)"""
+        def run():
+            try:
+                computed = self.prewarm(days)
+                print(f"🔥 Cache de disponibilidade aquecida: {computed} entradas ({days} dias)")
+            except Exception as e:
+                print(f"⚠️ Erro ao aquecer a cache de disponibilidade: {e}")
+
+        thread = threading.Thread(target=run, name="availability-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+
+# Instância global
+availability_cache = AvailabilityCache()
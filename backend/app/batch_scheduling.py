@@ -0,0 +1,85 @@
+"""
+BATCH_SCHEDULING.PY - VALIDAÇÃO DE AGENDAMENTOS EM LOTE
+=======================================================
+Valida centenas de agendamentos numa única passagem sobre os bitsets
+dos dias (slot_calendar), sem gravar nada.
+
+- Cada (profissional, dia) é lido uma vez do índice e do modelo de horário
+- Os itens aceites vão sendo marcados na cópia de trabalho da máscara,
+  por isso conflitos entre itens do mesmo lote também são detetados
+- Itens sem profissional recebem o candidato livre menos ocupado,
+  contando já com o que o lote marcou
+
+A gravação (uma única escrita) fica a cargo do router.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .assignment import AssignmentEngine, assignment_engine
+from .availability import AvailabilityIndex, availability_index
+from .booking_holds import SlotHoldRegistry, slot_holds
+from .schedule_templates import ScheduleTemplates, schedule_templates
+from .slot_calendar import time_mask
+
+
+MAX_BATCH_SIZE = 500
+
+
+class BatchPlanner:
+    """Planeia um lote sobre cópias das máscaras ocupadas"""
+
+    def __init__(self, index: AvailabilityIndex = availability_index,
+                 templates: ScheduleTemplates = schedule_templates,
+                 holds: SlotHoldRegistry = slot_holds,
+                 engine: AssignmentEngine = assignment_engine):
+        self.index = index
+        self.templates = templates
+        self.holds = holds
+        self.engine = engine
+        self._working: Dict[Tuple[str, str], int] = {}
+
+    def candidate_ids(self, professional_id: Optional[str], servicos: List[str]) -> List[str]:
+        """Profissionais a considerar para um item"""
+        if professional_id:
+            return [str(professional_id)]
+        candidatos = self.engine.candidates(servicos) or self.engine.candidates([])
+        return [str(p["id"]) for p in candidatos]
+
+    def _busy(self, professional_id: str, day: str) -> int:
+        key = (professional_id, day)
+        if key not in self._working:
+            self._working[key] = self.index.busy_mask(professional_id, day)
+        return self._working[key]
+
+    def place(self, start: datetime, duration: int, candidates: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Marca o item no profissional livre menos ocupado.
+
+        Returns:
+            (profissional, None) se aceite, ou (None, motivo da recusa)
+        """
+        day = start.date()
+        day_iso = day.isoformat()
+        needed = time_mask(start, duration)
+        reason = "Nenhum profissional disponível neste horário"
+        best = None
+
+        for professional_id in candidates:
+            if needed & ~self.templates.open_mask(professional_id, day):
+                reason = "Horário fora do período de atendimento do profissional"
+                continue
+            busy = self._busy(professional_id, day_iso)
+            if needed & busy or self.holds.is_held(professional_id, start, duration):
+                reason = "Horário ocupado"
+                continue
+            load = bin(busy).count("1")
+            if best is None or load < best[0]:
+                best = (load, professional_id)
+
+        if best is None:
+            return None, reason
+
+        professional_id = best[1]
+        self._working[(professional_id, day_iso)] |= needed
+        return professional_id, None
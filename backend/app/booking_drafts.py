@@ -0,0 +1,263 @@
+"""
+BOOKING_DRAFTS.PY - RASCUNHOS DE AGENDAMENTO
+============================================
+Guarda os dados de /prepare até ao /schedule correspondente.
+
+- Cada rascunho expira ao fim de DRAFT_TTL_SECONDS
+- O número de rascunhos é limitado (os mais antigos saem primeiro)
+- Backend "memory": dicionário do processo, para desenvolvimento
+- Backend "sqlite": arquivo em data/, sobrevive a reinícios e é
+  partilhado pelos vários workers do uvicorn
+
+O backend é escolhido pela variável de ambiente BOOKING_DRAFTS_BACKEND.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+DRAFT_TTL_SECONDS = 2 * 60 * 60
+DRAFT_MAX_ENTRIES = 10_000
+DRAFTS_DB_FILE = os.path.join("data", "booking_drafts.sqlite3")
+
+
+# ====================================================================
+# INTERFACE
+# ====================================================================
+
+class DraftStore(ABC):
+    """Interface comum dos backends"""
+
+    @abstractmethod
+    def get(self, booking_code: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def put(self, booking_code: str, draft: Dict):
+        """Grava o rascunho com um TTL novo"""
+        ...
+
+    @abstractmethod
+    def update(self, booking_code: str, **fields) -> Optional[Dict]:
+        """
+        Atualiza campos de um rascunho existente (None se não existir).
+        Mantém a expiração original: atualizar não prolonga o rascunho.
+        """
+        ...
+
+    @abstractmethod
+    def delete(self, booking_code: str):
+        ...
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+# ====================================================================
+# BACKEND EM MEMÓRIA
+# ====================================================================
+
+class MemoryDraftStore(DraftStore):
+    """Rascunhos num OrderedDict por ordem de gravação"""
+
+    def __init__(self, ttl_seconds: int = DRAFT_TTL_SECONDS,
+                 max_entries: int = DRAFT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._drafts: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+    def get(self, booking_code: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._drafts.get(booking_code)
+            if entry is None:
+                return None
+            expires_at, draft = entry
+            if expires_at <= time.time():
+                del self._drafts[booking_code]
+                return None
+            return dict(draft)
+
+    def put(self, booking_code: str, draft: Dict):
+        with self._lock:
+            self._drafts.pop(booking_code, None)
+            self._drafts[booking_code] = (time.time() + self.ttl_seconds, dict(draft))
+            while len(self._drafts) > self.max_entries:
+                self._drafts.popitem(last=False)
+
+    def update(self, booking_code: str, **fields) -> Optional[Dict]:
+        with self._lock:
+            entry = self._drafts.get(booking_code)
+            if entry is None or entry[0] <= time.time():
+                return None
+            # Mesma posição e mesma expiração
+            expires_at, draft = entry
+            draft = {**draft, **fields}
+            self._drafts[booking_code] = (expires_at, draft)
+            return dict(draft)
+
+    def delete(self, booking_code: str):
+        with self._lock:
+            self._drafts.pop(booking_code, None)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            # Ordem de gravação = ordem de expiração (TTL fixo)
+            removed = 0
+            while self._drafts:
+                code, (expires_at, _) = next(iter(self._drafts.items()))
+                if expires_at > now:
+                    break
+                del self._drafts[code]
+                removed += 1
+            return removed
+
+    def __len__(self) -> int:
+        self.purge_expired()
+        return len(self._drafts)
+
+
+# ====================================================================
+# BACKEND SQLITE
+# ====================================================================
+
+class SQLiteDraftStore(DraftStore):
+    """
+    Rascunhos numa tabela SQLite (modo WAL).
+
+    Vários processos podem ler e escrever no mesmo arquivo; cada
+    thread usa a sua própria ligação.
+    """
+
+    def __init__(self, path: str = DRAFTS_DB_FILE, ttl_seconds: int = DRAFT_TTL_SECONDS,
+                 max_entries: int = DRAFT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS booking_drafts (
+                    booking_code TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_booking_drafts_expires "
+                "ON booking_drafts (expires_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, booking_code: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT data FROM booking_drafts WHERE booking_code = ? AND expires_at > ?",
+            (booking_code, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, booking_code: str, draft: Dict):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO booking_drafts (booking_code, data, expires_at) "
+                "VALUES (?, ?, ?)",
+                (booking_code, json.dumps(draft, ensure_ascii=False), time.time() + self.ttl_seconds)
+            )
+            self._enforce_bounds(conn)
+
+    def update(self, booking_code: str, **fields) -> Optional[Dict]:
+        conn = self._connection()
+        with conn:
+            # Leitura e escrita na mesma transação (outros workers esperam)
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT data FROM booking_drafts WHERE booking_code = ? AND expires_at > ?",
+                (booking_code, time.time())
+            ).fetchone()
+            if row is None:
+                return None
+            draft = {**json.loads(row[0]), **fields}
+            conn.execute(
+                "UPDATE booking_drafts SET data = ? WHERE booking_code = ?",
+                (json.dumps(draft, ensure_ascii=False), booking_code)
+            )
+        return draft
+
+    def _enforce_bounds(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM booking_drafts WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            """
+            DELETE FROM booking_drafts WHERE booking_code IN (
+                SELECT booking_code FROM booking_drafts
+                ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,)
+        )
+
+    def delete(self, booking_code: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM booking_drafts WHERE booking_code = ?", (booking_code,))
+
+    def purge_expired(self) -> int:
+        with self._connection() as conn:
+            cursor = conn.execute("DELETE FROM booking_drafts WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM booking_drafts WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return row[0]
+
+
+# ====================================================================
+# FÁBRICA
+# ====================================================================
+
+def create_draft_store(backend: Optional[str] = None) -> DraftStore:
+    """Cria o backend indicado ("memory" ou "sqlite")"""
+    backend = (backend or os.getenv("BOOKING_DRAFTS_BACKEND", "sqlite")).lower()
+
+    if backend == "memory":
+        return MemoryDraftStore()
+    if backend == "sqlite":
+        try:
+            return SQLiteDraftStore()
+        except sqlite3.Error as e:
+            print(f"⚠️ SQLite indisponível para rascunhos ({e}); a usar memória")
+            return MemoryDraftStore()
+
+    raise ValueError(f"Backend de rascunhos desconhecido: {backend}")
+
+
+# Instância global
+booking_drafts = create_draft_store()
@@ -0,0 +1,268 @@
+"""
+BOOKING_HOLDS.PY - RESERVAS TEMPORÁRIAS DE HORÁRIOS
+===================================================
+Entre /prepare e /schedule o cliente pode segurar um horário por alguns
+minutos. A reserva é convertida em agendamento com compare-and-set sobre
+a versão do calendário do profissional.
+
+- Reservas expiram sozinhas (heap ordenado pela expiração)
+- Cada profissional tem o seu lock e a sua versão: não há lock global
+- Se a versão não mudou desde a reserva, a conversão não precisa de
+  revalidar; se mudou, revalida contra o índice antes de gravar
+"""
+
+import heapq
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from .availability import AvailabilityIndex, availability_index
+from .slot_calendar import span_mask
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+HOLD_TTL_SECONDS = 5 * 60
+
+T = TypeVar("T")
+
+
+class SlotUnavailableError(Exception):
+    """Horário ocupado por um agendamento ou por outra reserva"""
+    pass
+
+
+class HoldNotFoundError(Exception):
+    """Reserva inexistente, expirada ou de outro horário"""
+    pass
+
+
+# ====================================================================
+# REGISTO DE RESERVAS
+# ====================================================================
+
+class SlotHoldRegistry:
+    """Reservas ativas em memória, com expiração e versão por profissional"""
+
+    def __init__(self, index: AvailabilityIndex = availability_index,
+                 ttl_seconds: int = HOLD_TTL_SECONDS):
+        self.index = index
+        self.ttl_seconds = ttl_seconds
+
+        self._holds: Dict[str, Dict] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._by_day: Dict[Tuple[str, str], Set[str]] = {}
+        self._versions: Dict[str, int] = {}
+
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._heap_lock = threading.Lock()
+
+    # ----- infraestrutura -----
+
+    def _lock_for(self, professional_id: str) -> threading.Lock:
+        lock = self._locks.get(professional_id)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(professional_id, threading.Lock())
+        return lock
+
+    def version(self, professional_id: str) -> int:
+        """Versão atual do calendário do profissional"""
+        return self._versions.get(professional_id, 0)
+
+    def _bump(self, professional_id: str):
+        self._versions[professional_id] = self.version(professional_id) + 1
+
+    def _drop(self, hold_id: str) -> Optional[Dict]:
+        hold = self._holds.pop(hold_id, None)
+        if hold:
+            key = (hold["professional_id"], hold["day"])
+            self._by_day.get(key, set()).discard(hold_id)
+        return hold
+
+    def purge_expired(self, now: Optional[float] = None):
+        """Remove reservas expiradas (O(k log n) para k expiradas)"""
+        now = now if now is not None else time.monotonic()
+        with self._heap_lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                _, hold_id = heapq.heappop(self._expiry_heap)
+                hold = self._holds.get(hold_id)
+                if hold and hold["expires_monotonic"] <= now:
+                    self._drop(hold_id)
+
+    @staticmethod
+    def _minutes(start: datetime) -> int:
+        return start.hour * 60 + start.minute
+
+    def _conflicting_hold(self, professional_id: str, start: datetime, duration: int,
+                          exclude_hold_id: Optional[str] = None) -> Optional[Dict]:
+        key = (professional_id, start.date().isoformat())
+        begin = self._minutes(start)
+        end = begin + duration
+        for hold_id in list(self._by_day.get(key, ())):
+            if hold_id == exclude_hold_id:
+                continue
+            hold = self._holds.get(hold_id)
+            if hold and hold["start_minutes"] < end and hold["end_minutes"] > begin:
+                return hold
+        return None
+
+    def _check_free(self, professional_id: str, start: datetime, duration: int,
+                    exclude_hold_id: Optional[str] = None, soft_mask: int = 0,
+                    exclude_appointment_id: Optional[str] = None):
+        if soft_mask:
+            # Overbooking: só os quanta fora de soft_mask têm de estar livres
+            begin = self._minutes(start)
+            busy = self.index.busy_mask(professional_id, start.date().isoformat())
+            if busy & ~soft_mask & span_mask(begin, begin + duration):
+                raise SlotUnavailableError("Horário ocupado (sem margem para overbooking)")
+        else:
+            conflict = self.index.find_conflict(professional_id, start, duration,
+                                                exclude_id=exclude_appointment_id)
+            if conflict:
+                raise SlotUnavailableError(f"Horário ocupado: {conflict}")
+
+        if self._conflicting_hold(professional_id, start, duration, exclude_hold_id):
+            raise SlotUnavailableError("Horário reservado temporariamente por outro cliente")
+
+    def get(self, hold_id: str) -> Optional[Dict]:
+        """Reserva ativa pelo id (None se não existir ou tiver expirado)"""
+        self.purge_expired()
+        return self._holds.get(hold_id)
+
+    def is_held(self, professional_id: str, start: datetime, duration: int) -> bool:
+        """Indica se outra reserva ativa ocupa parte do intervalo"""
+        self.purge_expired()
+        return self._conflicting_hold(str(professional_id), start, duration) is not None
+
+    # ----- operações -----
+
+    def place_hold(self, professional_id: str, start: datetime, duration: int,
+                   booking_code: Optional[str] = None) -> Dict:
+        """
+        Reserva o horário por ttl_seconds.
+
+        Raises:
+            SlotUnavailableError: se o horário já estiver ocupado ou reservado
+        """
+        professional_id = str(professional_id)
+        self.purge_expired()
+
+        with self._lock_for(professional_id):
+            self._check_free(professional_id, start, duration)
+
+            hold_id = f"HOLD-{uuid.uuid4().hex[:12].upper()}"
+            expires_monotonic = time.monotonic() + self.ttl_seconds
+            hold = {
+                "hold_id": hold_id,
+                "booking_code": booking_code,
+                "professional_id": professional_id,
+                "day": start.date().isoformat(),
+                "start": start.isoformat(),
+                "start_minutes": self._minutes(start),
+                "end_minutes": self._minutes(start) + duration,
+                "duration": duration,
+                "calendar_version": self.version(professional_id),
+                "expires_at": (datetime.now() + timedelta(seconds=self.ttl_seconds)).isoformat(),
+                "expires_monotonic": expires_monotonic,
+            }
+
+            self._holds[hold_id] = hold
+            self._by_day.setdefault((professional_id, hold["day"]), set()).add(hold_id)
+            with self._heap_lock:
+                heapq.heappush(self._expiry_heap, (expires_monotonic, hold_id))
+
+        return hold
+
+    def release(self, hold_id: str) -> bool:
+        """Liberta uma reserva antes de expirar"""
+        hold = self._holds.get(hold_id)
+        if not hold:
+            return False
+        with self._lock_for(hold["professional_id"]):
+            return self._drop(hold_id) is not None
+
+    def commit(self, professional_id: str, start: datetime, duration: int,
+               persist: Callable[[], T], hold_id: Optional[str] = None,
+               soft_mask: int = 0, exclude_appointment_id: Optional[str] = None) -> T:
+        """
+        Grava o agendamento (persist) se o horário continuar livre.
+
+        Com hold_id: compare-and-set sobre a versão do calendário. Se
+        ninguém gravou neste profissional desde a reserva, a reserva
+        garante o horário e não há revalidação; caso contrário revalida.
+        Sem hold_id: valida contra agendamentos e reservas de outros.
+        soft_mask (overbooking): quanta ocupados que o novo agendamento
+        pode partilhar. exclude_appointment_id: num reagendamento, o
+        próprio agendamento não conta como conflito.
+
+        Raises:
+            HoldNotFoundError: reserva inexistente/expirada/de outro horário
+            SlotUnavailableError: horário entretanto ocupado
+        """
+        professional_id = str(professional_id)
+        self.purge_expired()
+
+        with self._lock_for(professional_id):
+            if hold_id:
+                hold = self._holds.get(hold_id)
+                if (not hold or hold["professional_id"] != professional_id
+                        or hold["start"] != start.isoformat() or hold["duration"] < duration):
+                    raise HoldNotFoundError("Reserva inexistente, expirada ou de outro horário")
+
+                if hold["calendar_version"] != self.version(professional_id):
+                    self._check_free(professional_id, start, duration, exclude_hold_id=hold_id,
+                                     soft_mask=soft_mask)
+            else:
+                self._check_free(professional_id, start, duration, soft_mask=soft_mask,
+                                 exclude_appointment_id=exclude_appointment_id)
+
+            result = persist()
+
+            self._bump(professional_id)
+            if hold_id:
+                self._drop(hold_id)
+
+        return result
+
+    @contextmanager
+    def locked(self, professional_ids: Iterable[str]) -> Iterator[None]:
+        """
+        Bloqueia vários profissionais de uma vez (ex: agendamento em lote).
+
+        Os locks são adquiridos por ordem de id para não haver deadlock
+        com outro lote; à saída as versões dos calendários avançam.
+        """
+        ids = sorted({str(pid) for pid in professional_ids})
+        locks = [self._lock_for(pid) for pid in ids]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+            for pid in ids:
+                self._bump(pid)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def public_view(self, hold: Dict) -> Dict:
+        """Campos da reserva devolvidos ao cliente"""
+        return {
+            "hold_id": hold["hold_id"],
+            "booking_code": hold["booking_code"],
+            "professional_id": hold["professional_id"],
+            "start": hold["start"],
+            "duration": hold["duration"],
+            "calendar_version": hold["calendar_version"],
+            "expires_at": hold["expires_at"],
+        }
+
+
+# Instância global
+slot_holds = SlotHoldRegistry()
@@ -39,6 +39,11 @@ class FeatureFlags(BaseModel):
     
     # Pagamentos
     online_payment_enabled: bool = False
+    
+    # Overbooking (previsão de faltas, app/no_show.py)
+    overbooking_enabled: bool = False
+    overbooking_no_show_threshold: float = 0.35  # Probabilidade mínima de falta do agendamento existente
+    overbooking_max_per_day: int = 1  # Por profissional
 
 
 class APICredentials(BaseModel):
@@ -1,29 +1,25 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List
 from app.models import AppointmentCreate, Appointment
-from app.database import db
+from app.appointment_service import OutsideOpeningHoursError, appointment_service
+from app.booking_holds import SlotUnavailableError
 
 router = APIRouter()
 
 @router.post("/", response_model=Appointment)
 async def create_appointment(appointment: AppointmentCreate):
     """Create a new appointment."""
-    existing_appointments = db.get_appointments_by_datetime(
-        appointment.data_hora.isoformat(),
-        appointment.profissional_id
-    )
-    
-    if existing_appointments:
+    try:
+        new_appointment = appointment_service.create(appointment.dict())
+    except (OutsideOpeningHoursError, SlotUnavailableError):
         raise HTTPException(
             status_code=400,
             detail="Appointment time is already booked."
         )
-    
-    new_appointment = db.create_appointment(appointment.dict())
     return new_appointment
 
 @router.get("/", response_model=List[Appointment])
 async def get_appointments(user_id: str):
     """Get all appointments for a user."""
-    appointments = db.get_user_appointments(user_id)
-    return appointments
\ No newline at end of file
+    appointments = appointment_service.list_for_client(user_id)
+    return appointments
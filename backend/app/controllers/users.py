@@ -1,15 +1,18 @@
 from fastapi import HTTPException, Depends
 from app.models import UserCreate, User
-from app.database import db
+from app.database import db, DuplicateEmailError
 
 def register_user(user: UserCreate):
     existing_user = db.get_user_by_email(user.email)
     if existing_user:
-        raise HTTPException(status_code=400, detail="Email já cadastrado")
+        raise HTTPException(status_code=409, detail="Email já cadastrado")
     
     user_data = user.dict()
     user_data["senha"] = get_password_hash(user_data["senha"])
-    new_user = db.create_user(user_data)
+    try:
+        new_user = db.create_user(user_data)
+    except DuplicateEmailError:
+        raise HTTPException(status_code=409, detail="Email já cadastrado")
     new_user.pop("senha", None)
     return new_user
 
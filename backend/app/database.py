@@ -6,10 +6,30 @@ Gerencia todas as operações de dados
 
 import json
 import os
-from typing import Dict, List, Optional
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from datetime import datetime
 import uuid
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .salon_time import now_epoch, stamp_appointment
+
+
+def normalize_email(email: Optional[str]) -> str:
+    """Normaliza email para comparação (sem espaços, case-folded)"""
+    return (email or "").strip().casefold()
+
+
+class DuplicateEmailError(ValueError):
+    """Email já registado (comparação normalizada)"""
+    pass
+
 
 class JSONDatabase:
     """Sistema de database usando JSON"""
@@ -27,9 +47,31 @@ class JSONDatabase:
             "strand_tests": os.path.join(data_dir, "strand_tests.json"),
             "attendance_records": os.path.join(data_dir, "attendance_records.json"),
             "consultations": os.path.join(data_dir, "consultations.json"),
-            "system_config": os.path.join(data_dir, "system_config.json")
+            "system_config": os.path.join(data_dir, "system_config.json"),
+            "api_keys": os.path.join(data_dir, "api_keys.json"),
+            "schedule_templates": os.path.join(data_dir, "schedule_templates.json"),
+            "waitlist": os.path.join(data_dir, "waitlist.json"),
+            "recurrences": os.path.join(data_dir, "recurrences.json"),
+            "reminders": os.path.join(data_dir, "reminders.json"),
+            "appointment_audit": os.path.join(data_dir, "appointment_audit.json")
         }
         
+        # Índices de utilizadores (reconstruídos se o arquivo mudar fora daqui)
+        self._users_lock = threading.RLock()
+        self._users_by_email: Optional[Dict[str, Dict]] = None
+        self._users_by_id: Dict[str, Dict] = {}
+        self._users_stamp: Optional[Tuple[int, int]] = None
+        
+        # Escritas em appointments.json (append e read-modify-write) em série,
+        # entre threads e, por flock, entre workers
+        self._appointments_lock = threading.RLock()
+        
+        # Observadores de mutações: file_key -> [callback(acao, registo)]
+        self._listeners: Dict[str, List[Callable[[str, Dict], None]]] = {}
+        
+        # Contadores de escrita por coleção (ETags)
+        self._versions: Dict[str, int] = {}
+        
         self._initialize_files()
         self._create_defaults()
     
@@ -128,6 +170,110 @@ class JSONDatabase:
         """Escreve arquivo JSON (lista)"""
         with open(self.files[file_key], 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        self._versions[file_key] = self._versions.get(file_key, 0) + 1
+        
+        if file_key == "users":
+            self._invalidate_user_index()
+    
+    def _append_record(self, file_key: str, record: Union[Dict, List[Dict]]):
+        """
+        Acrescenta um registo (ou uma lista de registos) ao fim do arquivo
+        JSON (lista) sem reescrevê-lo.
+        
+        Mantém o formato de json.dump(indent=2): substitui o "]" final por
+        ",\n  {registo},\n  {registo}\n]" numa única escrita. Custo
+        independente do tamanho do arquivo.
+        """
+        records = record if isinstance(record, list) else [record]
+        if not records:
+            return
+        
+        file_path = self.files[file_key]
+        record_json = ",\n".join(
+            "\n".join("  " + line for line in
+                      json.dumps(r, ensure_ascii=False, indent=2, default=str).splitlines())
+            for r in records
+        )
+        
+        with open(file_path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            
+            # Procura o "]" final (ignorando espaços/quebras no fim)
+            tail_size = min(size, 64)
+            f.seek(size - tail_size)
+            tail = f.read(tail_size)
+            stripped = tail.rstrip()
+            
+            appendable = stripped.endswith(b"]") and not stripped[:-1].rstrip().endswith(b"[")
+            if appendable:
+                f.seek(size - tail_size + len(stripped) - 1)
+                f.truncate()
+                f.write((",\n" + record_json + "\n]").encode("utf-8"))
+        
+        if not appendable:
+            # Lista vazia ou formato inesperado: reescrita completa
+            data = self._read_file(file_key)
+            data.extend(records)
+            self._write_file(file_key, data)
+            return
+        
+        self._versions[file_key] = self._versions.get(file_key, 0) + 1
+    
+    @contextmanager
+    def _file_lock(self, file_key: str):
+        """
+        Lock exclusivo entre processos (vários workers do uvicorn) para um
+        check-and-write numa coleção: flock num arquivo <coleção>.json.lock
+        (msvcrt.locking no Windows). Não substitui os locks entre threads.
+        """
+        with open(self.files[file_key] + ".lock", "a+b") as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    
+    def add_listener(self, file_key: str, callback: Callable[[str, Dict], None]):
+        """
+        Regista um observador das mutações de uma coleção.
+        
+        O callback recebe (acao, registo) com acao "created" ou "updated",
+        depois de o arquivo ter sido escrito.
+        """
+        self._listeners.setdefault(file_key, []).append(callback)
+    
+    def _notify(self, file_key: str, action: str, record: Dict):
+        """Avisa os observadores; falhas num observador não afetam a escrita"""
+        for callback in self._listeners.get(file_key, []):
+            try:
+                callback(action, record)
+            except Exception as e:
+                print(f"⚠️ Erro no observador de {file_key}: {e}")
+    
+    def collection_version(self, file_key: str) -> str:
+        """
+        Versão da coleção sem ler o arquivo: contador de escritas deste
+        processo + (mtime, tamanho), que cobre escritas de outros workers.
+        """
+        stamp = self._file_stamp(file_key) or (0, 0)
+        return f"{self._versions.get(file_key, 0)}.{stamp[0]}.{stamp[1]}"
+    
+    def _file_stamp(self, file_key: str) -> Optional[Tuple[int, int]]:
+        """Assinatura (mtime, tamanho) do arquivo, para detetar escritas externas"""
+        try:
+            stat = os.stat(self.files[file_key])
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
     
     def _read_settings_file(self) -> Dict:
         """Lê settings"""
@@ -205,49 +351,97 @@ class JSONDatabase:
     
     # ===== USERS =====
     
+    def _invalidate_user_index(self):
+        """Força reconstrução dos índices de utilizadores"""
+        with self._users_lock:
+            self._users_by_email = None
+    
+    def _user_index(self) -> Dict[str, Dict]:
+        """Índice email normalizado -> utilizador (reconstruído se o arquivo mudou)"""
+        with self._users_lock:
+            stamp = self._file_stamp("users")
+            if self._users_by_email is None or stamp != self._users_stamp:
+                users = self._read_file("users")
+                self._users_by_email = {}
+                self._users_by_id = {}
+                for user in users:
+                    email = normalize_email(user.get("email"))
+                    if email:
+                        # Mantém o primeiro registo em caso de duplicados antigos
+                        self._users_by_email.setdefault(email, user)
+                    if user.get("id"):
+                        self._users_by_id[user["id"]] = user
+                self._users_stamp = stamp
+            return self._users_by_email
+    
     def create_user(self, user_data: Dict) -> Dict:
-        """Cria usuário"""
-        users = self._read_file("users")
-        user_data["id"] = str(uuid.uuid4())
-        user_data["created_at"] = datetime.now().isoformat()
-        user_data["is_active"] = True
-        if "role" not in user_data:
-            user_data["role"] = "cliente"
-        users.append(user_data)
-        self._write_file("users", users)
+        """
+        Cria usuário.
+        
+        A verificação de email único e a escrita são feitas sob o mesmo
+        lock (entre threads e, por flock, entre workers: o índice é
+        revalidado contra o arquivo já com o lock), e a escrita acrescenta
+        ao arquivo em vez de o reescrever.
+        
+        Raises:
+            DuplicateEmailError: se o email (normalizado) já existir
+        """
+        with self._users_lock, self._file_lock("users"):
+            index = self._user_index()
+            email = normalize_email(user_data.get("email"))
+            
+            if email in index:
+                raise DuplicateEmailError(user_data.get("email"))
+            
+            user_data["id"] = str(uuid.uuid4())
+            user_data["created_at"] = datetime.now().isoformat()
+            user_data["is_active"] = True
+            if "role" not in user_data:
+                user_data["role"] = "cliente"
+            
+            self._append_record("users", user_data)
+            
+            stored = dict(user_data)
+            index[email] = stored
+            self._users_by_id[stored["id"]] = stored
+            self._users_stamp = self._file_stamp("users")
+        
         return user_data
     
     def get_user_by_email(self, email: str) -> Optional[Dict]:
-        """Busca usuário por email"""
-        users = self._read_file("users")
-        return next((u for u in users if u.get("email") == email), None)
+        """Busca usuário por email (sem distinguir maiúsculas)"""
+        user = self._user_index().get(normalize_email(email))
+        return dict(user) if user else None
     
     def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Busca usuário por ID"""
-        users = self._read_file("users")
-        return next((u for u in users if u.get("id") == user_id), None)
+        with self._users_lock:
+            self._user_index()
+            user = self._users_by_id.get(user_id)
+        return dict(user) if user else None
     
     def get_all_users(self) -> List[Dict]:
         """Lista todos os usuários"""
         return self._read_file("users")
     
     def update_user(self, user_id: str, update_data: Dict) -> Optional[Dict]:
-        """Atualiza usuário"""
-        users = self._read_file("users")
-        updated_user = None
-        
-        for i, user in enumerate(users):
-            if user.get("id") == user_id:
-                for key, value in update_data.items():
-                    if value is not None:
-                        user[key] = value
-                user["updated_at"] = datetime.now().isoformat()
-                updated_user = user
-                users[i] = user
-                break
-        
-        if updated_user:
-            self._write_file("users", users)
+        """Atualiza usuário (sob o mesmo lock do registo, para não perder um create_user)"""
+        with self._users_lock, self._file_lock("users"):
+            users = self._read_file("users")
+            updated_user = None
+            
+            for i, user in enumerate(users):
+                if user.get("id") == user_id:
+                    for key, value in update_data.items():
+                        if value is not None:
+                            user[key] = value
+                    user["updated_at"] = datetime.now().isoformat()
+                    updated_user = user
+                    users[i] = user
+                    break
+            
+            if updated_user:
+                self._write_file("users", users)
         return updated_user
     
     def update_user_photo(self, user_id: str, photo_path: str) -> Optional[Dict]:
@@ -274,14 +468,21 @@ class JSONDatabase:
     
     def create_appointment(self, appointment_data: Dict) -> Dict:
         """Cria agendamento"""
-        appointments = self._read_file("appointments")
         appointment_data["id"] = str(uuid.uuid4())
         appointment_data["created_at"] = datetime.now().isoformat()
+        appointment_data["created_at_ts"] = now_epoch()
         if "status" not in appointment_data:
             appointment_data["status"] = "pendente"
-        appointments.append(appointment_data)
-        self._write_file("appointments", appointments)
-        return appointment_data
+        stamp_appointment(appointment_data)
+        return self.create_appointments([appointment_data])[0]
+    
+    def create_appointments(self, appointments: List[Dict]) -> List[Dict]:
+        """Grava registos já preparados numa única escrita (append)"""
+        with self._appointments_lock, self._file_lock("appointments"):
+            self._append_record("appointments", appointments)
+        for appointment in appointments:
+            self._notify("appointments", "created", appointment)
+        return appointments
     
     def get_appointment_by_id(self, appointment_id: str) -> Optional[Dict]:
         """Busca agendamento por ID"""
@@ -321,45 +522,56 @@ class JSONDatabase:
     
     def update_appointment(self, appointment_id: str, update_data: Dict) -> Optional[Dict]:
         """Atualiza agendamento"""
-        appointments = self._read_file("appointments")
-        updated_appointment = None
-        
-        for i, apt in enumerate(appointments):
-            if apt.get("id") == appointment_id:
-                for key, value in update_data.items():
-                    apt[key] = value
-                apt["updated_at"] = datetime.now().isoformat()
-                updated_appointment = apt
-                appointments[i] = apt
-                break
+        with self._appointments_lock, self._file_lock("appointments"):
+            appointments = self._read_file("appointments")
+            updated_appointment = None
+            
+            for i, apt in enumerate(appointments):
+                if apt.get("id") == appointment_id:
+                    for key, value in update_data.items():
+                        apt[key] = value
+                    if "data_hora" in update_data:
+                        stamp_appointment(apt)
+                    apt["updated_at"] = datetime.now().isoformat()
+                    updated_appointment = apt
+                    appointments[i] = apt
+                    break
+            
+            if updated_appointment:
+                self._write_file("appointments", appointments)
         
         if updated_appointment:
-            self._write_file("appointments", appointments)
+            self._notify("appointments", "updated", updated_appointment)
         return updated_appointment
     
     def update_appointment_status(self, appointment_id: str, status: str, profissional_id: Optional[str] = None) -> Optional[Dict]:
         """Atualiza status do agendamento"""
-        appointments = self._read_file("appointments")
-        updated_appointment = None
-        
-        for i, apt in enumerate(appointments):
-            if apt.get("id") == appointment_id:
-                apt["status"] = status
-                apt["updated_at"] = datetime.now().isoformat()
-                
-                if status == "confirmado":
-                    apt["confirmed_at"] = datetime.now().isoformat()
-                    if profissional_id:
-                        apt["confirmed_by"] = profissional_id
-                elif status == "concluido":
-                    apt["completed_at"] = datetime.now().isoformat()
-                
-                updated_appointment = apt
-                appointments[i] = apt
-                break
+        with self._appointments_lock, self._file_lock("appointments"):
+            appointments = self._read_file("appointments")
+            updated_appointment = None
+            
+            for i, apt in enumerate(appointments):
+                if apt.get("id") == appointment_id:
+                    apt["status"] = status
+                    apt["updated_at"] = datetime.now().isoformat()
+                    
+                    if status == "confirmado":
+                        apt["confirmed_at"] = datetime.now().isoformat()
+                        if profissional_id:
+                            apt["confirmed_by"] = profissional_id
+                    elif status == "concluido":
+                        apt["completed_at"] = datetime.now().isoformat()
+                        apt["completed_at_ts"] = now_epoch()
+                    
+                    updated_appointment = apt
+                    appointments[i] = apt
+                    break
+            
+            if updated_appointment:
+                self._write_file("appointments", appointments)
         
         if updated_appointment:
-            self._write_file("appointments", appointments)
+            self._notify("appointments", "updated", updated_appointment)
         return updated_appointment
     
     # ===== MEDICAL HISTORY =====
@@ -0,0 +1,38 @@
+"""
+ETAGS.PY - GET CONDICIONAL (ETag / If-None-Match)
+=================================================
+ETags fortes calculados só a partir de versões (db.collection_version,
+availability_index.day_version, ...), por isso o 304 é decidido antes de
+ler ou serializar qualquer dado.
+
+Uso num endpoint:
+
+    etag = make_etag("professionals", db.collection_version("professionals"))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+"""
+
+import hashlib
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    """ETag forte a partir das partes que determinam a resposta"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match contém o ETag atual (ou "*")?"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    # Comparação fraca, como pede o RFC 9110 para If-None-Match
+    return "*" in candidates or etag in (c[2:] if c.startswith("W/") else c for c in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -15,6 +15,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 import json
 
+from .salon_time import SALON_TIMEZONE_NAME, appointment_epoch, to_local
+
 # Escopos necessários para o Google Calendar
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
@@ -111,11 +113,11 @@ class GoogleCalendarIntegration:
             'location': location or '',
             'start': {
                 'dateTime': start_time.isoformat(),
-                'timeZone': 'Europe/Lisbon',
+                'timeZone': SALON_TIMEZONE_NAME,
             },
             'end': {
                 'dateTime': end_time.isoformat(),
-                'timeZone': 'Europe/Lisbon',
+                'timeZone': SALON_TIMEZONE_NAME,
             },
             'reminders': {
                 'useDefault': False,
@@ -305,7 +307,7 @@ def sync_appointment_to_calendar(
         ID do evento criado no Google Calendar ou None
     """
     # Prepara dados do evento
-    start_time = datetime.fromisoformat(appointment['data_hora'])
+    start_time = to_local(appointment_epoch(appointment))
     
     # Calcula duração total dos serviços
     duration_minutes = sum(
@@ -371,7 +373,7 @@ def update_appointment_in_calendar(
     Returns:
         True se atualizado com sucesso
     """
-    start_time = datetime.fromisoformat(appointment['data_hora'])
+    start_time = to_local(appointment_epoch(appointment))
     
     duration_minutes = sum(
         service.get('duracao_estimada', 60) 
@@ -106,6 +106,20 @@ except ImportError as e:
     print(f"⚠️  Erro: {e}")
     professionals_router = None
 
+try:
+    from app.appointments_enhanced import router as appointments_enhanced_router
+    print("✅ Router de agendamentos (autenticado / chaves de API)")
+except ImportError as e:
+    print(f"⚠️  Erro: {e}")
+    appointments_enhanced_router = None
+
+try:
+    from app.routes.admin import router as admin_router
+    print("✅ Router de administração")
+except ImportError as e:
+    print(f"⚠️  Erro: {e}")
+    admin_router = None
+
 # ============================================
 # REGISTRAR ROUTERS
 # ============================================
@@ -131,6 +145,16 @@ if professionals_router:
     app.include_router(professionals_router, prefix="/api/v1/professionals", tags=["💼 Profissionais"])
     print("✅ /api/v1/professionals")
 
+if appointments_enhanced_router:
+    # Mesmo prefixo, sem caminhos em comum com o router principal:
+    # /my, /professional, /available e /search aceitam JWT ou X-API-Key
+    app.include_router(appointments_enhanced_router, prefix="/api/v1/appointments", tags=["📅 Agendamentos"])
+    print("✅ /api/v1/appointments (my, professional, available, search)")
+
+if admin_router:
+    app.include_router(admin_router, prefix="/api/v1/admin", tags=["🛠️ Administração"])
+    print("✅ /api/v1/admin")
+
 # ============================================
 # ROTAS BÁSICAS
 # ============================================
@@ -240,6 +264,17 @@ async def internal_error_handler(request: Request, exc):
 
 @app.on_event("startup")
 async def startup_event():
+    # Horários livres dos próximos dias calculados em segundo plano
+    from app.availability_cache import availability_cache
+    availability_cache.start_prewarm()
+
+    # Lista de espera: o import regista o observador de cancelamentos no db
+    import app.waitlist  # noqa: F401
+
+    # Lembretes de agendamentos (enviados só com as flags de notificação ligadas)
+    from app.reminders import reminder_scheduler
+    reminder_scheduler.start()
+    
     print("\n" + "="*70)
     print("🚀 SALÃO IA API")
     print("="*70)
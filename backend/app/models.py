@@ -31,6 +31,7 @@ class AppointmentStatus(str, Enum):
     EM_ATENDIMENTO = "em_atendimento"
     CONCLUIDO = "concluido"
     CANCELADO = "cancelado"
+    FALTOU = "faltou"  # Cliente não compareceu (registado pelo profissional)
 
 
 class ServiceType(str, Enum):
@@ -222,6 +223,23 @@ class AvailabilityResponse(BaseModel):
     horarios: List[TimeSlot]
 
 
+class SlotSearchResult(BaseModel):
+    """Horário livre encontrado na pesquisa multi-profissional"""
+    profissional_id: str
+    profissional_nome: str
+    inicio: str
+    fim: str
+
+
+class SlotSearchResponse(BaseModel):
+    """Resposta da pesquisa de horários livres"""
+    servico: Optional[str] = None
+    duracao: int
+    data_inicio: str
+    data_fim: str
+    resultados: List[SlotSearchResult]
+
+
 class ProfessionalSchedule(BaseModel):
     """Agenda do profissional"""
     profissional_id: str
@@ -0,0 +1,462 @@
+"""
+NO_SHOW.PY - PREVISÃO DE FALTAS E POLÍTICA DE OVERBOOKING
+=========================================================
+Regressão logística em NumPy treinada offline sobre o histórico de
+appointments.json (python -m app.no_show), sem serviços externos.
+
+- Etiqueta só com resultado registado: concluido/em_atendimento =
+  compareceu; faltou, ou cancelado a menos de LATE_CANCEL_HOURS do início
+  = faltou. Marcações que ficaram pendentes/confirmadas sem registo e
+  cancelamentos com antecedência ficam de fora (não se sabe se a cliente veio)
+- Features: antecedência da marcação, dia da semana, hora local e
+  histórico do cliente (visitas e taxa de faltas anteriores)
+- Probabilidades dos agendamentos futuros e histórico dos clientes
+  calculados de uma vez e atualizados pelas mutações do db; a política de
+  overbooking só lê
+- OverbookingPolicy: bitset dos quanta do dia ocupados por um único
+  agendamento com probabilidade de falta >= limiar (config.features)
+"""
+
+import json
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .availability import CANCELLED_STATUSES, AvailabilityIndex, availability_index
+from .config import config
+from .database import db
+from .salon_time import appointment_epoch, now_epoch, to_epoch, to_local
+from .slot_calendar import span_mask
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+MODEL_FILENAME = "no_show_model.json"
+
+# Cancelado com menos antecedência do que isto conta como falta
+LATE_CANCEL_HOURS = 24
+
+# Agendamentos até este tempo no passado ainda recebem probabilidade (dia corrente)
+SCORE_PAST_HOURS = 24
+
+# Abaixo disto o modelo não é treinado e usa-se a taxa base
+MIN_TRAINING_SAMPLES = 20
+
+ATTENDED_STATUSES = {"concluido", "em_atendimento"}
+NO_SHOW_STATUSES = {"faltou", "no_show"}
+
+FEATURE_NAMES = (
+    ["lead_hours_log", "hour_of_day", "client_visits_log", "client_no_show_rate"]
+    + [f"weekday_{d}" for d in range(7)]
+)
+
+
+# ====================================================================
+# FEATURES E ETIQUETAS
+# ====================================================================
+
+def client_of(appointment: Dict) -> Optional[str]:
+    client_id = appointment.get("cliente_id") or appointment.get("usuario_id")
+    return str(client_id) if client_id else None
+
+
+def no_show_label(appointment: Dict, now_ts: int) -> Optional[int]:
+    """1 = faltou, 0 = compareceu, None = sem resultado conhecido"""
+    ts = appointment_epoch(appointment)
+    if ts is None or ts > now_ts:
+        return None
+
+    status = appointment.get("status")
+    if status in ATTENDED_STATUSES:
+        return 0
+    if status in NO_SHOW_STATUSES:
+        return 1
+    if status in CANCELLED_STATUSES:
+        cancelled_ts = to_epoch(appointment.get("cancelled_at"))
+        if cancelled_ts is None:
+            return None
+        return 1 if cancelled_ts >= ts - LATE_CANCEL_HOURS * 3600 else None
+    return None
+
+
+def appointment_features(appointment: Dict, visits: int, no_shows: int) -> Optional[List[float]]:
+    """Vetor de features (FEATURE_NAMES); visits/no_shows são do histórico anterior"""
+    ts = appointment_epoch(appointment)
+    if ts is None:
+        return None
+
+    created_ts = to_epoch(appointment.get("created_at"))
+    lead_hours = max(0.0, (ts - created_ts) / 3600) if created_ts is not None else 0.0
+    local = to_local(ts)
+
+    weekday = [0.0] * 7
+    weekday[local.weekday()] = 1.0
+    return [
+        math.log1p(lead_hours),
+        (local.hour * 60 + local.minute) / (24 * 60),
+        math.log1p(visits),
+        # Suavização de Laplace: cliente novo fica a meio caminho
+        (no_shows + 1) / (visits + 2),
+    ] + weekday
+
+
+def training_set(appointments: Sequence[Dict], now_ts: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (X, y) por ordem cronológica: o histórico do cliente em cada linha só
+    conta marcações anteriores (sem fuga de informação do futuro).
+    """
+    history: Dict[str, List[int]] = {}
+    rows, labels = [], []
+    for appointment in sorted(appointments, key=lambda a: appointment_epoch(a) or 0):
+        label = no_show_label(appointment, now_ts)
+        if label is None:
+            continue
+        client = client_of(appointment)
+        visits, no_shows = history.get(client, (0, 0))
+        features = appointment_features(appointment, visits, no_shows)
+        if features is None:
+            continue
+        rows.append(features)
+        labels.append(label)
+        if client:
+            history[client] = [visits + 1, no_shows + label]
+
+    X = np.array(rows, dtype=float).reshape(-1, len(FEATURE_NAMES))
+    return X, np.array(labels, dtype=float)
+
+
+# ====================================================================
+# MODELO
+# ====================================================================
+
+class LogisticModel:
+    """Regressão logística com regularização L2 (descida de gradiente em lote)"""
+
+    def __init__(self, weights: np.ndarray, bias: float, mean: np.ndarray, scale: np.ndarray):
+        self.weights = weights
+        self.bias = bias
+        self.mean = mean
+        self.scale = scale
+
+    @classmethod
+    def fit(cls, X: np.ndarray, y: np.ndarray, l2: float = 1.0,
+            learning_rate: float = 0.5, epochs: int = 500) -> "LogisticModel":
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        Z = (X - mean) / scale
+
+        n, m = Z.shape
+        weights = np.zeros(m)
+        bias = float(np.log((y.mean() + 1e-6) / (1 - y.mean() + 1e-6)))
+        for _ in range(epochs):
+            p = _sigmoid(Z @ weights + bias)
+            error = p - y
+            weights -= learning_rate * (Z.T @ error / n + l2 * weights / n)
+            bias -= learning_rate * float(error.mean())
+        return cls(weights, bias, mean, scale)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return _sigmoid(((X - self.mean) / self.scale) @ self.weights + self.bias)
+
+    def to_dict(self) -> Dict:
+        return {
+            "weights": self.weights.tolist(),
+            "bias": self.bias,
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LogisticModel":
+        return cls(
+            np.array(data["weights"], dtype=float), float(data["bias"]),
+            np.array(data["mean"], dtype=float), np.array(data["scale"], dtype=float)
+        )
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+# ====================================================================
+# PREVISOR
+# ====================================================================
+
+class NoShowPredictor:
+    """Probabilidade de falta por agendamento, pré-calculada em memória"""
+
+    def __init__(self, database=db, model_path: Optional[str] = None):
+        self.db = database
+        self.model_path = model_path or os.path.join(database.data_dir, MODEL_FILENAME)
+        self._lock = threading.RLock()
+        self._model: Optional[LogisticModel] = None
+        self._base_rate = 0.0
+        self._model_stamp = None
+        self._model_loaded = False
+
+        self._probabilities: Dict[str, float] = {}
+        self._history: Dict[str, List[int]] = {}
+        self._labels: Dict[str, Tuple[str, int]] = {}  # id -> (cliente, etiqueta) contada em _history
+        self._overbooked: Dict[Tuple[str, str], Set[str]] = {}
+        self._overbooked_location: Dict[str, Tuple[str, str]] = {}
+        self._stamp = None
+        self._loaded = False
+
+        database.add_listener("appointments", self._on_change)
+
+    # ----- treino (offline) -----
+
+    def train(self, appointments: Optional[Sequence[Dict]] = None,
+              now_ts: Optional[int] = None, save: bool = True) -> Dict:
+        """Treina sobre o histórico e grava o modelo em data/no_show_model.json"""
+        appointments = appointments if appointments is not None else self.db.get_all_appointments()
+        X, y = training_set(appointments, now_ts or now_epoch())
+
+        base_rate = float(y.mean()) if len(y) else 0.0
+        model = None
+        if len(y) >= MIN_TRAINING_SAMPLES and 0 < y.sum() < len(y):
+            model = LogisticModel.fit(X, y)
+
+        summary = {
+            "trained_at": datetime.now().isoformat(),
+            "samples": int(len(y)),
+            "no_shows": int(y.sum()),
+            "base_rate": base_rate,
+            "features": FEATURE_NAMES,
+            "model": model.to_dict() if model else None,
+        }
+        if save:
+            with open(self.model_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        with self._lock:
+            self._model = model
+            self._base_rate = base_rate
+            self._model_stamp = self._model_file_stamp()
+            self._model_loaded = True
+            self._loaded = False
+        return summary
+
+    def _model_file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.model_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_model(self):
+        self._model_stamp = self._model_file_stamp()
+        self._model_loaded = True
+        self._model = None
+        self._base_rate = 0.0
+        if self._model_stamp is None:
+            return
+        try:
+            with open(self.model_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._base_rate = float(data.get("base_rate", 0.0))
+            if data.get("model") and data.get("features") == FEATURE_NAMES:
+                self._model = LogisticModel.from_dict(data["model"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Modelo de faltas inválido ({self.model_path}): {e}")
+
+    # ----- pré-cálculo -----
+
+    def _predict(self, appointment: Dict) -> Optional[float]:
+        client = client_of(appointment)
+        visits, no_shows = self._history.get(client, (0, 0))
+        features = appointment_features(appointment, visits, no_shows)
+        if features is None:
+            return None
+        if self._model is None:
+            return self._base_rate
+        return float(self._model.predict_proba(np.array([features]))[0])
+
+    def _track_overbooked(self, appointment: Dict):
+        appointment_id = str(appointment.get("id"))
+        location = self._overbooked_location.pop(appointment_id, None)
+        if location:
+            self._overbooked.get(location, set()).discard(appointment_id)
+
+        ts = appointment_epoch(appointment)
+        if (appointment.get("overbooked") and ts is not None
+                and appointment.get("status") not in CANCELLED_STATUSES):
+            location = (str(appointment.get("profissional_id")), to_local(ts).date().isoformat())
+            self._overbooked.setdefault(location, set()).add(appointment_id)
+            self._overbooked_location[appointment_id] = location
+
+    def _rebuild(self):
+        now_ts = now_epoch()
+        appointments = self.db.get_all_appointments()
+
+        self._history = {}
+        self._labels = {}
+        for appointment in appointments:
+            self._count_label(appointment, now_ts)
+
+        # Só interessam agendamentos que ainda podem ocupar a agenda
+        self._probabilities = {}
+        self._overbooked = {}
+        self._overbooked_location = {}
+        for appointment in appointments:
+            self._track_overbooked(appointment)
+            ts = appointment_epoch(appointment)
+            if ts is None or ts < now_ts - SCORE_PAST_HOURS * 3600:
+                continue
+            probability = self._predict(appointment)
+            if probability is not None:
+                self._probabilities[str(appointment.get("id"))] = probability
+
+        self._stamp = self.db._file_stamp("appointments")
+        self._loaded = True
+
+    def _count_label(self, appointment: Dict, now_ts: int):
+        """Atualiza _history com a etiqueta atual do agendamento (desconta a anterior)"""
+        appointment_id = str(appointment.get("id"))
+        previous = self._labels.pop(appointment_id, None)
+        if previous:
+            client, label = previous
+            visits, no_shows = self._history[client]
+            self._history[client] = [visits - 1, no_shows - label]
+
+        label = no_show_label(appointment, now_ts)
+        client = client_of(appointment)
+        if label is not None and client:
+            visits, no_shows = self._history.get(client, (0, 0))
+            self._history[client] = [visits + 1, no_shows + label]
+            self._labels[appointment_id] = (client, label)
+
+    def ensure_fresh(self):
+        """Recarrega o modelo se o arquivo mudou (novo treino) e recalcula as probabilidades"""
+        with self._lock:
+            if not self._model_loaded or self._model_file_stamp() != self._model_stamp:
+                self._load_model()
+                self._loaded = False
+            if not self._loaded or self.db._file_stamp("appointments") != self._stamp:
+                self._rebuild()
+
+    def _on_change(self, action: str, appointment: Dict):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._track_overbooked(appointment)
+            self._count_label(appointment, now_epoch())
+            probability = self._predict(appointment)
+            if probability is not None:
+                self._probabilities[str(appointment.get("id"))] = probability
+            self._stamp = self.db._file_stamp("appointments")
+
+    # ----- consultas -----
+
+    def probability(self, appointment_id: str) -> Optional[float]:
+        """Probabilidade de falta pré-calculada (None se desconhecida)"""
+        return self.probabilities([appointment_id])[0]
+
+    def probabilities(self, appointment_ids: Sequence[str]) -> List[Optional[float]]:
+        self.ensure_fresh()
+        return [self._probabilities.get(str(a)) for a in appointment_ids]
+
+    def overbooked_count(self, professional_id: str, day: str) -> int:
+        """Agendamentos em overbooking do profissional no dia"""
+        self.ensure_fresh()
+        return len(self._overbooked.get((str(professional_id), day), ()))
+
+    def model_version(self) -> str:
+        """Versão do modelo carregado (ETags de respostas que dependem dele)"""
+        self.ensure_fresh()
+        return str(self._model_stamp)
+
+    def summary(self) -> Dict:
+        self.ensure_fresh()
+        return {
+            "model_trained": self._model is not None,
+            "base_rate": self._base_rate,
+            "scored_appointments": len(self._probabilities),
+        }
+
+
+# ====================================================================
+# POLÍTICA DE OVERBOOKING
+# ====================================================================
+
+class OverbookingPolicy:
+    """
+    Onde se pode marcar por cima de um agendamento existente.
+
+    Configurada em config.features: overbooking_enabled,
+    overbooking_no_show_threshold e overbooking_max_per_day.
+    """
+
+    def __init__(self, predictor: NoShowPredictor, index: AvailabilityIndex = availability_index,
+                 features=None):
+        self.predictor = predictor
+        self.index = index
+        self.features = features or config.features
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.features.overbooking_enabled)
+
+    def soft_mask(self, professional_id: str, day: str) -> int:
+        """
+        Quanta do dia que um novo agendamento pode partilhar: ocupados por
+        um único agendamento com probabilidade de falta >= limiar. 0 se a
+        política estiver desligada ou o limite diário já foi atingido.
+        """
+        if not self.enabled:
+            return 0
+        if self.predictor.overbooked_count(professional_id, day) >= self.features.overbooking_max_per_day:
+            return 0
+
+        intervals = self.index.day(professional_id, day)
+        if not intervals:
+            return 0
+
+        threshold = self.features.overbooking_no_show_threshold
+        probabilities = self.predictor.probabilities([i[2] for i in intervals.intervals])
+        seen = stacked = soft = 0
+        for (start, end, _), probability in zip(intervals.intervals, probabilities):
+            mask = span_mask(start, end)
+            stacked |= seen & mask
+            seen |= mask
+            if probability is not None and probability >= threshold:
+                soft |= mask
+        # Nunca empilhar sobre um horário que já tem dois agendamentos
+        return soft & ~stacked
+
+    def slot_probabilities(self, professional_id: str, day: str) -> List[Dict]:
+        """Probabilidade de falta de cada agendamento do dia (para a agenda)"""
+        intervals = self.index.day(professional_id, day)
+        if not intervals:
+            return []
+        probabilities = self.predictor.probabilities([i[2] for i in intervals.intervals])
+        return [
+            {
+                "appointment_id": appointment_id,
+                "start_minutes": start,
+                "end_minutes": end,
+                "no_show_probability": probability,
+            }
+            for (start, end, appointment_id), probability in zip(intervals.intervals, probabilities)
+        ]
+
+
+# Instâncias globais
+no_show_predictor = NoShowPredictor()
+overbooking_policy = OverbookingPolicy(no_show_predictor)
+
+
+if __name__ == "__main__":
+    result = no_show_predictor.train()
+    print(
+        f"✅ Modelo de faltas treinado: {result['samples']} amostras, "
+        f"{result['no_shows']} faltas, taxa base {result['base_rate']:.2%}"
+        + ("" if result["model"] else " (sem modelo: poucas amostras, usa a taxa base)")
+    )
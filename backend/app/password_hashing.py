@@ -0,0 +1,194 @@
+"""
+PASSWORD_HASHING.PY - CUSTO DE HASH DE SENHAS
+=============================================
+Parâmetros de hash calibrados para o hardware do deploy.
+
+- bcrypt com rounds configuráveis (padrão)
+- argon2id opcional (requer argon2-cffi) com memória/tempo ajustados
+- hashes com custo diferente do configurado são refeitos no login
+
+Calibração: python scripts/calibrate_password_hash.py
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from passlib.context import CryptContext
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+HASH_CONFIG_FILE = Path("data/password_hashing.json")
+
+DEFAULT_HASH_CONFIG: Dict[str, Any] = {
+    "scheme": "bcrypt",
+    "bcrypt_rounds": 12,
+    "argon2_time_cost": 3,
+    "argon2_memory_cost": 65536,  # KiB
+    "argon2_parallelism": 1,
+    "target_ms": 250,
+}
+
+# Limites usados pela calibração
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+ARGON2_MIN_MEMORY_KIB = 19456  # mínimo recomendado pela OWASP para argon2id
+ARGON2_MAX_MEMORY_KIB = 1048576
+
+_CALIBRATION_PASSWORD = "calibracao-salao-ia"
+
+
+def is_argon2_available() -> bool:
+    """Verifica se o backend argon2 (argon2-cffi) está instalado"""
+    try:
+        import argon2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ====================================================================
+# CARREGAR / GUARDAR
+# ====================================================================
+
+def load_hash_config() -> Dict[str, Any]:
+    """Lê a configuração de hash (padrões se o arquivo não existir)"""
+    config = dict(DEFAULT_HASH_CONFIG)
+
+    try:
+        with open(HASH_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    except (json.JSONDecodeError, FileNotFoundError):
+        pass
+
+    if config["scheme"] == "argon2" and not is_argon2_available():
+        print("⚠️ argon2 configurado mas argon2-cffi não está instalado; usando bcrypt")
+        config["scheme"] = "bcrypt"
+
+    return config
+
+
+def save_hash_config(config: Dict[str, Any]):
+    """Guarda a configuração de hash"""
+    HASH_CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(HASH_CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
+def build_crypt_context(config: Dict[str, Any]) -> CryptContext:
+    """
+    Cria o CryptContext a partir da configuração.
+
+    Os rounds mínimo e máximo do bcrypt são fixados no valor alvo, para
+    que needs_update() acuse qualquer hash com custo diferente.
+    """
+    rounds = int(config["bcrypt_rounds"])
+    options: Dict[str, Any] = {
+        "bcrypt__rounds": rounds,
+        "bcrypt__min_rounds": rounds,
+        "bcrypt__max_rounds": rounds,
+    }
+
+    if is_argon2_available():
+        options.update({
+            "argon2__type": "ID",
+            "argon2__time_cost": int(config["argon2_time_cost"]),
+            "argon2__memory_cost": int(config["argon2_memory_cost"]),
+            "argon2__parallelism": int(config["argon2_parallelism"]),
+        })
+
+    if config["scheme"] == "argon2":
+        # Hashes bcrypt antigos continuam válidos e migram no próximo login
+        return CryptContext(schemes=["argon2", "bcrypt"], deprecated=["bcrypt"], **options)
+
+    schemes = ["bcrypt", "argon2"] if is_argon2_available() else ["bcrypt"]
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
+# ====================================================================
+# CALIBRAÇÃO
+# ====================================================================
+
+def _time_hash(context: CryptContext, samples: int = 3) -> float:
+    """Mede o tempo médio (ms) de um hash com o contexto dado"""
+    context.hash(_CALIBRATION_PASSWORD)  # aquecimento
+    start = time.perf_counter()
+    for _ in range(samples):
+        context.hash(_CALIBRATION_PASSWORD)
+    return (time.perf_counter() - start) * 1000 / samples
+
+
+def calibrate_bcrypt(target_ms: float) -> Dict[str, Any]:
+    """
+    Escolhe o maior custo bcrypt cujo hash não ultrapassa target_ms.
+
+    Cada round extra dobra o tempo, por isso basta medir em sequência
+    até passar do alvo.
+    """
+    chosen = BCRYPT_MIN_ROUNDS
+    chosen_ms = None
+    measurements = {}
+
+    for rounds in range(BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS + 1):
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        elapsed = _time_hash(context, samples=1 if rounds > 13 else 3)
+        measurements[rounds] = round(elapsed, 1)
+
+        if elapsed > target_ms and rounds > BCRYPT_MIN_ROUNDS:
+            break
+
+        chosen, chosen_ms = rounds, elapsed
+
+        # O próximo round levaria o dobro: já não cabe no alvo
+        if elapsed * 2 > target_ms:
+            break
+
+    return {
+        "bcrypt_rounds": chosen,
+        "measured_ms": round(chosen_ms, 1),
+        "measurements": measurements,
+    }
+
+
+def calibrate_argon2(target_ms: float, time_cost: int = 3, parallelism: int = 1) -> Dict[str, Any]:
+    """
+    Escolhe a maior memória argon2id cujo hash não ultrapassa target_ms.
+
+    O tempo cresce linearmente com a memória, então a memória é dobrada
+    até passar do alvo.
+    """
+    if not is_argon2_available():
+        raise RuntimeError("argon2-cffi não está instalado (pip install argon2-cffi)")
+
+    memory = ARGON2_MIN_MEMORY_KIB
+    chosen, chosen_ms = memory, None
+    measurements = {}
+
+    while memory <= ARGON2_MAX_MEMORY_KIB:
+        context = CryptContext(
+            schemes=["argon2"],
+            argon2__type="ID",
+            argon2__time_cost=time_cost,
+            argon2__memory_cost=memory,
+            argon2__parallelism=parallelism,
+        )
+        elapsed = _time_hash(context)
+        measurements[memory] = round(elapsed, 1)
+
+        if elapsed > target_ms and chosen_ms is not None:
+            break
+
+        chosen, chosen_ms = memory, elapsed
+        memory *= 2
+
+    return {
+        "argon2_time_cost": time_cost,
+        "argon2_memory_cost": chosen,
+        "argon2_parallelism": parallelism,
+        "measured_ms": round(chosen_ms, 1),
+        "measurements": measurements,
+    }
@@ -0,0 +1,111 @@
+"""
+PERMISSIONS.PY - AUTORIZAÇÃO POR PERMISSÕES
+===========================================
+Permissões declarativas por role, compiladas em bitmasks no arranque.
+
+Uso numa rota:
+    current_user: Annotated[User, Depends(require_permissions(Permission.VIEW_STATISTICS))]
+
+A máscara exigida pela rota é calculada uma vez quando o módulo da rota
+é importado; por pedido resta um lookup role -> máscara e um AND.
+"""
+
+from enum import IntFlag
+from functools import reduce
+from operator import or_
+from typing import Annotated, Any, Dict, Iterable
+
+from fastapi import Depends, HTTPException, status
+
+from .auth import get_current_user
+from .models import User
+
+
+# ====================================================================
+# PERMISSÕES
+# ====================================================================
+
+class Permission(IntFlag):
+    """Permissões atómicas (um bit cada)"""
+    VIEW_STATISTICS = 1 << 0            # estatísticas gerais e de agendamentos
+    VIEW_OWN_STATISTICS = 1 << 1        # estatísticas do próprio profissional
+    VIEW_REVENUE = 1 << 2               # relatórios de receita
+    MANAGE_USERS = 1 << 3               # listar/remover utilizadores
+    MANAGE_SETTINGS = 1 << 4            # configuração do salão e painel admin
+    VIEW_CLIENT_RECORDS = 1 << 5        # fichas, históricos e consultas de clientes
+    WRITE_CLIENT_RECORDS = 1 << 6       # criar fichas, consultas, testes de mecha
+    VIEW_PROFESSIONAL_AGENDA = 1 << 7   # agenda do profissional
+    MANAGE_APPOINTMENTS = 1 << 8        # alterar estado de qualquer agendamento
+
+
+# Declaração das permissões de cada role
+ROLE_GRANTS: Dict[str, Iterable[Permission]] = {
+    "cliente": [],
+    "profissional": [
+        Permission.VIEW_STATISTICS,
+        Permission.VIEW_OWN_STATISTICS,
+        Permission.VIEW_CLIENT_RECORDS,
+        Permission.WRITE_CLIENT_RECORDS,
+        Permission.VIEW_PROFESSIONAL_AGENDA,
+    ],
+    "admin": [
+        Permission.VIEW_STATISTICS,
+        Permission.VIEW_REVENUE,
+        Permission.MANAGE_USERS,
+        Permission.MANAGE_SETTINGS,
+        Permission.VIEW_CLIENT_RECORDS,
+        Permission.VIEW_PROFESSIONAL_AGENDA,
+        Permission.MANAGE_APPOINTMENTS,
+    ],
+}
+
+
+def compile_mask(permissions: Iterable[Permission]) -> int:
+    """Junta uma lista de permissões numa única máscara inteira"""
+    return int(reduce(or_, permissions, Permission(0)))
+
+
+# Máscaras compiladas no arranque: role -> int
+ROLE_MASKS: Dict[str, int] = {role: compile_mask(perms) for role, perms in ROLE_GRANTS.items()}
+
+
+# ====================================================================
+# VERIFICAÇÃO
+# ====================================================================
+
+def role_mask(role: Any) -> int:
+    """Máscara de permissões de uma role (str ou UserRole)"""
+    return ROLE_MASKS.get(getattr(role, "value", role), 0)
+
+
+def has_permission(user: Any, *permissions: Permission) -> bool:
+    """Verifica se o utilizador tem todas as permissões indicadas"""
+    required = compile_mask(permissions)
+    return role_mask(getattr(user, "role", None)) & required == required
+
+
+def require_permissions(*permissions: Permission, detail: str = "Acesso negado"):
+    """
+    Cria uma dependência que exige as permissões indicadas.
+
+    A máscara é compilada aqui, na declaração da rota; a dependência
+    reutiliza o User já resolvido por get_current_user no mesmo pedido.
+    """
+    required = compile_mask(permissions)
+
+    async def dependency(current_user: Annotated[User, Depends(get_current_user)]) -> User:
+        if role_mask(current_user.role) & required != required:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=detail
+            )
+        return current_user
+
+    return dependency
+
+
+# Dependência usada pelas rotas de administração
+get_current_admin = require_permissions(
+    Permission.MANAGE_SETTINGS,
+    detail="Acesso negado. Requer privilégios de administrador."
+)
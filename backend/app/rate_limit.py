@@ -0,0 +1,173 @@
+"""
+RATE_LIMIT.PY - LIMITADOR DE TENTATIVAS DE LOGIN
+================================================
+Token bucket por IP e por email, aplicado antes de qualquer
+leitura de utilizadores ou cálculo de bcrypt.
+
+O estado dos buckets vive num store plugável: em memória por omissão,
+ou qualquer implementação de RateLimitStore partilhada entre workers.
+"""
+
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+# Por IP: rajada de 20 tentativas, recupera 1 tentativa a cada 6 segundos
+LOGIN_IP_CAPACITY = 20
+LOGIN_IP_REFILL_PER_SECOND = 1 / 6
+
+# Por email: rajada de 5 tentativas, recupera 1 tentativa por minuto
+LOGIN_EMAIL_CAPACITY = 5
+LOGIN_EMAIL_REFILL_PER_SECOND = 1 / 60
+
+# Limite de buckets guardados em memória (os menos usados saem primeiro)
+MAX_TRACKED_KEYS = 50_000
+
+# Um bucket parado há mais de uma hora já estaria cheio: pode ser descartado
+IDLE_SECONDS = 3600
+
+# (chave, capacidade, tokens repostos por segundo)
+BucketSpec = Tuple[str, int, float]
+
+
+# ====================================================================
+# STORES
+# ====================================================================
+
+class RateLimitStore(ABC):
+    """
+    Interface de armazenamento dos buckets.
+
+    Implementações partilhadas (Redis, memcached, ...) só precisam de
+    garantir que take() é atómico para o conjunto de chaves pedido.
+    """
+
+    @abstractmethod
+    def take(self, buckets: Sequence[BucketSpec], now: float) -> Tuple[bool, float]:
+        """
+        Consome um token de cada bucket, só se todos tiverem um disponível:
+        um bucket vazio não gasta os tokens dos outros.
+
+        Returns:
+            (permitido, segundos até todos os buckets terem um token)
+        """
+
+    @abstractmethod
+    def reset(self, key: str) -> None:
+        """Remove o bucket `key` (ex: após login bem-sucedido)"""
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """
+    Store local ao processo, protegido por lock.
+
+    Os buckets ficam num OrderedDict pela ordem da última tentativa: os
+    inativos e, acima de max_keys, os menos usados saem pela frente, em
+    O(1) amortizado por tentativa.
+    """
+
+    def __init__(self, max_keys: int = MAX_TRACKED_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, buckets: Sequence[BucketSpec], now: float) -> Tuple[bool, float]:
+        with self._lock:
+            # Repõe os tokens acumulados desde a última tentativa de cada bucket
+            levels = []
+            for key, capacity, refill_per_second in buckets:
+                tokens, updated_at = self._buckets.get(key, (float(capacity), now))
+                levels.append(min(float(capacity), tokens + (now - updated_at) * refill_per_second))
+
+            allowed = all(tokens >= 1 for tokens in levels)
+            retry_after = 0.0
+            for (key, _, refill_per_second), tokens in zip(buckets, levels):
+                if allowed:
+                    tokens -= 1
+                elif tokens < 1:
+                    retry_after = max(retry_after, (1 - tokens) / refill_per_second)
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+
+            self._evict(now)
+            return allowed, retry_after
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def _evict(self, now: float):
+        """Descarta pela frente os buckets inativos e os que excedem max_keys"""
+        cutoff = now - IDLE_SECONDS
+        while self._buckets:
+            _, updated_at = next(iter(self._buckets.values()))
+            if updated_at >= cutoff and len(self._buckets) <= self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# ====================================================================
+# LIMITADOR DE LOGIN
+# ====================================================================
+
+class LoginRateLimiter:
+    """Aplica os buckets por IP e por email ao endpoint de login"""
+
+    def __init__(self, store: Optional[RateLimitStore] = None):
+        self.store = store or InMemoryRateLimitStore()
+
+    def set_store(self, store: RateLimitStore):
+        """Troca o store (ex: store partilhado em deploys com vários workers)"""
+        self.store = store
+
+    @staticmethod
+    def _email_key(email: str) -> str:
+        return f"login:email:{(email or '').strip().casefold()}"
+
+    @staticmethod
+    def _ip_key(ip: Optional[str]) -> str:
+        return f"login:ip:{ip or 'desconhecido'}"
+
+    def check(self, ip: Optional[str], email: str):
+        """
+        Consome uma tentativa para o IP e para o email, em conjunto: se um
+        dos buckets recusar, o outro não perde o token.
+
+        Raises:
+            HTTPException 429 com Retry-After se algum bucket estiver vazio
+        """
+        allowed, retry_after = self.store.take(
+            [
+                (self._ip_key(ip), LOGIN_IP_CAPACITY, LOGIN_IP_REFILL_PER_SECOND),
+                (self._email_key(email), LOGIN_EMAIL_CAPACITY, LOGIN_EMAIL_REFILL_PER_SECOND),
+            ],
+            time.monotonic(),
+        )
+
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiadas tentativas de login. Tente novamente mais tarde.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    def reset_email(self, email: str):
+        """Limpa o bucket do email após autenticação bem-sucedida"""
+        self.store.reset(self._email_key(email))
+
+
+# Instância global
+login_rate_limiter = LoginRateLimiter()
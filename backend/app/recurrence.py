@@ -0,0 +1,306 @@
+"""
+RECURRENCE.PY - AGENDAMENTOS RECORRENTES
+========================================
+Regras do tipo RRULE guardadas uma vez em data/recurrences.json:
+
+    {
+        "id": "REC-...",
+        "usuario_id": "...", "profissional_id": "4",
+        "servico": "Manicure", "total_duration": 45,
+        "dtstart": "2025-01-07T10:00:00",
+        "freq": "weekly", "interval": 1,
+        "count": null, "until": "2025-12-31",
+        "exceptions": {"2025-02-11": {"status": "cancelado"},
+                       "2025-03-04": {"data_hora": "2025-03-05T15:00:00"}}
+    }
+
+- As ocorrências são calculadas só dentro da janela pedida (salto
+  aritmético até à primeira ocorrência, sem percorrer as anteriores)
+- Só as exceções (cancelar/mover uma ocorrência) ficam gravadas
+- Cada ocorrência tem id "<regra>@<data original>" e o mesmo formato de
+  um agendamento, por isso entra no índice de disponibilidade e nas listagens
+"""
+
+import threading
+import uuid
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .database import db
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+FREQUENCIES = {"daily", "weekly", "monthly"}
+
+# Ocorrências verificadas contra a agenda ao criar uma regra sem fim
+CONFLICT_CHECK_HORIZON_DAYS = 180
+
+OCCURRENCE_SEPARATOR = "@"
+
+
+def occurrence_id(rule_id: str, original_day: date) -> str:
+    return f"{rule_id}{OCCURRENCE_SEPARATOR}{original_day.isoformat()}"
+
+
+def split_occurrence_id(appointment_id: str) -> Optional[Tuple[str, str]]:
+    """ "<regra>@<data>" -> (regra, data), ou None se não for ocorrência """
+    if OCCURRENCE_SEPARATOR not in (appointment_id or ""):
+        return None
+    rule_id, day = appointment_id.rsplit(OCCURRENCE_SEPARATOR, 1)
+    return rule_id, day
+
+
+# ====================================================================
+# EXPANSÃO
+# ====================================================================
+
+def _add_months(day: date, months: int) -> Optional[date]:
+    """Mesmo dia do mês `months` meses depois (None se o mês não o tiver)"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    if day.day > monthrange(year, month)[1]:
+        return None
+    return date(year, month, day.day)
+
+
+def _original_days(rule: Dict, first: date, last: date) -> Iterator[date]:
+    """Datas originais da regra entre first e last (inclusive)"""
+    start = datetime.fromisoformat(rule["dtstart"]).date()
+    interval = max(1, int(rule.get("interval") or 1))
+    count = rule.get("count")
+    until = date.fromisoformat(rule["until"]) if rule.get("until") else None
+    last = min(last, until) if until else last
+    first = max(first, start)
+
+    if rule["freq"] == "monthly":
+        months_ahead = (first.year - start.year) * 12 + first.month - start.month
+        k = max(0, months_ahead // interval)
+        while True:
+            months = k * interval
+            if count is not None and k >= count:
+                return
+            if (start.year * 12 + start.month - 1 + months) > (last.year * 12 + last.month - 1):
+                return
+            day = _add_months(start, months)
+            if day and first <= day <= last:
+                yield day
+            k += 1
+    else:
+        step = interval * (7 if rule["freq"] == "weekly" else 1)
+        k = max(0, -(-(first - start).days // step))
+        while True:
+            if count is not None and k >= count:
+                return
+            day = start + timedelta(days=k * step)
+            if day > last:
+                return
+            yield day
+            k += 1
+
+
+def _occurrence(rule: Dict, original_day: date) -> Optional[Dict]:
+    """Ocorrência com a exceção aplicada (None se cancelada)"""
+    start_time = datetime.fromisoformat(rule["dtstart"]).time()
+    exception = (rule.get("exceptions") or {}).get(original_day.isoformat(), {})
+    if exception.get("status") == "cancelado":
+        return None
+
+    return {
+        "id": occurrence_id(rule["id"], original_day),
+        "recurrence_id": rule["id"],
+        "recurring": True,
+        "usuario_id": rule.get("usuario_id"),
+        "profissional_id": rule["profissional_id"],
+        "servico": rule.get("servico", ""),
+        "total_duration": rule["total_duration"],
+        "data_hora": exception.get("data_hora") or datetime.combine(original_day, start_time).isoformat(),
+        "status": "confirmado",
+        "created_at": rule.get("created_at"),
+    }
+
+
+def expand(rule: Dict, first: date, last: date) -> List[Dict]:
+    """
+    Ocorrências da regra com data (já com exceções) entre first e last.
+
+    Uma ocorrência movida pode cair fora do seu dia original, por isso as
+    exceções de mudança são verificadas à parte.
+    """
+    if rule.get("status") == "cancelado":
+        return []
+
+    found = {}
+    for day in _original_days(rule, first, last):
+        occ = _occurrence(rule, day)
+        if occ:
+            found[occ["id"]] = occ
+
+    for original, exception in (rule.get("exceptions") or {}).items():
+        moved_to = exception.get("data_hora")
+        if moved_to and first <= datetime.fromisoformat(moved_to).date() <= last:
+            original_day = date.fromisoformat(original)
+            if any(d == original_day for d in _original_days(rule, original_day, original_day)):
+                occ = _occurrence(rule, original_day)
+                if occ:
+                    found[occ["id"]] = occ
+
+    return sorted(
+        (o for o in found.values() if first <= datetime.fromisoformat(o["data_hora"]).date() <= last),
+        key=lambda o: o["data_hora"]
+    )
+
+
+# ====================================================================
+# REGRAS
+# ====================================================================
+
+class RecurrenceRules:
+    """Regras de recorrência por profissional, recarregadas se o arquivo mudar"""
+
+    def __init__(self, database=db):
+        self.db = database
+        self._lock = threading.RLock()
+        self._rules: Dict[str, Dict] = {}
+        self._by_professional: Dict[str, List[Dict]] = {}
+        self._stamp = None
+        self._loaded = False
+
+    def stamp(self):
+        """Assinatura do arquivo de regras (muda a cada gravação)"""
+        return self.db._file_stamp("recurrences")
+
+    def _ensure_fresh(self):
+        if self._loaded and self.stamp() == self._stamp:
+            return
+        self._rules = {r["id"]: r for r in self.db._read_file("recurrences")}
+        self._by_professional = {}
+        for rule in self._rules.values():
+            self._by_professional.setdefault(str(rule["profissional_id"]), []).append(rule)
+        self._stamp = self.stamp()
+        self._loaded = True
+
+    def _save(self):
+        self.db._write_file("recurrences", list(self._rules.values()))
+        self._loaded = False
+
+    # ----- consultas -----
+
+    def get(self, rule_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._ensure_fresh()
+            return self._rules.get(rule_id)
+
+    def list_rules(self, usuario_id: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            self._ensure_fresh()
+            return [r for r in self._rules.values() if not usuario_id or r.get("usuario_id") == usuario_id]
+
+    def occurrences_on(self, professional_id: str, day: date) -> List[Dict]:
+        """Ocorrências de um profissional num dia (usado pelo índice de disponibilidade)"""
+        with self._lock:
+            self._ensure_fresh()
+            rules = list(self._by_professional.get(str(professional_id), []))
+        occurrences = []
+        for rule in rules:
+            occurrences.extend(expand(rule, day, day))
+        return occurrences
+
+    def occurrences_between(self, first: date, last: date,
+                            usuario_id: Optional[str] = None) -> List[Dict]:
+        """Ocorrências de todas as regras (ou de um cliente) numa janela"""
+        occurrences = []
+        for rule in self.list_rules(usuario_id):
+            occurrences.extend(expand(rule, first, last))
+        return sorted(occurrences, key=lambda o: o["data_hora"])
+
+    # ----- gestão -----
+
+    def create(self, usuario_id: str, professional_id: str, servico: str, duration: int,
+               dtstart: datetime, freq: str, interval: int = 1,
+               count: Optional[int] = None, until: Optional[date] = None) -> Dict:
+        """
+        Cria uma regra (sem gravar ocorrências).
+
+        Raises:
+            ValueError: frequência ou limites inválidos
+        """
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Frequência inválida: {freq} (use {', '.join(sorted(FREQUENCIES))})")
+        if interval < 1 or (count is not None and count < 1):
+            raise ValueError("interval e count têm de ser positivos")
+        if until and until < dtstart.date():
+            raise ValueError("until não pode ser anterior ao início")
+
+        rule = {
+            "id": f"REC-{uuid.uuid4().hex[:10].upper()}",
+            "usuario_id": usuario_id,
+            "profissional_id": str(professional_id),
+            "servico": servico,
+            "total_duration": duration,
+            "dtstart": dtstart.isoformat(),
+            "freq": freq,
+            "interval": interval,
+            "count": count,
+            "until": until.isoformat() if until else None,
+            "exceptions": {},
+            "status": "ativo",
+            "created_at": datetime.now().isoformat(),
+        }
+
+        with self._lock:
+            self._ensure_fresh()
+            self._rules[rule["id"]] = rule
+            self._save()
+        return rule
+
+    def conflict_window(self, rule: Dict) -> Tuple[date, date]:
+        """Janela em que as ocorrências de uma regra nova são validadas"""
+        first = datetime.fromisoformat(rule["dtstart"]).date()
+        last = first + timedelta(days=CONFLICT_CHECK_HORIZON_DAYS)
+        if rule.get("until"):
+            last = min(last, date.fromisoformat(rule["until"]))
+        return first, last
+
+    def set_exception(self, rule_id: str, original_day: date, exception: Dict) -> Optional[Dict]:
+        """
+        Cancela ou move uma ocorrência (exception = {"status": "cancelado"}
+        ou {"data_hora": "..."}).
+
+        Returns:
+            a ocorrência como estava antes da alteração, ou None se não existir
+        """
+        with self._lock:
+            self._ensure_fresh()
+            rule = self._rules.get(rule_id)
+            if not rule or original_day not in _original_days(rule, original_day, original_day):
+                return None
+            before = _occurrence(rule, original_day)
+            if before is None:
+                return None
+            rule.setdefault("exceptions", {})[original_day.isoformat()] = exception
+            self._save()
+            return before
+
+    def end(self, rule_id: str) -> Optional[Dict]:
+        """Termina a série a partir de hoje"""
+        with self._lock:
+            self._ensure_fresh()
+            rule = self._rules.get(rule_id)
+            if not rule:
+                return None
+            # O histórico mantém-se: só deixam de existir ocorrências a partir de hoje
+            yesterday = date.today() - timedelta(days=1)
+            if not rule.get("until") or date.fromisoformat(rule["until"]) > yesterday:
+                rule["until"] = yesterday.isoformat()
+            rule["status"] = "terminado"
+            rule["ended_at"] = datetime.now().isoformat()
+            self._save()
+            return rule
+
+
+# Instância global
+recurrence_rules = RecurrenceRules()
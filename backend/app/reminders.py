@@ -0,0 +1,364 @@
+"""
+REMINDERS.PY - LEMBRETES DE AGENDAMENTOS
+========================================
+Lembretes por email/SMS antes de cada agendamento, disparados dentro do
+processo a partir de uma roda temporal (timing_wheel).
+
+- Os agendamentos futuros são carregados na roda uma vez; depois as
+  mutações do db (criar, cancelar, reagendar) só mexem nas chaves desse
+  agendamento, sem varrimentos periódicos da lista toda
+- Uma thread acorda a cada tick, recolhe os lembretes vencidos e entrega-os
+  por canal em lotes (send_batch) a senders plugáveis
+- Cada canal só envia com a respetiva flag ligada em config.features
+  (email_notifications_enabled, sms_notifications_enabled)
+- Lembretes enviados ficam registados em reminders.json (só por
+  acréscimo): um reinício não volta a enviá-los
+- Lotes que falham (ex: SMTP em baixo) voltam para a roda e são repetidos
+  no tick seguinte, só nos canais que falharam
+- Sender padrão: ficheiro local (data/outbox/<canal>.jsonl); com
+  REMINDER_SMTP_HOST definido, o email vai para esse servidor SMTP
+  (ex: servidor de debug local na porta 1025)
+- Com vários workers do uvicorn só um envia: o dono do flock em
+  data/reminders.lock. Os outros tentam de novo a cada tick e assumem se
+  o dono morrer. O dono recarrega a roda quando appointments.json é
+  escrito por outro worker
+- O destinatário é o cliente do agendamento (cliente_id -> email/telefone
+  do utilizador): marcações anónimas em /schedule, sem sessão, não
+  recebem lembretes
+"""
+
+import json
+import os
+import smtplib
+import threading
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .appointment_service import AppointmentService, appointment_service
+from .availability import CANCELLED_STATUSES
+from .config import config
+from .database import db
+from .salon_time import appointment_epoch, now_epoch, to_local
+from .timing_wheel import TimingWheel
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+# Antecedências dos lembretes (etiqueta, segundos antes do agendamento)
+REMINDER_OFFSETS: Tuple[Tuple[str, int], ...] = (("24h", 24 * 3600), ("2h", 2 * 3600))
+
+TICK_SECONDS = 60
+
+# Mensagens por chamada a send_batch
+BATCH_SIZE = 100
+
+CHANNEL_FLAGS = {
+    "email": "email_notifications_enabled",
+    "sms": "sms_notifications_enabled",
+}
+
+# Lock que elege o worker que envia os lembretes
+OWNER_LOCK_FILENAME = "reminders.lock"
+
+# Estados em que já não faz sentido lembrar
+FINAL_STATUSES = CANCELLED_STATUSES | {"concluido", "em_atendimento", "faltou"}
+
+
+# ====================================================================
+# SENDERS
+# ====================================================================
+
+class ReminderSender:
+    """Interface dos senders: entrega um lote e devolve quantas mensagens enviou"""
+
+    def send_batch(self, messages: List[Dict]) -> int:
+        raise NotImplementedError
+
+
+class FileSender(ReminderSender):
+    """Acrescenta as mensagens a um ficheiro JSON Lines (desenvolvimento e testes)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def send_batch(self, messages: List[Dict]) -> int:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for message in messages:
+                f.write(json.dumps(message, ensure_ascii=False) + "\n")
+        return len(messages)
+
+
+class SMTPSender(ReminderSender):
+    """Emails por SMTP numa única ligação por lote (ex: servidor de debug local)"""
+
+    def __init__(self, host: str, port: int = 1025, sender: str = "lembretes@salao.local"):
+        self.host = host
+        self.port = port
+        self.sender = sender
+
+    def send_batch(self, messages: List[Dict]) -> int:
+        sent = 0
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            for message in messages:
+                email = EmailMessage()
+                email["From"] = self.sender
+                email["To"] = message["to"]
+                email["Subject"] = message["subject"]
+                email.set_content(message["body"])
+                smtp.send_message(email)
+                sent += 1
+        return sent
+
+
+def default_senders(data_dir: str) -> Dict[str, ReminderSender]:
+    outbox = os.path.join(data_dir, "outbox")
+    senders: Dict[str, ReminderSender] = {
+        "email": FileSender(os.path.join(outbox, "email.jsonl")),
+        "sms": FileSender(os.path.join(outbox, "sms.jsonl")),
+    }
+    smtp_host = os.getenv("REMINDER_SMTP_HOST")
+    if smtp_host:
+        senders["email"] = SMTPSender(smtp_host, int(os.getenv("REMINDER_SMTP_PORT", "1025")))
+    return senders
+
+
+# ====================================================================
+# AGENDADOR
+# ====================================================================
+
+class ReminderScheduler:
+    """Roda temporal com os lembretes pendentes de todos os agendamentos"""
+
+    def __init__(self, database=db, service: AppointmentService = appointment_service,
+                 senders: Optional[Dict[str, ReminderSender]] = None, features=None,
+                 offsets: Sequence[Tuple[str, int]] = REMINDER_OFFSETS,
+                 tick_seconds: int = TICK_SECONDS):
+        self.db = database
+        self.service = service
+        self.senders = senders if senders is not None else default_senders(database.data_dir)
+        self.features = features or config.features
+        self.offsets = tuple(offsets)
+        self.tick_seconds = tick_seconds
+
+        self._lock = threading.RLock()
+        self._wheel: Optional[TimingWheel] = None
+        self._sent: set = set()
+        self._keys: Dict[str, List[str]] = {}
+        # Canais já entregues de lembretes à espera de nova tentativa
+        self._partial: Dict[str, List[str]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._owner_file = None
+        self._stamp = None
+        self.stats = {"sent": 0, "skipped": 0, "failed": 0}
+
+        database.add_listener("appointments", self._on_change)
+
+    # ----- carga -----
+
+    def load(self, now_ts: Optional[int] = None):
+        """Carrega os lembretes futuros na roda (uma passagem pelos agendamentos)"""
+        now_ts = now_ts if now_ts is not None else now_epoch()
+        with self._lock:
+            self._sent = {r.get("id") for r in self.db._read_file("reminders")}
+            self._wheel = TimingWheel(now_ts, self.tick_seconds)
+            self._keys = {}
+            self._partial = {}
+            for appointment in self.db.get_all_appointments():
+                self._schedule(appointment, now_ts)
+            self._stamp = self.db._file_stamp("appointments")
+
+    def _schedule(self, appointment: Dict, now_ts: int):
+        appointment_id = appointment.get("id")
+        ts = appointment_epoch(appointment)
+        if not appointment_id or ts is None or ts <= now_ts:
+            return
+        if appointment.get("status") in FINAL_STATUSES or appointment.get("recurring"):
+            return
+        keys = []
+        for label, offset in self.offsets:
+            # O instante entra na chave: um reagendamento volta a ter lembretes
+            key = f"{appointment_id}:{label}:{ts}"
+            due = ts - offset
+            # Marcado já dentro da antecedência: só vale o lembrete mais próximo
+            if key in self._sent or due < now_ts - self.tick_seconds:
+                continue
+            # Payload: (agendamento, etiqueta, canais a enviar ou None = todos)
+            self._wheel.schedule(key, due, (str(appointment_id), label, None))
+            keys.append(key)
+        if keys:
+            self._keys[str(appointment_id)] = keys
+
+    def _on_change(self, action: str, appointment: Dict):
+        with self._lock:
+            if self._wheel is None:
+                return
+            for key in self._keys.pop(str(appointment.get("id")), ()):
+                self._wheel.cancel(key)
+                self._partial.pop(key, None)
+            self._schedule(appointment, now_epoch())
+            self._stamp = self.db._file_stamp("appointments")
+
+    def __len__(self) -> int:
+        return len(self._wheel) if self._wheel else 0
+
+    # ----- envio -----
+
+    def _message(self, channel: str, appointment: Dict, key: str) -> Optional[Dict]:
+        client_id = appointment.get("cliente_id")
+        client = self.db.get_user_by_id(client_id) if client_id else None
+        to = (client or {}).get("email" if channel == "email" else "telefone")
+        ts = appointment_epoch(appointment)
+        if not to or ts is None:
+            return None
+
+        when = to_local(ts).strftime("%d/%m/%Y às %H:%M")
+        return {
+            "key": f"{key}:{channel}",
+            "appointment_id": appointment["id"],
+            "channel": channel,
+            "to": to,
+            "subject": f"Lembrete: o seu agendamento no {config.app_name}",
+            "body": f"Olá {client.get('nome', '')}, lembramos o seu agendamento a {when}.",
+        }
+
+    def run_due(self, now_ts: Optional[int] = None) -> int:
+        """Dispara os lembretes vencidos até now_ts, em lotes por canal"""
+        now_ts = now_ts if now_ts is not None else now_epoch()
+        with self._lock:
+            # Escritas de outro worker não passam pelo observador: recarregar
+            if self._wheel is None or self.db._file_stamp("appointments") != self._stamp:
+                self.load(now_ts)
+            fired = self._wheel.advance(now_ts)
+        if not fired:
+            return 0
+
+        channels = [c for c, flag in CHANNEL_FLAGS.items()
+                    if getattr(self.features, flag, False) and c in self.senders]
+        batches: Dict[str, List[Dict]] = {c: [] for c in channels}
+        pending: Dict[str, Tuple[str, str]] = {}
+        for key, (appointment_id, label, only) in fired:
+            appointment = self.service.get(appointment_id)
+            if not appointment or appointment.get("status") in FINAL_STATUSES:
+                continue
+            # Canais desligados ou sem contacto contam como tratados: não há
+            # nova tentativa, um lembrete vencido não é enviado mais tarde
+            pending[key] = (appointment_id, label)
+            for channel in channels:
+                if only is not None and channel not in only:
+                    continue
+                message = self._message(channel, appointment, key)
+                if message:
+                    batches[channel].append(message)
+                else:
+                    self.stats["skipped"] += 1
+
+        delivered: Dict[str, List[str]] = {}
+        failed: Dict[str, List[str]] = {}
+        for channel, messages in batches.items():
+            for i in range(0, len(messages), BATCH_SIZE):
+                batch = messages[i:i + BATCH_SIZE]
+                try:
+                    self.stats["sent"] += self.senders[channel].send_batch(batch)
+                    outcome = delivered
+                except Exception as e:
+                    self.stats["failed"] += len(batch)
+                    print(f"⚠️ Erro ao enviar lembretes ({channel}): {e}")
+                    outcome = failed
+                for message in batch:
+                    outcome.setdefault(message["key"].rsplit(":", 1)[0], []).append(channel)
+
+        self._record(pending, delivered, failed, now_ts)
+        return sum(len(c) for c in delivered.values())
+
+    def _record(self, pending: Dict[str, Tuple[str, str]], delivered: Dict[str, List[str]],
+                failed: Dict[str, List[str]], now_ts: int):
+        """
+        Regista os lembretes tratados num único acréscimo a reminders.json;
+        os que tiveram lotes falhados voltam à roda para o tick seguinte,
+        só com os canais que falharam.
+        """
+        sent_at = datetime.now().isoformat()
+        records = []
+        with self._lock:
+            for key, (appointment_id, label) in pending.items():
+                channels = self._partial.pop(key, []) + delivered.get(key, [])
+                if key in failed:
+                    # Chave substituída entretanto (cancelado/reagendado): desiste
+                    if self._wheel is not None and key in self._keys.get(appointment_id, ()):
+                        self._partial[key] = channels
+                        self._wheel.schedule(key, now_ts, (appointment_id, label, tuple(failed[key])))
+                    continue
+                records.append({"id": key, "appointment_id": appointment_id, "label": label,
+                                "channels": channels, "sent_at": sent_at})
+
+            self._sent.update(r["id"] for r in records)
+            self.db._append_record("reminders", records)
+
+    # ----- thread -----
+
+    def acquire_owner(self) -> bool:
+        """
+        Tenta ser o worker que envia (flock não bloqueante, mantido até o
+        processo terminar: o sistema liberta-o se o worker morrer).
+        """
+        if self._owner_file is not None:
+            return True
+        f = open(os.path.join(self.db.data_dir, OWNER_LOCK_FILENAME), "a+b")
+        try:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        self._owner_file = f
+        return True
+
+    def start(self) -> threading.Thread:
+        """
+        Thread em segundo plano que acorda a cada tick; só envia enquanto
+        for o dono do lock (nos outros workers fica à espera de assumir).
+        """
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+
+        def run():
+            owner = False
+            while True:
+                if not owner and self.acquire_owner():
+                    owner = True
+                    self.load()
+                    print(f"⏰ Lembretes carregados: {len(self)} pendentes (worker {os.getpid()})")
+                if self._stop.wait(self.tick_seconds - now_epoch() % self.tick_seconds):
+                    break
+                if not owner:
+                    continue
+                try:
+                    self.run_due()
+                except Exception as e:
+                    print(f"⚠️ Erro no agendador de lembretes: {e}")
+
+        self._thread = threading.Thread(target=run, name="reminders", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+
+# Instância global
+reminder_scheduler = ReminderScheduler()
@@ -5,10 +5,13 @@ ROUTES/ADMIN.PY - ROTAS DE ADMINISTRAÇÃO
 
 from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel, Field
-from typing import Annotated
+from typing import Annotated, Dict, List, Optional
 
-from app.auth import get_current_user
+from app.api_keys import api_key_registry
 from app.database import db
+from app.models import User
+from app.permissions import get_current_admin
+from app.schedule_templates import schedule_templates
 
 router = APIRouter()
 
@@ -24,6 +27,26 @@ class AdminConfig(BaseModel):
     logo_url: str = Field(default="https://placehold.co/120x30/667eea/ffffff?text=Salão+IA", description="URL da imagem do logo.")
 
 
+class ApiKeyCreate(BaseModel):
+    """Pedido de criação de chave de API (quiosque/painel)"""
+    nome: str = Field(..., min_length=2, max_length=100, description="Ex: 'Quiosque receção'")
+    user_id: Optional[str] = Field(default=None, description="Dono da chave (padrão: admin atual)")
+    scopes: List[str] = Field(default=["VIEW_PROFESSIONAL_AGENDA"], description="Nomes de Permission")
+    expires_in_days: Optional[int] = Field(default=None, ge=1, le=3650)
+
+
+class ScheduleTemplateIn(BaseModel):
+    """Modelo de horário de um profissional (campos omitidos herdam do default)"""
+    weekly: Optional[Dict[str, List[List[str]]]] = Field(
+        default=None, description='Dia da semana (0 = segunda) -> [["09:00", "13:00"], ...]'
+    )
+    breaks: Optional[List[List[str]]] = Field(default=None, description='Pausas diárias [["13:00", "14:00"]]')
+    holidays: List[str] = Field(default_factory=list, description="Dias fechados (YYYY-MM-DD)")
+    exceptions: Dict[str, List[List[str]]] = Field(
+        default_factory=dict, description="Horário de dias concretos; lista vazia = fechado"
+    )
+
+
 # =============================================================
 # HELPERS
 # =============================================================
@@ -32,20 +55,6 @@ CONFIG_COLLECTION = "system_config"
 CONFIG_DOC_ID = "main_config"
 
 
-def get_current_admin(current_user: Annotated[dict, Depends(get_current_user)]):
-    """Verifica se o usuário logado é um administrador"""
-    
-    # Aceita tanto objeto User quanto dict
-    role = getattr(current_user, 'role', None) or current_user.get("role")
-    
-    if role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Acesso negado. Requer privilégios de administrador."
-        )
-    return current_user
-
-
 # =============================================================
 # ENDPOINTS
 # =============================================================
@@ -66,7 +75,7 @@ async def get_admin_config():
 @router.post("/config/save", response_model=AdminConfig)
 async def save_admin_config_simple(
     config_data_model: AdminConfig,
-    current_user: Annotated[dict, Depends(get_current_admin)]
+    current_user: Annotated[User, Depends(get_current_admin)]
 ):
     """Salva as configurações de tema e logo. Requer admin."""
     
@@ -82,7 +91,7 @@ async def save_admin_config_simple(
 
 @router.get("/stats")
 async def get_admin_stats(
-    current_user: Annotated[dict, Depends(get_current_admin)]
+    current_user: Annotated[User, Depends(get_current_admin)]
 ):
     """Retorna estatísticas básicas do sistema (apenas admin)"""
     
@@ -106,3 +115,100 @@ async def get_admin_stats(
             "admin": len([u for u in users if u.get("role") == "admin"])
         }
     }
+
+
+# =============================================================
+# CHAVES DE API
+# =============================================================
+
+@router.post("/api-keys", status_code=status.HTTP_201_CREATED)
+async def create_api_key(
+    key_data: ApiKeyCreate,
+    current_user: Annotated[User, Depends(get_current_admin)]
+):
+    """Cria chave de API. A chave só é devolvida nesta resposta."""
+    
+    try:
+        plain_key, record = api_key_registry.create_key(
+            nome=key_data.nome,
+            user_id=key_data.user_id or current_user.id,
+            scopes=key_data.scopes,
+            expires_in_days=key_data.expires_in_days
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    record = {k: v for k, v in record.items() if k != "key_hash"}
+    return {"api_key": plain_key, "key": record}
+
+
+@router.get("/api-keys")
+async def list_api_keys(
+    current_user: Annotated[User, Depends(get_current_admin)]
+):
+    """Lista chaves de API (sem o segredo)"""
+    return api_key_registry.list_keys()
+
+
+@router.delete("/api-keys/{key_id}")
+async def revoke_api_key(
+    key_id: str,
+    current_user: Annotated[User, Depends(get_current_admin)]
+):
+    """Revoga uma chave de API"""
+    
+    if not api_key_registry.revoke(key_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chave não encontrada ou já revogada"
+        )
+    
+    return {"message": "Chave revogada com sucesso", "key_id": key_id}
+
+
+# =============================================================
+# MODELOS DE HORÁRIO
+# =============================================================
+
+@router.get("/schedule-templates")
+async def list_schedule_templates(
+    current_user: Annotated[User, Depends(get_current_admin)]
+):
+    """Lista os modelos de horário (id "default" = horário do salão)"""
+    return schedule_templates.list_templates()
+
+
+@router.put("/schedule-templates/{template_id}")
+async def save_schedule_template(
+    template_id: str,
+    template: ScheduleTemplateIn,
+    current_user: Annotated[User, Depends(get_current_admin)]
+):
+    """Cria ou substitui o modelo de horário de um profissional (ou "default")"""
+    
+    try:
+        return schedule_templates.save_template(template_id, template.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.delete("/schedule-templates/{template_id}")
+async def delete_schedule_template(
+    template_id: str,
+    current_user: Annotated[User, Depends(get_current_admin)]
+):
+    """Remove um modelo; o profissional volta ao horário do salão"""
+    
+    if not schedule_templates.delete_template(template_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Modelo de horário não encontrado"
+        )
+    
+    return {"message": "Modelo de horário removido", "template_id": template_id}
@@ -1,11 +1,37 @@
 # app/routes/appointments.py - VERSÃO MÍNIMA PARA TESTE
 
-from fastapi import APIRouter, HTTPException, status
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Annotated, List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from pydantic import BaseModel
+import json
 import uuid
 
+from app.api_keys import optional_oauth2_scheme, require_scopes
+from app.appointment_events import appointment_events, stream_view
+from app.appointment_states import InvalidTransitionError, appointment_states
+from app.auth import get_current_user
+from app.appointment_service import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, OutsideOpeningHoursError, appointment_service,
+    decode_cursor, encode_cursor, normalize_appointment, sort_key
+)
+from app.availability import SLOT_STEP_MINUTES, appointment_duration, availability_index
+from app.batch_scheduling import MAX_BATCH_SIZE, BatchPlanner
+from app.booking_drafts import booking_drafts
+from app.booking_holds import HoldNotFoundError, SlotUnavailableError, slot_holds
+from app.config import config
+from app.database import db
+from app.etags import etag_matches, make_etag, not_modified
+from app.models import User
+from app.no_show import no_show_predictor, overbooking_policy
+from app.permissions import Permission, has_permission, require_permissions
+from app.reminders import reminder_scheduler
+from app.salon_time import salon_now
+from app.recurrence import FREQUENCIES, expand as expand_rule, recurrence_rules, split_occurrence_id
+from app.slot_calendar import mask_to_times
+from app.waitlist import waitlist
+
 # ✅ SEM prefix e tags (definidos no main.py)
 router = APIRouter()
 
@@ -43,11 +69,104 @@ class ScheduleAppointmentRequest(BaseModel):
     appointment_time: str  # Format: 14:30
     professional_id: Optional[str] = None
     notes: Optional[str] = ""
+    overbook: bool = False  # Aceita partilhar um horário com provável falta (overbooking)
+    hold_id: Optional[str] = None  # Reserva feita em /hold
+
+class HoldSlotRequest(BaseModel):
+    booking_code: str
+    appointment_date: str
+    appointment_time: str
+    professional_id: Optional[str] = None
+
+class WaitlistJoinRequest(BaseModel):
+    servico: Optional[str] = None
+    duration: Optional[int] = None
+    booking_code: Optional[str] = None
+    professional_id: Optional[str] = None
+    window_start: str
+    window_end: str
+
+class BatchScheduleItem(BaseModel):
+    appointment_date: str
+    appointment_time: str
+    booking_code: Optional[str] = None
+    servico: Optional[str] = None
+    duration: Optional[int] = None
+    professional_id: Optional[str] = None
+    usuario_id: Optional[str] = None
+    notes: Optional[str] = ""
+
+class BatchScheduleRequest(BaseModel):
+    items: List[BatchScheduleItem]
+    atomic: bool = False  # True: grava tudo ou nada
+
+class RecurringAppointmentRequest(BaseModel):
+    appointment_date: str
+    appointment_time: str
+    freq: str  # daily, weekly, monthly
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[str] = None
+    booking_code: Optional[str] = None
+    servico: Optional[str] = None
+    duration: Optional[int] = None
+    professional_id: Optional[str] = None
+
+class MoveOccurrenceRequest(BaseModel):
+    date: str
+    new_date: str
+    new_time: str
+
+# ==================== CONFIGURAÇÃO ====================
+
+# Duração usada quando o pedido não indica serviço preparado nem duration
+DEFAULT_SLOT_DURATION = 30
+
+# Janela padrão (dias) das ocorrências recorrentes em /list
+LIST_RECURRING_DAYS = 30
+
+# Intervalo dos comentários keep-alive do stream SSE (proxies fecham ligações paradas)
+STREAM_HEARTBEAT_SECONDS = 15
 
 # ==================== STORAGE ====================
 
-pending_bookings = {}
-scheduled_appointments = {}
+# Bookings preparados ficam em booking_drafts (TTL, limite de tamanho, SQLite)
+# Agendamentos são gravados pelo appointment_service (appointments.json)
+
+# ==================== FUNÇÕES AUXILIARES ====================
+
+def recurring_rule_for(rule_id: str, current_user: User) -> Dict:
+    """Regra do utilizador (ou qualquer uma, para administradores); 404 se não houver"""
+    rule = recurrence_rules.get(rule_id)
+    if rule and rule.get("usuario_id") != current_user.id and not has_permission(
+        current_user, Permission.MANAGE_APPOINTMENTS
+    ):
+        rule = None
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Agendamento recorrente não encontrado"
+        )
+    return rule
+
+async def get_optional_user(
+    token: Annotated[Optional[str], Depends(optional_oauth2_scheme)]
+) -> Optional[User]:
+    """User do token, se vier um válido (/schedule também aceita pedidos anónimos)"""
+    if not token:
+        return None
+    try:
+        return await get_current_user(token)
+    except HTTPException:
+        return None
+
+def can_manage_appointment(current_user: User, appointment: Dict) -> bool:
+    """Administrador, profissional do agendamento ou cliente dono dele"""
+    if has_permission(current_user, Permission.MANAGE_APPOINTMENTS):
+        return True
+    if has_permission(current_user, Permission.VIEW_PROFESSIONAL_AGENDA):
+        return str(appointment.get("profissional_id")) == current_user.id
+    return appointment.get("cliente_id") == current_user.id
 
 # ==================== ENDPOINTS ====================
 
@@ -77,7 +196,7 @@ async def prepare_appointment(data: PrepareAppointmentRequest):
             "created_at": datetime.now().isoformat()
         }
         
-        pending_bookings[booking_code] = booking_data
+        booking_drafts.put(booking_code, booking_data)
         
         print(f"✅ Agendamento preparado: {booking_code}")
         
@@ -95,16 +214,144 @@ async def prepare_appointment(data: PrepareAppointmentRequest):
             detail=f"Erro ao preparar agendamento: {str(e)}"
         )
 
+@router.post("/hold")
+async def hold_slot(data: HoldSlotRequest):
+    """
+    Reserva o horário por alguns minutos enquanto o cliente confirma.
+    O hold_id devolvido deve ser enviado em /schedule.
+    """
+    try:
+        appointment_datetime = datetime.fromisoformat(f"{data.appointment_date}T{data.appointment_time}")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de data/hora inválido"
+        )
+    
+    if appointment_datetime < salon_now():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Data e hora não podem estar no passado"
+        )
+    
+    booking = booking_drafts.get(data.booking_code) or {}
+    duration = appointment_duration(booking)
+    servicos = [s.get("name", "") for s in booking.get("services", [])]
+    professional_id = data.professional_id or appointment_service.assign_professional(
+        servicos, appointment_datetime, duration
+    )
+    if not professional_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Nenhum profissional disponível neste horário"
+        )
+    
+    try:
+        appointment_service.check_opening_hours(professional_id, appointment_datetime, duration)
+        hold = slot_holds.place_hold(
+            professional_id,
+            appointment_datetime,
+            duration,
+            booking_code=data.booking_code
+        )
+    except OutsideOpeningHoursError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except SlotUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    print(f"⏳ Horário reservado: {hold['hold_id']} ({hold['start']}, {duration} min)")
+    
+    return slot_holds.public_view(hold)
+
+@router.delete("/hold/{hold_id}")
+async def release_hold(hold_id: str):
+    """
+    Liberta uma reserva antes de expirar.
+    """
+    if not slot_holds.release(hold_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reserva não encontrada ou expirada"
+        )
+    return {"message": "Reserva libertada", "hold_id": hold_id}
+
 @router.get("/list")
-async def list_appointments():
+async def list_appointments(
+    request: Request,
+    response: Response,
+    current_user: Annotated[User, Depends(get_current_user)],
+    usuario_id: Optional[str] = None,
+    professional_id: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    de: Optional[str] = None,
+    ate: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
     """
-    Lista agendamentos.
+    Lista agendamentos por ordem de data_hora, paginados por cursor.
+    Filtros: usuario_id, professional_id, status e janela de..ate.
+    Administradores veem todos; profissionais, a própria agenda;
+    clientes, os seus agendamentos.
+    Ocorrências de agendamentos recorrentes entram na janela de..ate
+    (padrão: próximos 30 dias). Para a página seguinte, repetir o pedido
+    com cursor=next_cursor.
+    Suporta If-None-Match (304 sem ler os arquivos).
     """
-    appointments = list(scheduled_appointments.values())
+    if not has_permission(current_user, Permission.MANAGE_APPOINTMENTS):
+        if has_permission(current_user, Permission.VIEW_PROFESSIONAL_AGENDA):
+            professional_id = current_user.id
+        else:
+            usuario_id = current_user.id
+    
+    try:
+        first = datetime.fromisoformat(de).date() if de else salon_now().date()
+        last = datetime.fromisoformat(ate).date() if ate else first + timedelta(days=LIST_RECURRING_DAYS)
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Parâmetros inválidos: {e}"
+        )
+    
+    etag = make_etag(
+        "appointments", db.collection_version("appointments"),
+        db.collection_version("recurrences"), usuario_id, professional_id,
+        status_filter, first, last, cursor, limit
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
+    # Agendamentos gravados: presos à janela só se de/ate forem indicados
+    stored, next_cursor = appointment_service.page(
+        client_id=usuario_id,
+        professional_id=professional_id,
+        status=status_filter,
+        first_day=first.isoformat() if de else None,
+        last_day=last.isoformat() if ate else None,
+        cursor=cursor,
+        limit=limit
+    )
+    
+    # Ocorrências recorrentes só dentro da janela, a seguir ao cursor
+    occurrences = [
+        normalize_appointment(o)
+        for o in recurrence_rules.occurrences_between(first, last, usuario_id)
+        if (not professional_id or str(o["profissional_id"]) == str(professional_id))
+        and (not status_filter or o["status"] == status_filter)
+        and (not after or sort_key(o) > after)
+    ]
+    
+    appointments = sorted(stored + occurrences, key=sort_key)
+    if next_cursor or len(appointments) > limit:
+        appointments = appointments[:limit]
+        next_cursor = encode_cursor(sort_key(appointments[-1]))
     
     return {
         "appointments": appointments,
-        "total": len(appointments)
+        "total": len(appointments),
+        "next_cursor": next_cursor
     }
 
 @router.get("/health")
@@ -114,14 +361,61 @@ async def appointments_health():
     """
     return {
         "status": "ok",
-        "pending_bookings": len(pending_bookings),
-        "scheduled_appointments": len(scheduled_appointments)
+        "pending_bookings": len(booking_drafts),
+        "scheduled_appointments": appointment_states.count("confirmado"),
+        "confirmed_today": appointment_states.count("confirmado", salon_now().date().isoformat()),
+        "stream_subscribers": len(appointment_events),
+        "pending_reminders": len(reminder_scheduler)
     }
 
+@router.get("/stream")
+async def stream_appointments(
+    request: Request,
+    current_user: Annotated[User, Depends(require_scopes(Permission.VIEW_PROFESSIONAL_AGENDA))],
+    professional_id: Optional[str] = None,
+    date: Optional[str] = None
+):
+    """
+    Stream SSE com as alterações da agenda (created, confirmed, cancelled,
+    completed, updated), filtrado por profissional e/ou data (YYYY-MM-DD).
+    Profissionais recebem só a própria agenda; os eventos levam só os
+    campos de agenda (sem dados do cliente).
+    Um evento "resync" indica que o cliente ficou para trás e deve
+    recarregar a lista.
+    """
+    if not has_permission(current_user, Permission.MANAGE_APPOINTMENTS):
+        professional_id = current_user.id
+    
+    subscription = appointment_events.subscribe(professional_id, date)
+    
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(STREAM_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                data = json.dumps(stream_view(event["appointment"]), ensure_ascii=False, default=str)
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+        finally:
+            appointment_events.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/schedule")
-async def schedule_appointment(data: ScheduleAppointmentRequest):
+async def schedule_appointment(
+    data: ScheduleAppointmentRequest,
+    current_user: Annotated[Optional[User], Depends(get_optional_user)]
+):
     """
     Agenda uma data e hora para um booking preparado.
+    Com sessão iniciada o agendamento fica em nome do cliente (e recebe
+    lembretes); sem sessão fica anónimo e sem lembretes.
     """
     try:
         # Gerar ID do agendamento
@@ -129,47 +423,60 @@ async def schedule_appointment(data: ScheduleAppointmentRequest):
         
         # Validar data (não pode ser no passado)
         appointment_datetime = datetime.fromisoformat(f"{data.appointment_date}T{data.appointment_time}")
-        if appointment_datetime < datetime.now():
+        if appointment_datetime < salon_now():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Data e hora não podem estar no passado"
             )
         
         # Buscar booking se existir
-        booking = pending_bookings.get(data.booking_code, {})
+        booking = booking_drafts.get(data.booking_code) or {}
+        duration = appointment_duration(booking)
         
-        # Criar agendamento
-        appointment = {
-            "appointment_id": appointment_id,
-            "booking_code": data.booking_code,
-            "appointment_date": data.appointment_date,
-            "appointment_time": data.appointment_time,
-            "appointment_datetime": appointment_datetime.isoformat(),
-            "professional_id": data.professional_id,
-            "notes": data.notes,
-            "services": booking.get("services", []),
-            "medical_questionnaire": booking.get("medical_questionnaire"),
-            "total_price": booking.get("total_price", 0),
-            "total_duration": booking.get("total_duration", 0),
-            "requires_test": booking.get("requires_test", False),
-            "status": "scheduled",
-            "created_at": datetime.now().isoformat(),
-            "scheduled_at": datetime.now().isoformat()
-        }
+        # Profissional: o pedido, o da reserva, ou atribuição automática
+        servicos = [s.get("name", "") for s in booking.get("services", [])]
+        professional_id = data.professional_id
+        if not professional_id and data.hold_id:
+            hold = slot_holds.get(data.hold_id)
+            professional_id = hold["professional_id"] if hold else None
+        if not professional_id:
+            professional_id = appointment_service.assign_professional(
+                servicos, appointment_datetime, duration
+            )
+        if not professional_id and data.overbook:
+            professional_id = appointment_service.overbooking_professional(
+                servicos, appointment_datetime, duration
+            )
+        if not professional_id:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Nenhum profissional disponível neste horário"
+            )
         
-        # Salvar agendamento
-        scheduled_appointments[appointment_id] = appointment
+        # Criar agendamento (formato comum) só se o horário estiver livre
+        appointment = appointment_service.build_from_booking(
+            booking, data.booking_code, professional_id, appointment_datetime, data.notes,
+            client_id=current_user.id if current_user else None, appointment_id=appointment_id
+        )
+        try:
+            created = appointment_service.create(appointment, hold_id=data.hold_id, overbook=data.overbook)
+        except OutsideOpeningHoursError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except HoldNotFoundError as e:
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+        except SlotUnavailableError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
         
         # Atualizar status do booking
-        if data.booking_code in pending_bookings:
-            pending_bookings[data.booking_code]["status"] = "scheduled"
-            pending_bookings[data.booking_code]["appointment_id"] = appointment_id
+        booking_drafts.update(data.booking_code, status="scheduled", appointment_id=appointment_id)
         
         print(f"✅ Agendamento confirmado: {appointment_id} para {data.appointment_date} às {data.appointment_time}")
         
         return {
             "appointment_id": appointment_id,
             "status": "scheduled",
+            "professional_id": professional_id,
+            "overbooked": created.get("overbooked", False),
             "appointment_datetime": appointment_datetime.isoformat(),
             "message": "Agendamento confirmado com sucesso"
         }
@@ -183,59 +490,480 @@ async def schedule_appointment(data: ScheduleAppointmentRequest):
             detail=f"Erro ao agendar: {str(e)}"
         )
 
-@router.get("/available-slots/{date}")
-async def get_available_slots(date: str):
+@router.post("/schedule/batch")
+async def schedule_appointments_batch(
+    data: BatchScheduleRequest,
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.MANAGE_APPOINTMENTS,
+        detail="Apenas administradores podem agendar em lote"
+    ))]
+):
     """
-    Retorna horários disponíveis para uma data específica.
+    Agenda vários horários de uma vez (migração de agenda, grupos de noivas).
+    
+    Todos os itens são validados numa passagem sobre os bitsets dos dias,
+    incluindo conflitos entre itens do próprio lote; os aceites são gravados
+    numa única escrita. Devolve o resultado de cada item pela ordem
+    recebida; itens sem usuario_id ficam em nome de quem faz o pedido.
     """
-    try:
-        target_date = datetime.fromisoformat(date).date()
-        
-        # Horários de funcionamento: 9h às 18h
-        # Intervalos de 30 minutos
-        all_slots = []
-        current_time = datetime.combine(target_date, datetime.min.time()).replace(hour=9)
-        end_time = datetime.combine(target_date, datetime.min.time()).replace(hour=18)
-        
-        while current_time < end_time:
-            all_slots.append(current_time.strftime("%H:%M"))
-            current_time += timedelta(minutes=30)
+    if not data.items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Lote vazio")
+    if len(data.items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {MAX_BATCH_SIZE} agendamentos por lote"
+        )
+    
+    planner = BatchPlanner()
+    now = salon_now()
+    default_user_id = current_user.id
+    results: List[Dict[str, Any]] = []
+    prepared = []
+    
+    # Preparar itens (datas, serviços, candidatos) fora do lock
+    for position, item in enumerate(data.items):
+        try:
+            start = datetime.fromisoformat(f"{item.appointment_date}T{item.appointment_time}")
+        except ValueError:
+            results.append({"index": position, "status": "error", "error": "Formato de data/hora inválido"})
+            continue
+        if start < now:
+            results.append({"index": position, "status": "error", "error": "Data e hora não podem estar no passado"})
+            continue
         
-        # Verificar slots ocupados
-        occupied_slots = []
-        for apt in scheduled_appointments.values():
-            if apt["appointment_date"] == date and apt["status"] == "scheduled":
-                occupied_slots.append(apt["appointment_time"])
+        booking = booking_drafts.get(item.booking_code) if item.booking_code else None
+        if not booking:
+            if not item.servico:
+                results.append({"index": position, "status": "error", "error": "Indique booking_code ou servico"})
+                continue
+            duration = item.duration or DEFAULT_SLOT_DURATION
+            booking = {
+                "services": [{"id": str(position), "name": item.servico, "duration": duration, "price": 0}],
+                "total_duration": duration,
+            }
         
-        # Filtrar slots disponíveis
-        available_slots = [slot for slot in all_slots if slot not in occupied_slots]
+        services = [s.get("name", "") for s in booking.get("services", [])]
+        candidates = planner.candidate_ids(item.professional_id, services)
+        prepared.append((position, item, start, booking, appointment_duration(booking), candidates))
+        results.append(None)
+    
+    professional_ids = {pid for *_, candidates in prepared for pid in candidates}
+    new_appointments = []
+    
+    with slot_holds.locked(professional_ids):
+        for position, item, start, booking, duration, candidates in prepared:
+            professional_id, error = planner.place(start, duration, candidates)
+            if error:
+                results[position] = {"index": position, "status": "error", "error": error}
+                continue
+            
+            appointment = appointment_service.build_from_booking(
+                booking, item.booking_code, professional_id, start, item.notes,
+                item.usuario_id or default_user_id
+            )
+            new_appointments.append(appointment)
+            results[position] = {
+                "index": position,
+                "status": "created",
+                "appointment_id": appointment["id"],
+                "professional_id": professional_id,
+                "appointment_datetime": start.isoformat()
+            }
         
-        return {
-            "date": date,
-            "available_slots": available_slots,
-            "occupied_slots": occupied_slots
-        }
+        failed = sum(1 for r in results if r["status"] == "error")
+        committed = bool(new_appointments) and not (data.atomic and failed)
         
+        if committed:
+            new_appointments = appointment_service.create_many(new_appointments)
+    
+    if not committed and data.atomic:
+        for result in results:
+            if result["status"] == "created":
+                result["status"] = "rolled_back"
+    
+    print(f"📦 Lote: {len(new_appointments) if committed else 0} agendados, {failed} recusados")
+    
+    return {
+        "committed": committed,
+        "created": len(new_appointments) if committed else 0,
+        "failed": failed,
+        "results": results
+    }
+
+@router.get("/available-slots/{date}")
+async def get_available_slots(
+    date: str,
+    request: Request,
+    response: Response,
+    professional_id: Optional[str] = None,
+    include_overbooking: bool = False
+):
+    """
+    Retorna horários disponíveis para uma data específica.
+    Sem professional_id: horários em que algum profissional da equipa está livre.
+    include_overbooking: devolve também overbooking_slots, horários que só
+    cabem por cima de um agendamento com alta probabilidade de falta.
+    Suporta If-None-Match (ETag da versão do dia do profissional).
+    """
+    try:
+        target_date = datetime.fromisoformat(date).date()
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Formato de data inválido. Use YYYY-MM-DD"
         )
+    
+    day = target_date.isoformat()
+    if professional_id:
+        occupancy = availability_index.day_version(professional_id, day)
+    else:
+        occupancy = (availability_index.date_version(day), db.collection_version("professionals"))
+    etag = make_etag(
+        "slots", day, professional_id, occupancy,
+        db.collection_version("schedule_templates"), SLOT_STEP_MINUTES,
+        (overbooking_policy.enabled, config.features.overbooking_no_show_threshold,
+         config.features.overbooking_max_per_day, no_show_predictor.model_version())
+        if include_overbooking else None
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
+    professional_ids = [professional_id] if professional_id else appointment_service.candidate_professionals([])
+    
+    # Intervalos de 30 minutos (um bit por início), agenda real dos profissionais
+    available, opening = appointment_service.available_starts(
+        target_date, professional_ids, SLOT_STEP_MINUTES, SLOT_STEP_MINUTES
+    )
+    
+    result = {
+        "date": date,
+        "available_slots": mask_to_times(available),
+        "occupied_slots": mask_to_times(opening & ~available)
+    }
+    if include_overbooking:
+        result["overbooking_slots"] = mask_to_times(appointment_service.overbooking_starts(
+            target_date, professional_ids, SLOT_STEP_MINUTES, SLOT_STEP_MINUTES
+        ))
+    return result
+
+@router.post("/recurring")
+async def create_recurring_appointment(
+    data: RecurringAppointmentRequest,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """
+    Cria um agendamento recorrente (ex: manicure semanal).
+    Só a regra é gravada; as ocorrências são calculadas quando consultadas.
+    """
+    try:
+        dtstart = datetime.fromisoformat(f"{data.appointment_date}T{data.appointment_time}")
+        until = datetime.fromisoformat(data.until).date() if data.until else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de data/hora inválido"
+        )
+    
+    if dtstart < salon_now():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Data e hora não podem estar no passado"
+        )
+    
+    if data.freq not in FREQUENCIES or data.interval < 1 or (data.count is not None and data.count < 1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Recorrência inválida (freq: {', '.join(sorted(FREQUENCIES))}; interval e count positivos)"
+        )
+    
+    booking = booking_drafts.get(data.booking_code) if data.booking_code else None
+    services = [s.get("name", "") for s in (booking or {}).get("services", [])]
+    servico = data.servico or ", ".join(services)
+    duration = data.duration or (appointment_duration(booking) if booking else DEFAULT_SLOT_DURATION)
+    professional_id = data.professional_id or appointment_service.assign_professional(
+        services or [servico], dtstart, duration
+    )
+    if not professional_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Nenhum profissional disponível neste horário para os serviços escolhidos"
+        )
+    
+    rule_preview = {
+        "id": "preview", "profissional_id": professional_id, "total_duration": duration,
+        "dtstart": dtstart.isoformat(), "freq": data.freq, "interval": data.interval,
+        "count": data.count, "until": until.isoformat() if until else None,
+    }
+    
+    # Validar as ocorrências do horizonte contra horário e agenda do profissional
+    conflicts = []
+    try:
+        first, last = recurrence_rules.conflict_window(rule_preview)
+        occurrences = expand_rule(rule_preview, first, last)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    for occ in occurrences:
+        start = datetime.fromisoformat(occ["data_hora"])
+        try:
+            appointment_service.check_opening_hours(professional_id, start, duration)
+        except OutsideOpeningHoursError:
+            conflicts.append(occ["data_hora"])
+            continue
+        if appointment_service.find_conflict(professional_id, start, duration):
+            conflicts.append(occ["data_hora"])
+    
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Algumas ocorrências estão ocupadas ou fora do horário", "conflicts": conflicts[:20]}
+        )
+    
+    # A primeira ocorrência passa pelo mesmo lock/versão do /schedule
+    try:
+        rule = slot_holds.commit(
+            professional_id,
+            dtstart,
+            duration,
+            lambda: recurrence_rules.create(
+                usuario_id=current_user.id,
+                professional_id=professional_id,
+                servico=servico,
+                duration=duration,
+                dtstart=dtstart,
+                freq=data.freq,
+                interval=data.interval,
+                count=data.count,
+                until=until
+            )
+        )
+    except SlotUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    print(f"🔁 Agendamento recorrente criado: {rule['id']} ({data.freq}, {servico})")
+    
+    return {
+        "rule": rule,
+        "next_occurrences": [o["data_hora"] for o in occurrences[:5]]
+    }
+
+@router.get("/recurring")
+async def list_recurring_appointments(
+    current_user: Annotated[User, Depends(get_current_user)],
+    usuario_id: Optional[str] = None
+):
+    """
+    Lista as regras de agendamentos recorrentes.
+    Clientes veem só as suas; usuario_id é um filtro para administradores.
+    """
+    if not has_permission(current_user, Permission.MANAGE_APPOINTMENTS):
+        usuario_id = current_user.id
+    rules = recurrence_rules.list_rules(usuario_id)
+    return {"rules": rules, "total": len(rules)}
+
+@router.post("/recurring/{rule_id}/move")
+async def move_recurring_occurrence(
+    rule_id: str,
+    data: MoveOccurrenceRequest,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """
+    Muda uma ocorrência da série para outra data/hora (grava só a exceção).
+    """
+    try:
+        original_day = datetime.fromisoformat(data.date).date()
+        new_start = datetime.fromisoformat(f"{data.new_date}T{data.new_time}")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de data/hora inválido"
+        )
+    
+    rule = recurring_rule_for(rule_id, current_user)
+    professional_id = rule["profissional_id"]
+    duration = rule["total_duration"]
+    
+    try:
+        appointment_service.check_opening_hours(professional_id, new_start, duration)
+        before = slot_holds.commit(
+            professional_id,
+            new_start,
+            duration,
+            lambda: recurrence_rules.set_exception(rule_id, original_day, {"data_hora": new_start.isoformat()})
+        )
+    except OutsideOpeningHoursError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except SlotUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    if not before:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ocorrência não encontrada nesta série"
+        )
+    
+    # O horário antigo fica livre (lista de espera)
+    db._notify("appointments", "updated", {**before, "status": "cancelado"})
+    
+    return {
+        "message": "Ocorrência reagendada",
+        "rule_id": rule_id,
+        "original_date": original_day.isoformat(),
+        "new_datetime": new_start.isoformat()
+    }
+
+@router.delete("/recurring/{rule_id}")
+async def end_recurring_appointment(
+    rule_id: str,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """
+    Termina a série a partir de hoje (o histórico mantém-se).
+    """
+    recurring_rule_for(rule_id, current_user)
+    rule = recurrence_rules.end(rule_id)
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Agendamento recorrente não encontrado"
+        )
+    return {"message": "Agendamento recorrente terminado", "rule": rule}
+
+@router.post("/waitlist")
+async def join_waitlist(
+    data: WaitlistJoinRequest,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """
+    Regista interesse num serviço entre window_start e window_end.
+    Quando um horário compatível for cancelado, é reservado para o cliente
+    (ver "offer": confirmar com /schedule usando booking_code e hold_id).
+    """
+    try:
+        window_start = datetime.fromisoformat(data.window_start)
+        window_end = datetime.fromisoformat(data.window_end)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de data/hora inválido"
+        )
+    
+    booking = booking_drafts.get(data.booking_code) if data.booking_code else None
+    servico = data.servico or ", ".join(s.get("name", "") for s in (booking or {}).get("services", []))
+    duration = data.duration or (appointment_duration(booking) if booking else None)
+    if not servico or not duration:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indique servico e duration, ou um booking_code preparado"
+        )
+    
+    try:
+        entry = waitlist.join(
+            usuario_id=current_user.id,
+            servico=servico,
+            duration=duration,
+            window_start=window_start,
+            window_end=window_end,
+            professional_id=data.professional_id,
+            booking=booking
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    print(f"📝 Lista de espera: {entry['id']} ({servico}, {duration} min)")
+    return entry
+
+@router.get("/waitlist")
+async def list_waitlist(
+    current_user: Annotated[User, Depends(get_current_user)],
+    usuario_id: Optional[str] = None
+):
+    """
+    Lista os pedidos ativos da lista de espera (com ofertas pendentes).
+    Clientes veem só os seus; usuario_id é um filtro para administradores.
+    """
+    if not has_permission(current_user, Permission.MANAGE_APPOINTMENTS):
+        usuario_id = current_user.id
+    entries = waitlist.list_entries(usuario_id)
+    return {"entries": entries, "total": len(entries)}
+
+@router.delete("/waitlist/{entry_id}")
+async def leave_waitlist(
+    entry_id: str,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """
+    Remove um pedido da lista de espera.
+    """
+    entry = waitlist.get(entry_id)
+    if entry and entry["usuario_id"] != current_user.id and not has_permission(
+        current_user, Permission.MANAGE_APPOINTMENTS
+    ):
+        entry = None
+    if not entry or not waitlist.remove(entry_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pedido não encontrado na lista de espera"
+        )
+    return {"message": "Pedido removido da lista de espera", "entry_id": entry_id}
 
 @router.delete("/{appointment_id}")
-async def cancel_appointment(appointment_id: str):
+async def cancel_appointment(
+    appointment_id: str,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
     """
-    Cancela um agendamento.
+    Cancela um agendamento ou uma ocorrência de uma série (do próprio
+    cliente, da agenda do profissional, ou qualquer um para administradores).
     """
-    if appointment_id not in scheduled_appointments:
+    # Ocorrência de uma série: grava só a exceção
+    occurrence = split_occurrence_id(appointment_id)
+    if occurrence:
+        rule_id, day = occurrence
+        rule = recurrence_rules.get(rule_id)
+        before = None
+        if rule and can_manage_appointment(
+            current_user, {"profissional_id": rule["profissional_id"], "cliente_id": rule["usuario_id"]}
+        ):
+            try:
+                before = recurrence_rules.set_exception(
+                    rule_id, datetime.fromisoformat(day).date(), {"status": "cancelado"}
+                )
+            except ValueError:
+                before = None
+        if not before:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Agendamento não encontrado"
+            )
+        db._notify("appointments", "updated", {**before, "status": "cancelado"})
+        print(f"✅ Ocorrência cancelada: {appointment_id}")
+        return {
+            "message": "Agendamento cancelado com sucesso",
+            "appointment_id": appointment_id
+        }
+    
+    appointment = appointment_service.get(appointment_id)
+    if appointment and not can_manage_appointment(current_user, appointment):
+        appointment = None
+    if not appointment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Agendamento não encontrado"
         )
     
-    appointment = scheduled_appointments[appointment_id]
-    appointment["status"] = "cancelled"
-    appointment["cancelled_at"] = datetime.now().isoformat()
+    try:
+        cancelled = appointment_service.cancel(appointment_id, actor=current_user.id)
+    except InvalidTransitionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if not cancelled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Agendamento não encontrado"
+        )
     
     print(f"✅ Agendamento cancelado: {appointment_id}")
     
@@ -9,11 +9,14 @@ import os
 import uuid
 
 from app.auth import get_current_user
+from app.permissions import Permission, has_permission, require_permissions
 from app.models import (
     User, AttendanceRecordCreate, AttendanceRecordResponse,
     StrandTestCreate, StrandTestResponse
 )
 from app.database import db
+from app.appointment_service import appointment_service
+from app.appointment_states import InvalidTransitionError, appointment_states
 
 router = APIRouter()
 
@@ -28,19 +31,15 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 @router.post("/records", response_model=AttendanceRecordResponse)
 async def create_attendance_record(
     record: AttendanceRecordCreate,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.WRITE_CLIENT_RECORDS,
+        detail="Apenas profissionais podem criar fichas de atendimento"
+    ))]
 ):
     """Cria ficha de atendimento (profissional)"""
     
-    if current_user.role != "profissional":
-        raise HTTPException(
-            status_code=403,
-            detail="Apenas profissionais podem criar fichas de atendimento"
-        )
-    
     # Verifica se o agendamento existe e pertence ao profissional
-    appointments = db.get_all_appointments()
-    appointment = next((a for a in appointments if a["id"] == record.appointment_id), None)
+    appointment = appointment_service.get(record.appointment_id)
     
     if not appointment or appointment["profissional_id"] != current_user.id:
         raise HTTPException(
@@ -48,13 +47,19 @@ async def create_attendance_record(
             detail="Agendamento inválido ou não pertence a você"
         )
     
+    # Só agendamentos que ainda podem passar a concluído (ex: não cancelados)
+    try:
+        appointment_states.validate(appointment["status"], "concluido")
+    except InvalidTransitionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
     record_data = record.model_dump()
     record_data["profissional_id"] = current_user.id
     
     created = db.create_attendance_record(record_data)
     
     # Atualiza status do agendamento para concluído
-    db.update_appointment_status(record.appointment_id, "concluido", current_user.id)
+    appointment_service.update_status(record.appointment_id, "concluido", current_user.id)
     
     return AttendanceRecordResponse(**created)
 
@@ -66,7 +71,7 @@ async def get_client_attendance_records(
 ):
     """Lista fichas de atendimento do cliente"""
     
-    if current_user.role not in ["profissional", "admin"] and current_user.id != cliente_id:
+    if current_user.id != cliente_id and not has_permission(current_user, Permission.VIEW_CLIENT_RECORDS):
         raise HTTPException(
             status_code=403,
             detail="Sem permissão para ver fichas de outros clientes"
@@ -116,7 +121,7 @@ async def update_attendance_record(
             )
         update_data = filtered_data
     # Profissional pode atualizar tudo
-    elif current_user.role != "profissional" or record["profissional_id"] != current_user.id:
+    elif not has_permission(current_user, Permission.WRITE_CLIENT_RECORDS) or record["profissional_id"] != current_user.id:
         raise HTTPException(
             status_code=403,
             detail="Sem permissão para atualizar esta ficha"
@@ -135,7 +140,10 @@ async def update_attendance_record(
 async def upload_attendance_photos(
     record_id: str,
     tipo: str,  # "antes" ou "depois"
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.WRITE_CLIENT_RECORDS,
+        detail="Apenas profissionais podem fazer upload de fotos"
+    ))],
     files: List[UploadFile] = File(...)
 ):
     """
@@ -147,12 +155,6 @@ async def upload_attendance_photos(
         files: Lista de arquivos para upload
     """
     
-    if current_user.role != "profissional":
-        raise HTTPException(
-            status_code=403,
-            detail="Apenas profissionais podem fazer upload de fotos"
-        )
-    
     # Busca ficha
     records = db._read_file("attendance_records")
     record = next((r for r in records if r["id"] == record_id), None)
@@ -199,16 +201,13 @@ async def upload_attendance_photos(
 @router.post("/strand-tests", response_model=StrandTestResponse)
 async def create_strand_test(
     test: StrandTestCreate,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.WRITE_CLIENT_RECORDS,
+        detail="Apenas profissionais podem registrar testes de mecha"
+    ))]
 ):
     """Registra teste de mecha (profissional)"""
     
-    if current_user.role != "profissional":
-        raise HTTPException(
-            status_code=403,
-            detail="Apenas profissionais podem registrar testes de mecha"
-        )
-    
     test_data = test.model_dump()
     test_data["profissional_id"] = current_user.id
     
@@ -224,7 +223,7 @@ async def get_client_strand_tests(
 ):
     """Lista testes de mecha do cliente"""
     
-    if current_user.role not in ["profissional", "admin"] and current_user.id != cliente_id:
+    if current_user.id != cliente_id and not has_permission(current_user, Permission.VIEW_CLIENT_RECORDS):
         raise HTTPException(
             status_code=403,
             detail="Sem permissão"
@@ -3,19 +3,20 @@ ROUTES/AUTH.PY - ROTAS DE AUTENTICAÇÃO
 ======================================
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Annotated
 from datetime import timedelta
 
 from app.models import User, Token, UserCreate
-from app.database import db
+from app.database import db, DuplicateEmailError
 from app.auth import (
     get_password_hash, 
     authenticate_user, 
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from app.rate_limit import login_rate_limiter
 
 router = APIRouter()
 
@@ -24,10 +25,10 @@ router = APIRouter()
 async def register_user(user_data: UserCreate):
     """Cria um novo usuário cliente"""
     
-    # Verifica se email já existe
+    # Verifica se email já existe (lookup O(1); evita o bcrypt em duplicados)
     if db.get_user_by_email(user_data.email):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_409_CONFLICT,
             detail="Email já registado"
         )
     
@@ -39,7 +40,14 @@ async def register_user(user_data: UserCreate):
     new_user["senha"] = hashed_password
     new_user["role"] = "cliente"  # Role padrão
     
-    created_user = db.create_user(new_user)
+    # Unicidade garantida atomicamente no storage (registos concorrentes)
+    try:
+        created_user = db.create_user(new_user)
+    except DuplicateEmailError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Email já registado"
+        )
     
     # Remove senha antes de retornar
     created_user.pop("senha", None)
@@ -49,11 +57,16 @@ async def register_user(user_data: UserCreate):
 
 @router.post("/login", response_model=Token)
 async def login_for_access_token(
+    request: Request,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
 ):
     """
     Autentica o usuário usando Form Data (username/email e password)
     """
+    # Limita tentativas por IP e por email antes de tocar na base/bcrypt
+    client_ip = request.client.host if request.client else None
+    login_rate_limiter.check(client_ip, form_data.username)
+    
     # Busca usuário
     db_user = db.get_user_by_email(form_data.username)
     
@@ -74,6 +87,8 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    login_rate_limiter.reset_email(form_data.username)
+    
     # Cria token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
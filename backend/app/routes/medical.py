@@ -7,6 +7,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Annotated
 
 from app.auth import get_current_user
+from app.permissions import Permission, has_permission, require_permissions
 from app.models import (
     User, MedicalHistoryCreate, MedicalHistoryResponse,
     ConsultationCreate, ConsultationResponse
@@ -63,19 +64,16 @@ async def get_my_medical_history(
 @router.get("/history/{cliente_id}", response_model=MedicalHistoryResponse)
 async def get_client_medical_history(
     cliente_id: str,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.VIEW_CLIENT_RECORDS,
+        detail="Acesso negado. Apenas profissionais podem ver histórico de outros clientes."
+    ))]
 ):
     """
     Obtém histórico médico de um cliente específico.
     Apenas profissionais e admins podem acessar.
     """
     
-    if current_user.role not in ["profissional", "admin"]:
-        raise HTTPException(
-            status_code=403,
-            detail="Acesso negado. Apenas profissionais podem ver histórico de outros clientes."
-        )
-    
     history = db.get_medical_history_by_client(cliente_id)
     
     if not history:
@@ -94,16 +92,13 @@ async def get_client_medical_history(
 @router.post("/consultations", response_model=ConsultationResponse)
 async def create_consultation(
     consultation: ConsultationCreate,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.WRITE_CLIENT_RECORDS,
+        detail="Apenas profissionais podem criar consultas"
+    ))]
 ):
     """Cria consulta (apenas profissionais)"""
     
-    if current_user.role != "profissional":
-        raise HTTPException(
-            status_code=403,
-            detail="Apenas profissionais podem criar consultas"
-        )
-    
     consultation_data = consultation.model_dump()
     consultation_data["profissional_id"] = current_user.id
     
@@ -119,7 +114,7 @@ async def get_client_consultations(
 ):
     """Lista consultas do cliente (profissional ou próprio cliente)"""
     
-    if current_user.role not in ["profissional", "admin"] and current_user.id != cliente_id:
+    if current_user.id != cliente_id and not has_permission(current_user, Permission.VIEW_CLIENT_RECORDS):
         raise HTTPException(
             status_code=403,
             detail="Sem permissão para ver consultas de outros clientes"
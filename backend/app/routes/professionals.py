@@ -3,24 +3,33 @@ ROUTES/PROFESSIONALS.PY - ROTAS DE PROFISSIONAIS
 =================================================
 """
 
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
 from typing import List, Optional
 
 from app.models import Professional
 from app.database import db
+from app.etags import etag_matches, make_etag, not_modified
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[Professional])
 async def list_professionals(
+    request: Request,
+    response: Response,
     tipo_servico: Optional[str] = Query(None, description="Filtrar por tipo de serviço"),
 ):
     """
     Lista todos os profissionais.
     Pode ser filtrada pelo tipo de serviço.
     ROTA PÚBLICA - não requer autenticação
+    Suporta If-None-Match (304 sem ler o arquivo).
     """
+    etag = make_etag("professionals", db.collection_version("professionals"), tipo_servico)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
     if tipo_servico:
         professionals_data = db.get_professionals_by_type(tipo_servico.lower())
     else:
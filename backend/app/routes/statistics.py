@@ -3,36 +3,50 @@ ROUTES/STATISTICS.PY - ESTATÍSTICAS E RELATÓRIOS
 ================================================
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from typing import Annotated, Optional
 from datetime import datetime
 
 from app.models import User
 from app.database import db
-from app.auth import get_current_user
+from app.permissions import Permission, require_permissions
+from app.salon_time import appointment_epoch, now_epoch, record_epoch, salon_now, to_epoch, to_local
 
 router = APIRouter()
 
 
+def _month_start_epoch() -> int:
+    """Início do mês corrente no fuso do salão"""
+    now = salon_now()
+    return to_epoch(datetime(now.year, now.month, 1))
+
+
+def _date_bound(value: Optional[str], name: str) -> Optional[int]:
+    """Filtro de data do pedido em epoch (400 se for inválido)"""
+    if not value:
+        return None
+    ts = to_epoch(value)
+    if ts is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{name} inválida (use YYYY-MM-DD)"
+        )
+    return ts
+
+
 # =============================================================
 # ESTATÍSTICAS GERAIS
 # =============================================================
 
 @router.get("/overview")
 async def get_statistics_overview(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(require_permissions(Permission.VIEW_STATISTICS))]
 ):
     """
     Retorna visão geral das estatísticas do sistema.
     Apenas administradores e profissionais podem ver.
     """
     
-    if current_user.role not in ["admin", "profissional"]:
-        raise HTTPException(
-            status_code=403,
-            detail="Acesso negado"
-        )
-    
     # Total de usuários
     users = db.get_all_users()
     total_users = len(users)
@@ -49,20 +63,12 @@ async def get_statistics_overview(
         apt_status = apt.get("status", "pendente")
         status_counts[apt_status] = status_counts.get(apt_status, 0) + 1
     
-    # Agendamentos este mês
-    now = datetime.now()
-    month_start = datetime(now.year, now.month, 1)
-    appointments_this_month = []
-    
-    for apt in appointments:
-        created_at = apt.get("created_at", "")
-        if created_at:
-            try:
-                apt_date = datetime.fromisoformat(created_at)
-                if apt_date >= month_start:
-                    appointments_this_month.append(apt)
-            except ValueError:
-                pass
+    # Agendamentos este mês (created_at_ts gravado na escrita, sem reparsing)
+    month_start = _month_start_epoch()
+    appointments_this_month = [
+        apt for apt in appointments
+        if (record_epoch(apt, "created_at") or 0) >= month_start
+    ]
     
     return {
         "users": {
@@ -84,33 +90,27 @@ async def get_statistics_overview(
 
 @router.get("/appointments")
 async def get_appointment_statistics(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(require_permissions(Permission.VIEW_STATISTICS))],
     start_date: Optional[str] = Query(None, description="Data inicial (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="Data final (YYYY-MM-DD)")
 ):
     """Estatísticas detalhadas de agendamentos."""
     
-    if current_user.role not in ["admin", "profissional"]:
-        raise HTTPException(
-            status_code=403,
-            detail="Acesso negado"
-        )
-    
+    start = _date_bound(start_date, "start_date")
+    end = _date_bound(end_date, "end_date")
     appointments = db.get_all_appointments()
     
     # Filtra por período se fornecido
-    if start_date:
-        start = datetime.fromisoformat(start_date)
+    if start is not None:
         appointments = [
             apt for apt in appointments
-            if apt.get("data_hora") and datetime.fromisoformat(apt.get("data_hora")) >= start
+            if (appointment_epoch(apt) or -1) >= start
         ]
     
-    if end_date:
-        end = datetime.fromisoformat(end_date)
+    if end is not None:
         appointments = [
             apt for apt in appointments
-            if apt.get("data_hora") and datetime.fromisoformat(apt.get("data_hora")) <= end
+            if appointment_epoch(apt) is not None and appointment_epoch(apt) <= end
         ]
     
     # Agrupamentos
@@ -129,15 +129,11 @@ async def get_appointment_statistics(
             if service_type:
                 by_service[service_type] = by_service.get(service_type, 0) + 1
         
-        # Por dia da semana
-        data_hora = apt.get("data_hora")
-        if data_hora:
-            try:
-                data_hora_obj = datetime.fromisoformat(data_hora)
-                day_name = data_hora_obj.strftime("%A")
-                by_day[day_name] = by_day.get(day_name, 0) + 1
-            except ValueError:
-                pass
+        # Por dia da semana (na hora local do salão)
+        ts = appointment_epoch(apt)
+        if ts is not None:
+            day_name = to_local(ts).strftime("%A")
+            by_day[day_name] = by_day.get(day_name, 0) + 1
     
     return {
         "total": len(appointments),
@@ -153,16 +149,13 @@ async def get_appointment_statistics(
 
 @router.get("/my-stats")
 async def get_my_statistics(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.VIEW_OWN_STATISTICS,
+        detail="Apenas profissionais podem ver suas estatísticas"
+    ))]
 ):
     """Estatísticas do profissional logado."""
     
-    if current_user.role != "profissional":
-        raise HTTPException(
-            status_code=403,
-            detail="Apenas profissionais podem ver suas estatísticas"
-        )
-    
     # Agendamentos do profissional
     appointments = db.get_appointments_by_professional(current_user.id)
     
@@ -174,32 +167,18 @@ async def get_my_statistics(
         by_status[apt_status] = by_status.get(apt_status, 0) + 1
     
     # Este mês
-    now = datetime.now()
-    month_start = datetime(now.year, now.month, 1)
-    this_month = []
-    
-    for apt in appointments:
-        created_at = apt.get("created_at", "")
-        if created_at:
-            try:
-                apt_date = datetime.fromisoformat(created_at)
-                if apt_date >= month_start:
-                    this_month.append(apt)
-            except ValueError:
-                pass
+    month_start = _month_start_epoch()
+    this_month = [
+        apt for apt in appointments
+        if (record_epoch(apt, "created_at") or 0) >= month_start
+    ]
     
     # Próximos agendamentos
-    upcoming = []
-    for apt in appointments:
-        if apt.get("status") == "confirmado":
-            data_hora = apt.get("data_hora", "")
-            if data_hora:
-                try:
-                    apt_date = datetime.fromisoformat(data_hora)
-                    if apt_date >= now:
-                        upcoming.append(apt)
-                except ValueError:
-                    pass
+    now = now_epoch()
+    upcoming = [
+        apt for apt in appointments
+        if apt.get("status") == "confirmado" and (appointment_epoch(apt) or -1) >= now
+    ]
     
     return {
         "total_appointments": total,
@@ -208,7 +187,7 @@ async def get_my_statistics(
         "upcoming": len(upcoming),
         "upcoming_appointments": sorted(
             upcoming,
-            key=lambda x: x.get("data_hora", "")
+            key=lambda x: appointment_epoch(x)
         )[:5]  # Próximos 5
     }
 
@@ -219,38 +198,36 @@ async def get_my_statistics(
 
 @router.get("/revenue")
 async def get_revenue_report(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.VIEW_REVENUE,
+        detail="Apenas administradores podem ver relatórios de receita"
+    ))],
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None)
 ):
     """Relatório de receita. Apenas administradores."""
     
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=403,
-            detail="Apenas administradores podem ver relatórios de receita"
-        )
-    
+    start = _date_bound(start_date, "start_date")
+    end = _date_bound(end_date, "end_date")
     appointments = db.get_all_appointments()
     
     # Filtra concluídos
     completed = [apt for apt in appointments if apt.get("status") == "concluido"]
     
     # Filtra por período
-    if start_date:
-        start = datetime.fromisoformat(start_date)
+    def completed_epoch(apt):
+        return record_epoch(apt, "completed_at") or appointment_epoch(apt)
+
+    if start is not None:
         completed = [
             apt for apt in completed
-            if apt.get("completed_at") or apt.get("data_hora")
-            and datetime.fromisoformat(apt.get("completed_at", apt.get("data_hora", ""))) >= start
+            if (completed_epoch(apt) or -1) >= start
         ]
     
-    if end_date:
-        end = datetime.fromisoformat(end_date)
+    if end is not None:
         completed = [
             apt for apt in completed
-            if apt.get("completed_at") or apt.get("data_hora")
-            and datetime.fromisoformat(apt.get("completed_at", apt.get("data_hora", ""))) <= end
+            if completed_epoch(apt) is not None and completed_epoch(apt) <= end
         ]
     
     # Calcula receita (se tiver preços nos serviços)
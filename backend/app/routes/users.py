@@ -9,6 +9,7 @@ from typing import Annotated, List
 from app.models import User, UserCreate
 from app.database import db
 from app.auth import get_current_user, get_password_hash, verify_password
+from app.permissions import Permission, require_permissions
 
 router = APIRouter()
 
@@ -21,18 +22,15 @@ async def get_me(current_user: Annotated[User, Depends(get_current_user)]):
 
 @router.get("/", response_model=List[User])
 async def list_users(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.MANAGE_USERS,
+        detail="Apenas administradores podem listar usuários"
+    ))]
 ):
     """
     Lista todos os usuários.
     Apenas administradores podem listar todos os usuários.
     """
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Apenas administradores podem listar usuários"
-        )
-    
     users = db.get_all_users()
     
     # Remove senhas
@@ -124,18 +122,15 @@ async def change_password(
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: str,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(require_permissions(
+        Permission.MANAGE_USERS,
+        detail="Apenas administradores podem deletar usuários"
+    ))]
 ):
     """
     Deleta usuário.
     Apenas administradores podem deletar usuários.
     """
-    if current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Apenas administradores podem deletar usuários"
-        )
-    
     # Não pode deletar a si mesmo
     if user_id == current_user.id:
         raise HTTPException(
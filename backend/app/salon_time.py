@@ -0,0 +1,111 @@
+"""
+SALON_TIME.PY - DATAS E FUSO HORÁRIO DO SALÃO
+=============================================
+Os agendamentos guardam o instante em data_hora_ts (epoch UTC, inteiro,
+calculado na escrita); data_hora fica como hora local do salão, só para
+apresentação e compatibilidade. created_at e completed_at ganham também
+created_at_ts / completed_at_ts na escrita.
+
+- Strings sem fuso ("2025-03-30T10:00:00") são hora local do salão
+- Strings com fuso ("...Z", "...+01:00") são convertidas para o instante certo
+- Comparações e ordenações nos loops usam os inteiros, sem reparsing
+- O fuso do salão (SALON_TIMEZONE, padrão Europe/Lisbon) só é aplicado
+  ao apresentar ou ao agrupar por dia/hora local
+"""
+
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Optional, Tuple, Union
+from zoneinfo import ZoneInfo
+
+
+SALON_TIMEZONE_NAME = os.getenv("SALON_TIMEZONE", "Europe/Lisbon")
+SALON_TZ = ZoneInfo(SALON_TIMEZONE_NAME)
+
+
+def to_epoch(value: Union[str, datetime, int, float, None]) -> Optional[int]:
+    """Instante em segundos UTC (None se vazio ou inválido)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=SALON_TZ)
+    return int(value.timestamp())
+
+
+def from_epoch(ts: int) -> datetime:
+    """Instante em UTC (aware)"""
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def to_local(ts: int) -> datetime:
+    """Instante na hora do salão (aware)"""
+    return datetime.fromtimestamp(ts, tz=SALON_TZ)
+
+
+def local_naive(ts: int) -> datetime:
+    """Hora de parede do salão sem fuso (grelhas de horário, bitsets do dia)"""
+    return to_local(ts).replace(tzinfo=None)
+
+
+def local_iso(ts: int) -> str:
+    """data_hora de apresentação: hora local do salão, sem fuso"""
+    return local_naive(ts).isoformat()
+
+
+def salon_now() -> datetime:
+    """Agora, na hora de parede do salão (independente do fuso do servidor)"""
+    return datetime.now(SALON_TZ).replace(tzinfo=None)
+
+
+def now_epoch() -> int:
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+def day_bounds(day: Union[date, str]) -> Tuple[int, int]:
+    """[início, fim) de um dia local do salão em epoch (dias de 23h/25h na mudança de hora)"""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    start = datetime.combine(day, time.min).replace(tzinfo=SALON_TZ)
+    end = datetime.combine(day + timedelta(days=1), time.min).replace(tzinfo=SALON_TZ)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def appointment_epoch(appointment: Dict) -> Optional[int]:
+    """data_hora_ts do registo, ou calculado de data_hora para registos antigos"""
+    ts = appointment.get("data_hora_ts")
+    if ts is not None:
+        return ts
+    return to_epoch(appointment.get("data_hora"))
+
+
+def record_epoch(record: Dict, field: str) -> Optional[int]:
+    """<field>_ts do registo, ou calculado de <field> para registos antigos"""
+    ts = record.get(f"{field}_ts")
+    if ts is not None:
+        return ts
+    return to_epoch(record.get(field))
+
+
+def stamp_appointment(appointment: Dict) -> Dict:
+    """
+    Normaliza data_hora na escrita: data_hora_ts (UTC) e data_hora como
+    hora local do salão; created_at_ts a partir de created_at se a escrita
+    não o gravou (registos importados). Registos sem data válida ficam
+    como estão.
+    """
+    ts = to_epoch(appointment.get("data_hora"))
+    if ts is not None:
+        appointment["data_hora_ts"] = ts
+        appointment["data_hora"] = local_iso(ts)
+    if appointment.get("created_at_ts") is None:
+        created = to_epoch(appointment.get("created_at"))
+        if created is not None:
+            appointment["created_at_ts"] = created
+    return appointment
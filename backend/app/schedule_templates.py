@@ -0,0 +1,208 @@
+"""
+SCHEDULE_TEMPLATES.PY - HORÁRIOS DE FUNCIONAMENTO POR PROFISSIONAL
+==================================================================
+Modelos de horário guardados em data/schedule_templates.json.
+
+Cada modelo (id = id do profissional, ou "default" para o salão):
+    {
+        "id": "1",
+        "weekly": {"0": [["09:00", "13:00"], ["14:00", "19:00"]], ...},
+        "breaks": [["13:00", "13:30"]],
+        "holidays": ["2025-12-25"],
+        "exceptions": {"2025-12-24": [["09:00", "13:00"]], "2025-08-15": []}
+    }
+
+- weekly: intervalos abertos por dia da semana (0 = segunda); dia ausente = fechado
+- breaks: pausas diárias, retiradas de qualquer dia aberto
+- holidays: dias fechados (os do "default" valem para todos)
+- exceptions: intervalos de um dia concreto, sobrepõem-se ao resto
+
+O modelo de um profissional herda do "default" os campos que não definir.
+Cada (profissional, data) é compilado uma vez numa máscara de 96 bits
+(slot_calendar) e guardado em cache até o arquivo mudar.
+"""
+
+import threading
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .database import db
+from .slot_calendar import span_mask
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+DEFAULT_TEMPLATE_ID = "default"
+
+# Equivalente ao horário fixo anterior (todos os dias, 9h às 19h)
+DEFAULT_TEMPLATE = {
+    "id": DEFAULT_TEMPLATE_ID,
+    "weekly": {str(weekday): [["09:00", "19:00"]] for weekday in range(7)},
+    "breaks": [],
+    "holidays": [],
+    "exceptions": {},
+}
+
+MAX_CACHED_DAYS = 20_000
+
+
+def parse_hhmm(value: str) -> int:
+    """ "HH:MM" -> minutos desde a meia-noite ("24:00" permitido) """
+    hours, minutes = value.split(":")
+    total = int(hours) * 60 + int(minutes)
+    if not 0 <= total <= 24 * 60 or not 0 <= int(minutes) < 60:
+        raise ValueError(f"Hora inválida: {value}")
+    return total
+
+
+def intervals_mask(intervals: Iterable[Iterable[str]]) -> int:
+    """Máscara da união de intervalos [["HH:MM", "HH:MM"], ...]"""
+    mask = 0
+    for start, end in intervals:
+        mask |= span_mask(parse_hhmm(start), parse_hhmm(end))
+    return mask
+
+
+def validate_template(template: Dict):
+    """Levanta ValueError se algum intervalo ou data for inválido"""
+    for weekday, intervals in (template.get("weekly") or {}).items():
+        if weekday not in {str(d) for d in range(7)}:
+            raise ValueError(f"Dia da semana inválido: {weekday}")
+        intervals_mask(intervals)
+    intervals_mask(template.get("breaks") or [])
+    for day in template.get("holidays") or []:
+        date.fromisoformat(day)
+    for day, intervals in (template.get("exceptions") or {}).items():
+        date.fromisoformat(day)
+        intervals_mask(intervals)
+
+
+# ====================================================================
+# MODELOS COMPILADOS
+# ====================================================================
+
+class ScheduleTemplates:
+    """Modelos de horário com cache de máscaras por (profissional, data)"""
+
+    def __init__(self, database=db):
+        self.db = database
+        self._lock = threading.RLock()
+        self._templates: Dict[str, Dict] = {}
+        self._weekly_masks: Dict[str, Dict[int, int]] = {}
+        self._day_cache: Dict[Tuple[str, str], int] = {}
+        self._stamp = None
+        self._loaded = False
+
+    # ----- carregamento -----
+
+    def _load(self):
+        self._templates = {DEFAULT_TEMPLATE_ID: dict(DEFAULT_TEMPLATE)}
+        for template in self.db._read_file("schedule_templates"):
+            template_id = str(template.get("id") or "")
+            if template_id == DEFAULT_TEMPLATE_ID:
+                self._templates[template_id] = {**DEFAULT_TEMPLATE, **template}
+            elif template_id:
+                self._templates[template_id] = template
+
+        self._weekly_masks = {}
+        self._day_cache = {}
+        self._stamp = self.db._file_stamp("schedule_templates")
+        self._loaded = True
+
+    def _ensure_fresh(self):
+        if not self._loaded or self.db._file_stamp("schedule_templates") != self._stamp:
+            self._load()
+
+    def _field(self, professional_id: str, name: str):
+        """Campo do modelo do profissional, ou do default se não definido"""
+        own = self._templates.get(professional_id, {})
+        if own.get(name) is not None:
+            return own[name]
+        return self._templates[DEFAULT_TEMPLATE_ID].get(name)
+
+    def _weekly(self, professional_id: str) -> Dict[int, int]:
+        masks = self._weekly_masks.get(professional_id)
+        if masks is None:
+            weekly = self._field(professional_id, "weekly") or {}
+            breaks = intervals_mask(self._field(professional_id, "breaks") or [])
+            masks = {
+                int(weekday): intervals_mask(intervals) & ~breaks
+                for weekday, intervals in weekly.items()
+            }
+            self._weekly_masks[professional_id] = masks
+        return masks
+
+    def _compile_day(self, professional_id: str, day: date) -> int:
+        day_iso = day.isoformat()
+
+        exceptions = (self._templates.get(professional_id, {}).get("exceptions") or {})
+        if day_iso in exceptions:
+            return intervals_mask(exceptions[day_iso])
+
+        default_exceptions = self._templates[DEFAULT_TEMPLATE_ID].get("exceptions") or {}
+        if day_iso in default_exceptions:
+            return intervals_mask(default_exceptions[day_iso])
+
+        holidays = set(self._templates[DEFAULT_TEMPLATE_ID].get("holidays") or [])
+        holidays.update(self._templates.get(professional_id, {}).get("holidays") or [])
+        if day_iso in holidays:
+            return 0
+
+        return self._weekly(professional_id).get(day.weekday(), 0)
+
+    # ----- consultas -----
+
+    def open_mask(self, professional_id: Optional[str], day: date) -> int:
+        """Máscara dos quanta em que o profissional atende no dia"""
+        if isinstance(day, datetime):
+            day = day.date()
+        professional_id = str(professional_id or DEFAULT_TEMPLATE_ID)
+        key = (professional_id, day.isoformat())
+
+        with self._lock:
+            self._ensure_fresh()
+            mask = self._day_cache.get(key)
+            if mask is None:
+                if len(self._day_cache) >= MAX_CACHED_DAYS:
+                    self._day_cache.clear()
+                mask = self._compile_day(professional_id, day)
+                self._day_cache[key] = mask
+            return mask
+
+    # ----- gestão -----
+
+    def list_templates(self) -> List[Dict]:
+        """Modelos guardados (o default implícito aparece se não foi gravado)"""
+        with self._lock:
+            self._ensure_fresh()
+            return list(self._templates.values())
+
+    def save_template(self, template_id: str, template: Dict) -> Dict:
+        """Cria ou substitui o modelo de um profissional (ou o default)"""
+        record = {"id": str(template_id), **{k: v for k, v in template.items() if k != "id"}}
+        validate_template(record)
+        record["updated_at"] = datetime.now().isoformat()
+
+        with self._lock:
+            records = [t for t in self.db._read_file("schedule_templates") if str(t.get("id")) != record["id"]]
+            records.append(record)
+            self.db._write_file("schedule_templates", records)
+            self._load()
+        return record
+
+    def delete_template(self, template_id: str) -> bool:
+        """Remove um modelo (o profissional volta ao default)"""
+        with self._lock:
+            records = self.db._read_file("schedule_templates")
+            kept = [t for t in records if str(t.get("id")) != str(template_id)]
+            if len(kept) == len(records):
+                return False
+            self.db._write_file("schedule_templates", kept)
+            self._load()
+            return True
+
+
+# Instância global
+schedule_templates = ScheduleTemplates()
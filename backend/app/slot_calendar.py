@@ -0,0 +1,101 @@
+"""
+SLOT_CALENDAR.PY - CALENDÁRIO EM BITSET
+=======================================
+Um dia de um profissional como inteiro de 96 bits (quanta de 15 minutos).
+
+- bit i ligado = quantum i (das i*15 min às (i+1)*15 min)
+- marcar um serviço = OR com a máscara do intervalo
+- livre = aberto & ~ocupado
+- "cabe um serviço de N quanta a partir de i" = AND de N deslocamentos,
+  feito em O(log N) operações sobre o inteiro inteiro
+
+Um mês do salão inteiro (5 profissionais x 31 dias) ocupa ~2 KB.
+"""
+
+from datetime import datetime
+from typing import Iterator, List
+
+
+QUANTUM_MINUTES = 15
+QUANTA_PER_DAY = 24 * 60 // QUANTUM_MINUTES
+FULL_DAY_MASK = (1 << QUANTA_PER_DAY) - 1
+
+
+def minutes_to_quantum(minutes: int) -> int:
+    """Quantum que contém o minuto dado (arredonda para baixo)"""
+    return minutes // QUANTUM_MINUTES
+
+
+def duration_to_quanta(minutes: int) -> int:
+    """Número de quanta necessários para uma duração (arredonda para cima)"""
+    return max(1, -(-minutes // QUANTUM_MINUTES))
+
+
+def span_mask(start_minutes: int, end_minutes: int) -> int:
+    """
+    Máscara dos quanta tocados pelo intervalo [início, fim) em minutos.
+
+    Intervalos fora da grelha (ex: 10:10) são arredondados para fora,
+    o que nunca deixa um horário ocupado aparecer como livre.
+    """
+    first = max(0, minutes_to_quantum(start_minutes))
+    last = min(QUANTA_PER_DAY, -(-end_minutes // QUANTUM_MINUTES))
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def time_mask(start: datetime, duration_minutes: int) -> int:
+    """Máscara de um agendamento que começa em `start`"""
+    minutes = start.hour * 60 + start.minute
+    return span_mask(minutes, minutes + duration_minutes)
+
+
+def fits_mask(free: int, length: int) -> int:
+    """
+    Bit i ligado sse os quanta i..i+length-1 estão todos livres.
+
+    Duplica a janela coberta a cada passo: para 90 min (6 quanta) são
+    3 ANDs com deslocamento em vez de 6.
+    """
+    result = free
+    covered = 1
+    while covered < length:
+        shift = min(covered, length - covered)
+        result &= result >> shift
+        covered += shift
+    return result
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Índices dos bits ligados, do menor para o maior"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def grid_mask(step_minutes: int, start_minutes: int = 0,
+              end_minutes: int = 24 * 60) -> int:
+    """Máscara com um bit em cada início da grelha (ex: de 30 em 30 min)"""
+    step = max(1, step_minutes // QUANTUM_MINUTES)
+    mask = 0
+    for q in range(minutes_to_quantum(start_minutes), minutes_to_quantum(end_minutes), step):
+        mask |= 1 << q
+    return mask
+
+
+def free_starts(busy: int, open_mask: int, duration_minutes: int, grid: int) -> int:
+    """Inícios da grelha onde cabe um serviço, dentro do horário aberto"""
+    return fits_mask(open_mask & ~busy & FULL_DAY_MASK, duration_to_quanta(duration_minutes)) & grid
+
+
+def quantum_to_time(quantum: int) -> str:
+    """Quantum -> "HH:MM" """
+    minutes = quantum * QUANTUM_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def mask_to_times(mask: int) -> List[str]:
+    """Lista "HH:MM" dos bits ligados"""
+    return [quantum_to_time(q) for q in iter_bits(mask)]
@@ -0,0 +1,128 @@
+"""
+TIMING_WHEEL.PY - RODA TEMPORAL HIERÁRQUICA
+===========================================
+Temporizadores em O(1) para agendar e cancelar, sem varrer tudo a cada
+minuto.
+
+- Níveis de rodas (padrão: 60 minutos, 24 horas, 32 dias); o nível k tem
+  slots com a largura de um giro completo do nível k-1
+- Cada entrada fica no nível mais baixo que alcança o seu prazo; quando um
+  nível de cima chega ao slot da entrada, ela desce (cascata)
+- Prazos para lá do último nível ficam num heap e entram na roda quando
+  ficam ao alcance
+- Cancelar/reagendar é preguiçoso: cada chave tem um token e entradas com
+  token antigo são ignoradas ao descer ou disparar
+"""
+
+import heapq
+import itertools
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+# Minutos por hora, horas por dia, dias por "mês"
+DEFAULT_WHEEL_SIZES = (60, 24, 32)
+
+# (tick do prazo, chave, token)
+_Entry = Tuple[int, Hashable, int]
+
+
+class TimingWheel:
+    """Roda temporal hierárquica com ticks de `tick_seconds` segundos"""
+
+    def __init__(self, start_ts: int, tick_seconds: int = 60,
+                 wheel_sizes: Sequence[int] = DEFAULT_WHEEL_SIZES):
+        self.tick_seconds = tick_seconds
+        self.sizes = tuple(wheel_sizes)
+        # Largura (em ticks) de um slot de cada nível
+        self.widths = []
+        width = 1
+        for size in self.sizes:
+            self.widths.append(width)
+            width *= size
+
+        self.current = start_ts // tick_seconds
+        self._wheels: List[List[List[_Entry]]] = [[[] for _ in range(n)] for n in self.sizes]
+        self._overflow: List[_Entry] = []
+        self._live: Dict[Hashable, Tuple[int, Any]] = {}
+        self._tokens = itertools.count(1)
+        self._ready: List[Tuple[Hashable, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._live
+
+    # ----- agendar / cancelar -----
+
+    def schedule(self, key: Hashable, due_ts: int, payload: Any = None):
+        """Agenda (ou reagenda) `key` para `due_ts`; vencidos disparam no próximo advance"""
+        token = next(self._tokens)
+        self._live[key] = (token, payload)
+        self._place((max(due_ts, 0) + self.tick_seconds - 1) // self.tick_seconds, key, token)
+
+    def cancel(self, key: Hashable) -> bool:
+        return self._live.pop(key, None) is not None
+
+    def _place(self, due_tick: int, key: Hashable, token: int):
+        if due_tick <= self.current:
+            self._ready.append((key, token))
+            return
+        for level, (size, width) in enumerate(zip(self.sizes, self.widths)):
+            if due_tick // width - self.current // width < size:
+                self._wheels[level][(due_tick // width) % size].append((due_tick, key, token))
+                return
+        heapq.heappush(self._overflow, (due_tick, key, token))
+
+    def _is_live(self, key: Hashable, token: int) -> bool:
+        live = self._live.get(key)
+        return live is not None and live[0] == token
+
+    # ----- avanço -----
+
+    def _tick(self):
+        self.current += 1
+
+        # Heap -> roda, quando o prazo fica ao alcance do último nível
+        top = len(self.sizes) - 1
+        while self._overflow:
+            due_tick, key, token = self._overflow[0]
+            if due_tick // self.widths[top] - self.current // self.widths[top] >= self.sizes[top]:
+                break
+            heapq.heappop(self._overflow)
+            if self._is_live(key, token):
+                self._place(due_tick, key, token)
+
+        # Cascata do nível mais alto para o mais baixo
+        for level in range(top, 0, -1):
+            width = self.widths[level]
+            if self.current % width:
+                continue
+            slot = self._wheels[level][(self.current // width) % self.sizes[level]]
+            entries, slot[:] = list(slot), []
+            for due_tick, key, token in entries:
+                if self._is_live(key, token):
+                    self._place(due_tick, key, token)
+
+        slot = self._wheels[0][self.current % self.sizes[0]]
+        for due_tick, key, token in slot:
+            if self._is_live(key, token):
+                self._ready.append((key, token))
+        slot.clear()
+
+    def advance(self, now_ts: int) -> List[Tuple[Hashable, Any]]:
+        """Avança até `now_ts` e devolve (chave, payload) dos vencidos, por ordem"""
+        target = now_ts // self.tick_seconds
+        while self.current < target:
+            self._tick()
+
+        fired = []
+        for key, token in self._ready:
+            if self._is_live(key, token):
+                fired.append((key, self._live.pop(key)[1]))
+        self._ready = []
+        return fired
+
+    def next_due_ts(self) -> Optional[int]:
+        """Início do próximo tick (o chamador dorme até lá)"""
+        return (self.current + 1) * self.tick_seconds
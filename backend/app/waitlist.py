@@ -0,0 +1,289 @@
+"""
+WAITLIST.PY - LISTA DE ESPERA
+=============================
+Clientes registam interesse num serviço dentro de uma janela de datas.
+Quando um agendamento é cancelado, o horário libertado é oferecido ao
+melhor pedido em espera.
+
+- Índice (duração em quanta, profissional, dia) -> ids por ordem de chegada;
+  pedidos sem profissional ficam sob "*"
+- No cancelamento procura-se da maior duração que cabe no buraco para a
+  menor (melhor aproveitamento da cadeira) e, dentro de cada duração, o
+  pedido mais antigo: no máximo 96 lookups por profissional, sem percorrer
+  os clientes
+- A oferta é uma reserva temporária (booking_holds) em nome do cliente,
+  confirmada com /schedule (booking_code + hold_id)
+"""
+
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .availability import (
+    CANCELLED_STATUSES, appointment_interval, availability_index, professional_offers
+)
+from .booking_drafts import booking_drafts
+from .booking_holds import SlotHoldRegistry, SlotUnavailableError, slot_holds
+from .database import db
+from .salon_time import appointment_epoch, local_naive, salon_now
+from .schedule_templates import schedule_templates
+from .slot_calendar import QUANTA_PER_DAY, duration_to_quanta, minutes_to_quantum
+
+
+# ====================================================================
+# CONFIGURAÇÕES
+# ====================================================================
+
+ANY_PROFESSIONAL = "*"
+MAX_WINDOW_DAYS = 31
+
+STATUS_WAITING = "aguardando"
+STATUS_OFFERED = "oferecido"
+STATUS_ACCEPTED = "aceite"
+ACTIVE_STATUSES = {STATUS_WAITING, STATUS_OFFERED}
+
+
+def _days(window_start: datetime, window_end: datetime) -> List[str]:
+    day = window_start.date()
+    days = []
+    while day <= window_end.date():
+        days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+# ====================================================================
+# LISTA DE ESPERA
+# ====================================================================
+
+class Waitlist:
+    """Pedidos em espera, persistidos em waitlist.json e indexados em memória"""
+
+    def __init__(self, database=db, holds: SlotHoldRegistry = slot_holds):
+        self.db = database
+        self.holds = holds
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._index: Dict[Tuple[int, str, str], List[str]] = {}
+
+        database.add_listener("appointments", self._on_appointment_change)
+
+    # ----- persistência e índice -----
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = {e["id"]: e for e in self.db._read_file("waitlist")}
+            self._index = {}
+            for entry in self._entries.values():
+                self._index_entry(entry)
+        return self._entries
+
+    def _save(self):
+        self.db._write_file("waitlist", list(self._entries.values()))
+
+    def _keys(self, entry: Dict) -> List[Tuple[int, str, str]]:
+        length = duration_to_quanta(entry["duration"])
+        professional = entry.get("professional_id") or ANY_PROFESSIONAL
+        start = datetime.fromisoformat(entry["window_start"])
+        end = datetime.fromisoformat(entry["window_end"])
+        return [(length, professional, day) for day in _days(start, end)]
+
+    def _index_entry(self, entry: Dict):
+        if entry.get("status") != STATUS_WAITING:
+            return
+        for key in self._keys(entry):
+            self._index.setdefault(key, []).append(entry["id"])
+
+    def _unindex_entry(self, entry: Dict):
+        for key in self._keys(entry):
+            ids = self._index.get(key)
+            if ids and entry["id"] in ids:
+                ids.remove(entry["id"])
+                if not ids:
+                    del self._index[key]
+
+    def _expire_offers(self):
+        """Ofertas cuja reserva expirou voltam à espera"""
+        changed = False
+        for entry in self._load().values():
+            offer = entry.get("offer")
+            if entry["status"] == STATUS_OFFERED and offer and not self.holds.get(offer["hold_id"]):
+                entry["status"] = STATUS_WAITING
+                entry["offer"] = None
+                self._index_entry(entry)
+                changed = True
+        if changed:
+            self._save()
+
+    # ----- gestão -----
+
+    def join(self, usuario_id: str, servico: str, duration: int,
+             window_start: datetime, window_end: datetime,
+             professional_id: Optional[str] = None,
+             booking: Optional[Dict] = None) -> Dict:
+        """
+        Regista um pedido em espera.
+
+        Raises:
+            ValueError: janela inválida ou demasiado longa
+        """
+        if window_end <= window_start:
+            raise ValueError("O fim da janela tem de ser posterior ao início")
+        if (window_end.date() - window_start.date()).days >= MAX_WINDOW_DAYS:
+            raise ValueError(f"A janela não pode exceder {MAX_WINDOW_DAYS} dias")
+
+        entry_id = f"WAIT-{uuid.uuid4().hex[:10].upper()}"
+        entry = {
+            "id": entry_id,
+            "usuario_id": usuario_id,
+            "servico": servico,
+            "duration": duration,
+            "professional_id": professional_id,
+            "window_start": window_start.isoformat(),
+            "window_end": window_end.isoformat(),
+            "booking_code": (booking or {}).get("booking_code") or entry_id,
+            "booking": booking or {
+                "services": [{"id": entry_id, "name": servico, "duration": duration, "price": 0}],
+                "total_price": 0,
+                "total_duration": duration,
+            },
+            "status": STATUS_WAITING,
+            "offer": None,
+            "created_at": datetime.now().isoformat(),
+        }
+
+        with self._lock:
+            self._load()[entry_id] = entry
+            self._index_entry(entry)
+            self._save()
+        return entry
+
+    def get(self, entry_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._load().get(entry_id)
+            return dict(entry) if entry else None
+
+    def remove(self, entry_id: str) -> bool:
+        """Retira um pedido da lista (liberta a oferta, se houver)"""
+        with self._lock:
+            entry = self._load().pop(entry_id, None)
+            if not entry:
+                return False
+            self._unindex_entry(entry)
+            if entry.get("offer"):
+                self.holds.release(entry["offer"]["hold_id"])
+            self._save()
+            return True
+
+    def list_entries(self, usuario_id: Optional[str] = None) -> List[Dict]:
+        """Pedidos ativos, por ordem de chegada"""
+        with self._lock:
+            self._expire_offers()
+            entries = [
+                e for e in self._load().values()
+                if e["status"] in ACTIVE_STATUSES and (not usuario_id or e["usuario_id"] == usuario_id)
+            ]
+        return sorted(entries, key=lambda e: e["created_at"])
+
+    # ----- ofertas -----
+
+    def _free_quanta_from(self, professional_id: str, start: datetime) -> int:
+        """Quanta livres e abertos seguidos a partir de `start`"""
+        day = start.date()
+        free = (
+            schedule_templates.open_mask(professional_id, day)
+            & ~availability_index.busy_mask(professional_id, day.isoformat())
+        )
+        q = minutes_to_quantum(start.hour * 60 + start.minute)
+        length = 0
+        while q + length < QUANTA_PER_DAY and (free >> (q + length)) & 1:
+            length += 1
+        return length
+
+    def _matches(self, entry: Dict, professional: Dict, start: datetime) -> bool:
+        end = start + timedelta(minutes=entry["duration"])
+        return (
+            entry["status"] == STATUS_WAITING
+            and datetime.fromisoformat(entry["window_start"]) <= start
+            and end <= datetime.fromisoformat(entry["window_end"])
+            and (entry.get("professional_id") or professional_offers(professional, entry["servico"]))
+        )
+
+    def offer_slot(self, professional_id: str, start: datetime) -> Optional[Dict]:
+        """
+        Oferece o horário que começa em `start` ao melhor pedido em espera.
+
+        Returns:
+            o pedido que recebeu a oferta, ou None
+        """
+        professional_id = str(professional_id)
+        if start < salon_now():
+            return None
+
+        professional = self.db.get_professional_by_id(professional_id) or {"id": professional_id}
+        available = self._free_quanta_from(professional_id, start)
+        day = start.date().isoformat()
+
+        with self._lock:
+            self._expire_offers()
+            entries = self._load()
+            for length in range(available, 0, -1):
+                for owner in (professional_id, ANY_PROFESSIONAL):
+                    for entry_id in list(self._index.get((length, owner, day), ())):
+                        entry = entries[entry_id]
+                        if not self._matches(entry, professional, start):
+                            continue
+                        try:
+                            hold = self.holds.place_hold(
+                                professional_id, start, entry["duration"],
+                                booking_code=entry["booking_code"]
+                            )
+                        except SlotUnavailableError:
+                            return None
+
+                        self._unindex_entry(entry)
+                        entry["status"] = STATUS_OFFERED
+                        entry["offer"] = {
+                            **self.holds.public_view(hold),
+                            "offered_at": datetime.now().isoformat(),
+                        }
+                        self._save()
+
+                        # O draft é recriado para o /schedule encontrar os serviços
+                        booking_drafts.put(entry["booking_code"], {
+                            **entry["booking"], "booking_code": entry["booking_code"]
+                        })
+                        print(f"📣 Horário {start.isoformat()} oferecido a {entry['usuario_id']} ({entry_id})")
+                        return entry
+        return None
+
+    def _on_appointment_change(self, action: str, appointment: Dict):
+        if action == "created":
+            self._mark_accepted(appointment.get("booking_code"))
+            return
+
+        if appointment.get("status") not in CANCELLED_STATUSES:
+            return
+
+        # Intervalo que o agendamento ocupava antes do cancelamento
+        interval = appointment_interval({**appointment, "status": None})
+        if interval is None:
+            return
+        professional_id, _, _, _ = interval
+        self.offer_slot(professional_id, local_naive(appointment_epoch(appointment)))
+
+    def _mark_accepted(self, booking_code: Optional[str]):
+        if not booking_code:
+            return
+        with self._lock:
+            for entry in self._load().values():
+                if entry["booking_code"] == booking_code and entry["status"] == STATUS_OFFERED:
+                    entry["status"] = STATUS_ACCEPTED
+                    self._save()
+                    print(f"✅ Oferta da lista de espera aceite: {entry['id']}")
+                    return
+
+
+# Instância global
+waitlist = Waitlist()
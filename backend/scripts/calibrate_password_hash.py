@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+CALIBRATE_PASSWORD_HASH.PY - Calibração do Custo de Hash
+========================================================
+Execute: python scripts/calibrate_password_hash.py [--target-ms 250] [--argon2]
+
+Mede o tempo de hash neste hardware, escolhe o custo que cabe no alvo
+e guarda em data/password_hashing.json. Os hashes existentes são
+refeitos automaticamente no próximo login de cada utilizador.
+"""
+
+import argparse
+import sys
+import os
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.password_hashing import (
+    HASH_CONFIG_FILE,
+    calibrate_argon2,
+    calibrate_bcrypt,
+    is_argon2_available,
+    load_hash_config,
+    save_hash_config,
+)
+
+
+def main():
+    """Executa a calibração e guarda a configuração"""
+
+    parser = argparse.ArgumentParser(description="Calibra o custo de hash de senhas")
+    parser.add_argument("--target-ms", type=float, default=None,
+                        help="Tempo alvo por hash em milissegundos (padrão: valor atual)")
+    parser.add_argument("--argon2", action="store_true",
+                        help="Usar argon2id em vez de bcrypt (requer argon2-cffi)")
+    parser.add_argument("--parallelism", type=int, default=1,
+                        help="Threads por hash argon2 (padrão: 1)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Apenas mostra o resultado, sem guardar")
+    args = parser.parse_args()
+
+    config = load_hash_config()
+    target_ms = args.target_ms or config["target_ms"]
+
+    print("=" * 60)
+    print("🔐 CALIBRAÇÃO DO HASH DE SENHAS")
+    print("=" * 60)
+    print(f"🎯 Alvo: {target_ms:.0f} ms por hash\n")
+
+    print("🔄 Medindo bcrypt...")
+    bcrypt_result = calibrate_bcrypt(target_ms)
+    for rounds, elapsed in bcrypt_result["measurements"].items():
+        print(f"   rounds={rounds:<3} {elapsed:>8.1f} ms")
+    print(f"✅ bcrypt: rounds={bcrypt_result['bcrypt_rounds']} "
+          f"({bcrypt_result['measured_ms']} ms)\n")
+
+    config["bcrypt_rounds"] = bcrypt_result["bcrypt_rounds"]
+    config["target_ms"] = target_ms
+    config["scheme"] = "bcrypt"
+
+    if args.argon2:
+        if not is_argon2_available():
+            print("❌ argon2-cffi não está instalado: pip install argon2-cffi")
+            sys.exit(1)
+
+        print("🔄 Medindo argon2id...")
+        argon2_result = calibrate_argon2(target_ms, parallelism=args.parallelism)
+        for memory, elapsed in argon2_result["measurements"].items():
+            print(f"   memória={memory // 1024:>5} MiB {elapsed:>8.1f} ms")
+        print(f"✅ argon2id: memória={argon2_result['argon2_memory_cost'] // 1024} MiB, "
+              f"t={argon2_result['argon2_time_cost']}, p={argon2_result['argon2_parallelism']} "
+              f"({argon2_result['measured_ms']} ms)\n")
+
+        config["scheme"] = "argon2"
+        config["argon2_time_cost"] = argon2_result["argon2_time_cost"]
+        config["argon2_memory_cost"] = argon2_result["argon2_memory_cost"]
+        config["argon2_parallelism"] = argon2_result["argon2_parallelism"]
+
+    print("=" * 60)
+    if args.dry_run:
+        print("ℹ️  Dry run: configuração não guardada")
+    else:
+        save_hash_config(config)
+        print(f"💾 Configuração guardada em {HASH_CONFIG_FILE}")
+        print("   Reinicie a API para aplicar. Hashes antigos migram no próximo login.")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
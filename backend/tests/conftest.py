@@ -0,0 +1,67 @@
+"""
+CONFTEST.PY - CONFIGURAÇÃO DOS TESTES
+=====================================
+O db e os restantes módulos usam caminhos relativos (data/...): a sessão
+corre numa pasta temporária, para nunca tocar nos dados reais.
+
+Execução (na pasta backend):  python -m pytest -q
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("BOOKING_DRAFTS_BACKEND", "memory")
+os.chdir(tempfile.mkdtemp(prefix="salao-tests-"))
+
+
+# Dias distintos por teste: agendamentos de testes diferentes nunca colidem
+_day_offsets = itertools.count(30)
+
+
+@pytest.fixture
+def day() -> date:
+    """Um dia futuro ainda não usado por outro teste"""
+    from app.salon_time import salon_now
+    return (salon_now() + timedelta(days=next(_day_offsets))).date()
+
+
+def at(day: date, hour: int, minute: int = 0) -> datetime:
+    return datetime(day.year, day.month, day.day, hour, minute)
+
+
+@pytest.fixture
+def make_user():
+    """Cria um utilizador com a role indicada"""
+    from app.database import db
+
+    def factory(role: str = "cliente", **fields):
+        return db.create_user({
+            "email": f"{role}-{uuid.uuid4().hex[:8]}@example.com",
+            "nome": f"Teste {role}",
+            "role": role,
+            **fields,
+        })
+
+    return factory
+
+
+def auth_headers(user: dict) -> dict:
+    from app.auth import create_access_token
+    return {"Authorization": "Bearer " + create_access_token({"sub": user["id"]})}
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient da aplicação (sem o evento de startup: sem threads de fundo)"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
@@ -0,0 +1,63 @@
+"""Chaves de API com scopes em máscara (user-029)"""
+
+import pytest
+
+from app.api_keys import API_KEY_HEADER, api_key_registry, parse_scopes
+from app.database import db
+from app.permissions import Permission, role_mask
+
+
+def test_parse_scopes_builds_mask():
+    assert parse_scopes(["view_professional_agenda"]) == Permission.VIEW_PROFESSIONAL_AGENDA
+    with pytest.raises(ValueError):
+        parse_scopes(["NAO_EXISTE"])
+
+
+def test_verify_limits_scopes_to_owner_role(make_user):
+    owner = make_user("profissional")
+    plain, record = api_key_registry.create_key(
+        "painel", owner["id"], ["VIEW_PROFESSIONAL_AGENDA", "MANAGE_APPOINTMENTS"]
+    )
+    assert "key_hash" in record and plain not in str(record)
+
+    user, mask = api_key_registry.verify(plain)
+    assert user.id == owner["id"]
+    # MANAGE_APPOINTMENTS não é da role profissional
+    assert mask == Permission.VIEW_PROFESSIONAL_AGENDA
+    assert mask & ~role_mask("profissional") == 0
+
+
+def test_revoked_key_is_rejected(make_user):
+    plain, record = api_key_registry.create_key("quiosque", make_user("admin")["id"], [])
+    assert api_key_registry.verify(plain) is not None
+    api_key_registry.revoke(record["id"])
+    assert api_key_registry.verify(plain) is None
+    assert api_key_registry.verify("salao_x_invalida") is None
+
+
+def test_inactive_owner_invalidates_key(make_user):
+    owner = make_user("profissional")
+    plain, _ = api_key_registry.create_key("painel", owner["id"], ["VIEW_PROFESSIONAL_AGENDA"])
+    db.update_user(owner["id"], {"is_active": False})
+    assert api_key_registry.verify(plain) is None
+
+
+def test_create_key_requires_existing_owner():
+    with pytest.raises(ValueError):
+        api_key_registry.create_key("orfã", "nao-existe", [])
+
+
+def test_endpoint_accepts_api_key_with_scope(client, make_user):
+    owner = make_user("profissional")
+    plain, _ = api_key_registry.create_key("painel", owner["id"], ["VIEW_PROFESSIONAL_AGENDA"])
+    response = client.get("/api/v1/appointments/professional", headers={API_KEY_HEADER: plain})
+    assert response.status_code == 200
+
+
+def test_endpoint_rejects_api_key_without_scope(client, make_user):
+    owner = make_user("profissional")
+    plain, _ = api_key_registry.create_key("painel", owner["id"], [])
+    response = client.get("/api/v1/appointments/professional", headers={API_KEY_HEADER: plain})
+    assert response.status_code == 403
+    bad = client.get("/api/v1/appointments/professional", headers={API_KEY_HEADER: "salao_x_y"})
+    assert bad.status_code == 401
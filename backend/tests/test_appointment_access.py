@@ -0,0 +1,96 @@
+"""Acesso a /list e ao cancelamento; escritas em série em appointments.json (user-042)"""
+
+import threading
+
+from app.appointment_service import appointment_service
+from app.database import JSONDatabase
+from conftest import at, auth_headers
+
+LIST_URL = "/api/v1/appointments/list"
+
+
+def _create(day, hour, client_id=None, professional_id="1"):
+    return appointment_service.create({
+        "profissional_id": professional_id, "cliente_id": client_id,
+        "data_hora": at(day, hour).isoformat(), "total_duration": 30,
+    })
+
+
+def _listed_ids(client, user, day, **params):
+    response = client.get(LIST_URL, headers=auth_headers(user),
+                          params={"de": day.isoformat(), "ate": day.isoformat(), **params})
+    assert response.status_code == 200
+    return {a["id"] for a in response.json()["appointments"]}
+
+
+def test_list_requires_authentication(client):
+    assert client.get(LIST_URL).status_code == 401
+
+
+def test_clients_only_list_their_own(client, make_user, day):
+    alice, bob = make_user(), make_user()
+    mine = _create(day, 10, alice["id"])
+    theirs = _create(day, 11, bob["id"])
+
+    assert _listed_ids(client, alice, day) == {mine["id"]}
+    # usuario_id de outro cliente é ignorado
+    assert _listed_ids(client, alice, day, usuario_id=bob["id"]) == {mine["id"]}
+    assert {mine["id"], theirs["id"]} <= _listed_ids(client, make_user("admin"), day)
+
+
+def test_professionals_list_their_agenda(client, make_user, day):
+    professional = make_user("profissional")
+    own = _create(day, 10, professional_id=professional["id"])
+    _create(day, 10, professional_id="2")
+    assert _listed_ids(client, professional, day, professional_id="2") == {own["id"]}
+
+
+def test_cancel_requires_ownership(client, make_user, day):
+    owner, stranger = make_user(), make_user()
+    apt = _create(day, 14, owner["id"])
+
+    assert client.delete(f"/api/v1/appointments/{apt['id']}").status_code == 401
+    assert client.delete(f"/api/v1/appointments/{apt['id']}", headers=auth_headers(stranger)).status_code == 404
+    assert client.delete(f"/api/v1/appointments/{apt['id']}", headers=auth_headers(owner)).status_code == 200
+    assert appointment_service.get(apt["id"])["status"] == "cancelado"
+
+
+def test_professional_can_cancel_own_agenda_only(client, make_user, day):
+    professional = make_user("profissional")
+    own = _create(day, 15, professional_id=professional["id"])
+    other = _create(day, 15, professional_id="3")
+    headers = auth_headers(professional)
+    assert client.delete(f"/api/v1/appointments/{other['id']}", headers=headers).status_code == 404
+    assert client.delete(f"/api/v1/appointments/{own['id']}", headers=headers).status_code == 200
+
+
+def test_batch_create_is_a_single_write(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    before = db.collection_version("appointments")
+    db.create_appointments([{"id": "a"}, {"id": "b"}, {"id": "c"}])
+    assert db.collection_version("appointments") != before
+    assert [a["id"] for a in db.get_all_appointments()] == ["a", "b", "c"]
+
+
+def test_concurrent_creates_and_updates_lose_nothing(tmp_path, day):
+    db = JSONDatabase(str(tmp_path))
+    first = db.create_appointment({"profissional_id": "1", "data_hora": at(day, 9).isoformat()})
+
+    def create(i):
+        db.create_appointment({"profissional_id": "1", "data_hora": at(day, 10).isoformat(), "n": i})
+
+    def update(i):
+        db.update_appointment(first["id"], {f"campo_{i}": i})
+
+    threads = [threading.Thread(target=create, args=(i,)) for i in range(20)]
+    threads += [threading.Thread(target=update, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    appointments = db.get_all_appointments()
+    assert len(appointments) == 21
+    assert sorted(a["n"] for a in appointments if "n" in a) == list(range(20))
+    updated = db.get_appointment_by_id(first["id"])
+    assert all(updated[f"campo_{i}"] == i for i in range(20))
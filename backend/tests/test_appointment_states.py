@@ -0,0 +1,144 @@
+"""Máquina de estados, contadores por estado e auditoria (user-050)"""
+
+import pytest
+
+from app.appointment_service import appointment_service
+from app.appointment_states import (
+    ALLOWED_TRANSITIONS, FINAL_STATES, AppointmentStateMachine, InvalidTransitionError,
+    appointment_states, can_transition, normalize_status
+)
+from app.database import JSONDatabase
+from app.models import AppointmentStatus
+from conftest import at, auth_headers
+
+
+def _create(day, hour, client_id=None, professional_id="4"):
+    return appointment_service.create({
+        "profissional_id": professional_id, "cliente_id": client_id,
+        "data_hora": at(day, hour).isoformat(), "total_duration": 30,
+    })
+
+
+# ====================================================================
+# TRANSIÇÕES
+# ====================================================================
+
+def test_transition_table():
+    assert ("pendente", "confirmado") in ALLOWED_TRANSITIONS
+    assert ("em_atendimento", "concluido") in ALLOWED_TRANSITIONS
+    assert ("em_atendimento", "cancelado") not in ALLOWED_TRANSITIONS
+    assert FINAL_STATES == {"concluido", "cancelado", "faltou"}
+    # Todos os estados do modelo têm entrada na tabela
+    assert {s.value for s in AppointmentStatus} == {s for pair in ALLOWED_TRANSITIONS for s in pair}
+
+
+def test_aliases_and_same_state():
+    assert normalize_status("agendado") == "confirmado"
+    assert normalize_status("cancelled") == "cancelado"
+    assert normalize_status(AppointmentStatus.FALTOU) == "faltou"
+    assert can_transition("scheduled", "cancelled")
+    assert can_transition("cancelado", "cancelado")
+    assert not can_transition("concluido", "confirmado")
+
+
+def test_validate_rejects_unknown_and_forbidden_states(tmp_path):
+    states = AppointmentStateMachine(JSONDatabase(str(tmp_path)))
+    states.validate("pendente", "confirmado")
+    with pytest.raises(InvalidTransitionError) as error:
+        states.validate("cancelado", "confirmado")
+    assert error.value.current == "cancelado"
+    assert "nenhuma" in str(error.value)
+    with pytest.raises(InvalidTransitionError):
+        states.validate("pendente", "arquivado")
+
+
+# ====================================================================
+# CONTADORES
+# ====================================================================
+
+def test_counters_follow_mutations(tmp_path, day):
+    db = JSONDatabase(str(tmp_path))
+    states = AppointmentStateMachine(db)
+    day_iso = day.isoformat()
+
+    first = db.create_appointment({"profissional_id": "1", "data_hora": at(day, 10).isoformat(),
+                                   "status": "confirmado"})
+    db.create_appointment({"profissional_id": "1", "data_hora": at(day, 11).isoformat()})
+    assert states.count("confirmado", day_iso) == 1
+    assert states.count("agendado") == 1
+    assert states.counts() == {"confirmado": 1, "pendente": 1}
+
+    db.update_appointment_status(first["id"], "cancelado")
+    assert states.count("confirmado", day_iso) == 0
+    assert states.count("cancelado", day_iso) == 1
+    assert states.status_of(first["id"]) == "cancelado"
+
+
+def test_counters_rebuild_after_external_write(tmp_path, day):
+    db = JSONDatabase(str(tmp_path))
+    states = AppointmentStateMachine(db)
+    assert states.count("confirmado") == 0
+
+    # Outro worker: o observador deste db não é chamado
+    JSONDatabase(str(tmp_path)).create_appointment({
+        "profissional_id": "1", "data_hora": at(day, 10).isoformat(), "status": "confirmado"
+    })
+    assert states.count("confirmado", day.isoformat()) == 1
+
+
+# ====================================================================
+# SERVIÇO E AUDITORIA
+# ====================================================================
+
+def test_service_transitions_are_audited(day):
+    apt = _create(day, 9)
+    assert apt["status"] == "pendente"
+
+    appointment_service.update_status(apt["id"], "confirmado", actor="admin-1")
+    appointment_service.update_status(apt["id"], "em_atendimento")
+    # Repetir o estado atual não escreve nada
+    appointment_service.update_status(apt["id"], "em_atendimento")
+    with pytest.raises(InvalidTransitionError):
+        appointment_service.cancel(apt["id"])
+    appointment_service.update_status(apt["id"], "concluido")
+
+    history = appointment_states.history(apt["id"])
+    assert [(e["from"], e["to"]) for e in history] == [
+        (None, "pendente"), ("pendente", "confirmado"),
+        ("confirmado", "em_atendimento"), ("em_atendimento", "concluido"),
+    ]
+    assert history[1]["actor"] == "admin-1"
+    assert appointment_service.get(apt["id"])["status"] == "concluido"
+
+
+def test_invalid_update_leaves_record_untouched(day):
+    apt = _create(day, 10)
+    appointment_service.cancel(apt["id"], reason="cliente desistiu")
+    with pytest.raises(InvalidTransitionError):
+        appointment_service.update(apt["id"], {"status": "confirmado"})
+    assert appointment_service.get(apt["id"])["status"] == "cancelado"
+    assert appointment_states.history(apt["id"])[-1]["reason"] == "cliente desistiu"
+
+
+def test_count_by_status_per_day(day):
+    apt = _create(day, 11)
+    _create(day, 12)
+    appointment_service.update_status(apt["id"], "confirmado")
+    counts = appointment_service.count_by_status(day.isoformat())
+    assert counts["confirmado"] == 1
+    assert counts["pendente"] == 1
+
+
+def test_patch_status_endpoint_returns_409(client, make_user, day):
+    admin = make_user("admin")
+    apt = _create(day, 13)
+    url = f"/api/v1/appointments/{apt['id']}/status"
+
+    response = client.patch(url, params={"new_status": "cancelado", "update_calendar": False},
+                            headers=auth_headers(admin))
+    assert response.status_code == 200
+
+    response = client.patch(url, params={"new_status": "confirmado", "update_calendar": False},
+                            headers=auth_headers(admin))
+    assert response.status_code == 409
+    assert appointment_service.get(apt["id"])["status"] == "cancelado"
@@ -0,0 +1,89 @@
+"""Stream SSE da agenda: autenticação, filtros e campos enviados (user-043)"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.appointment_events import STREAM_FIELDS, AppointmentEventBroker, event_type, stream_view
+from app.database import JSONDatabase
+from conftest import at, auth_headers
+
+STREAM_URL = "/api/v1/appointments/stream"
+
+
+def test_stream_view_strips_client_data():
+    record = {"id": "A", "profissional_id": "1", "status": "confirmado", "cliente_id": "c1",
+              "medical_questionnaire": {"q1": "sim"}, "notes": "alergia", "total_price": 30}
+    view = stream_view(record)
+    assert set(view) <= set(STREAM_FIELDS)
+    assert "cliente_id" not in view and "medical_questionnaire" not in view and "notes" not in view
+    assert stream_view(None) is None
+
+
+def test_event_types():
+    assert event_type("created", {"status": "cancelado"}) == "created"
+    assert event_type("updated", {"status": "cancelado"}) == "cancelled"
+    assert event_type("updated", {"status": "faltou"}) == "no_show"
+    assert event_type("updated", {"status": "pendente"}) == "updated"
+
+
+def test_stream_requires_agenda_permission(client, make_user):
+    assert client.get(STREAM_URL).status_code == 401
+    assert client.get(STREAM_URL, headers=auth_headers(make_user())).status_code == 403
+
+
+@pytest.fixture
+def captured_subscribe(monkeypatch):
+    """Regista os filtros pedidos e termina o pedido antes de abrir o stream"""
+    from app.routes import appointments as routes
+    calls = []
+
+    def subscribe(professional_id=None, day=None):
+        calls.append((professional_id, day))
+        raise HTTPException(status_code=418, detail="teste")
+
+    monkeypatch.setattr(routes.appointment_events, "subscribe", subscribe)
+    return calls
+
+
+def test_professionals_only_stream_their_agenda(client, make_user, captured_subscribe):
+    professional = make_user("profissional")
+    client.get(STREAM_URL, headers=auth_headers(professional), params={"professional_id": "2"})
+    assert captured_subscribe == [(professional["id"], None)]
+
+
+def test_admins_choose_the_professional(client, make_user, captured_subscribe):
+    client.get(STREAM_URL, headers=auth_headers(make_user("admin")),
+               params={"professional_id": "2", "date": "2030-01-01"})
+    assert captured_subscribe == [("2", "2030-01-01")]
+
+
+def test_broker_filters_and_resyncs(tmp_path, day):
+    db = JSONDatabase(str(tmp_path))
+    broker = AppointmentEventBroker(db)
+
+    async def scenario():
+        mine = broker.subscribe(professional_id="1")
+        slow = broker.subscribe()
+        slow.queue = asyncio.Queue(maxsize=2)
+
+        for hour in (10, 11, 12):
+            db.create_appointment({"profissional_id": "1", "data_hora": at(day, hour).isoformat()})
+        db.create_appointment({"profissional_id": "2", "data_hora": at(day, 10).isoformat()})
+        await asyncio.sleep(0)
+
+        received = [await mine.get(1) for _ in range(3)]
+        assert [e["appointment"]["profissional_id"] for e in received] == ["1", "1", "1"]
+        assert await mine.get(0.01) is None
+
+        # A fila lenta encheu: os eventos pendentes viram um único resync
+        events = [await slow.get(0.01) for _ in range(2)]
+        assert [e["type"] for e in events if e] == ["resync", "created"]
+        assert slow.dropped == 3
+
+        broker.unsubscribe(mine)
+        broker.unsubscribe(slow)
+        assert len(broker) == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,77 @@
+"""Atribuição automática de profissional (user-038)"""
+
+import pytest
+
+from app.assignment import STRATEGY_BEST_FIT, AssignmentEngine, free_gap_quanta
+from app.availability import AvailabilityIndex
+from app.booking_holds import SlotHoldRegistry
+from app.database import JSONDatabase
+from app.schedule_templates import ScheduleTemplates
+from conftest import at
+
+
+@pytest.fixture
+def setup(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    index = AvailabilityIndex(db)
+    holds = SlotHoldRegistry(index)
+    return db, holds, AssignmentEngine(db, index, ScheduleTemplates(db), holds)
+
+
+def _book(db, professional_id, start, duration=60):
+    db.create_appointment({"profissional_id": professional_id, "data_hora": start.isoformat(),
+                           "total_duration": duration})
+
+
+def test_free_gap_quanta():
+    assert free_gap_quanta(0b0111100, 3) == 4
+    assert free_gap_quanta(0b0111100, 0) == 0
+
+
+def test_candidates_follow_specialties(setup):
+    _, _, engine = setup
+    assert [p["id"] for p in engine.candidates(["mechas"])] == ["1"]
+    assert {p["id"] for p in engine.candidates(["manicure"])} == {"4", "5"}
+    assert len(engine.candidates([])) == 5
+
+
+def test_least_loaded_professional_is_chosen(setup, day):
+    db, _, engine = setup
+    _book(db, "4", at(day, 9), 120)
+    assert engine.assign(["manicure"], at(day, 15), 60) == "5"
+
+
+def test_busy_or_held_professionals_are_skipped(setup, day):
+    db, holds, engine = setup
+    _book(db, "5", at(day, 10))
+    assert engine.assign(["manicure"], at(day, 10), 60) == "4"
+    holds.place_hold("4", at(day, 10), 30)
+    assert engine.assign(["manicure"], at(day, 10), 60) is None
+
+
+def test_outside_opening_hours_nobody_is_assigned(setup, day):
+    _, _, engine = setup
+    assert engine.assign(["mechas"], at(day, 18, 30), 60) is None
+
+
+def test_best_fit_prefers_tightest_gap(setup, day):
+    db, _, engine = setup
+    # A 4 tem um buraco de 1h entre 10:00 e 11:00; a 5 tem menos minutos marcados
+    _book(db, "4", at(day, 9))
+    _book(db, "4", at(day, 11))
+    _book(db, "5", at(day, 17), 30)
+    assert engine.assign(["manicure"], at(day, 10), 60) == "5"
+    assert engine.assign(["manicure"], at(day, 10), 60, strategy=STRATEGY_BEST_FIT) == "4"
+
+
+def test_unknown_service_falls_back_to_whole_team(setup, day):
+    _, _, engine = setup
+    assert engine.assign(["serviço inexistente"], at(day, 10), 30) is not None
+
+
+def test_schedule_without_professional_is_assigned(client, day):
+    response = client.post("/api/v1/appointments/schedule", json={
+        "booking_code": "BOOK-038", "appointment_date": day.isoformat(), "appointment_time": "16:00"
+    })
+    assert response.status_code == 200
+    assert response.json()["professional_id"] in {"1", "2", "3", "4", "5"}
@@ -0,0 +1,67 @@
+"""Cache de horários livres por profissional-dia (user-046)"""
+
+from datetime import timedelta
+
+import pytest
+
+from app.availability import AvailabilityIndex
+from app.availability_cache import AvailabilityCache
+from app.database import JSONDatabase
+from app.schedule_templates import ScheduleTemplates
+from app.slot_calendar import mask_to_times
+from conftest import at
+
+
+@pytest.fixture
+def setup(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    templates = ScheduleTemplates(db)
+    return db, templates, AvailabilityCache(db, AvailabilityIndex(db), templates)
+
+
+def test_repeated_queries_hit_the_cache(setup, day):
+    _, _, cache = setup
+    first = cache.starts("1", day, 60)
+    assert cache.starts("1", day, 60) == first
+    # 50 e 60 min ocupam os mesmos 4 quanta: mesma entrada
+    assert cache.starts("1", day, 50) == first
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_write_invalidates_only_that_professional_day(setup, day):
+    db, _, cache = setup
+    cache.starts("1", day, 30)
+    cache.starts("2", day, 30)
+    cache.starts("1", day + timedelta(days=1), 30)
+
+    db.create_appointment({"profissional_id": "1", "data_hora": at(day, 10).isoformat(), "total_duration": 30})
+
+    available, _ = cache.starts("1", day, 30)
+    assert "10:00" not in mask_to_times(available)
+    assert cache.misses == 4
+    cache.starts("2", day, 30)
+    cache.starts("1", day + timedelta(days=1), 30)
+    assert cache.misses == 4 and cache.hits == 2
+
+
+def test_template_change_invalidates(setup, day):
+    _, templates, cache = setup
+    cache.starts("3", day, 30)
+    templates.save_template("3", {"exceptions": {day.isoformat(): []}})
+    assert cache.starts("3", day, 30) == (0, 0)
+
+
+def test_lru_bound(tmp_path, day):
+    db = JSONDatabase(str(tmp_path))
+    cache = AvailabilityCache(db, AvailabilityIndex(db), ScheduleTemplates(db), max_entries=2)
+    for duration in (30, 60, 90):
+        cache.starts("1", day, duration)
+    assert len(cache) == 2
+
+
+def test_prewarm_fills_the_next_days(setup, day):
+    _, _, cache = setup
+    computed = cache.prewarm(days=2, durations=(30,), first_day=day)
+    assert computed == 2 * 5 and len(cache) == 10
+    cache.starts("4", day + timedelta(days=1), 30)
+    assert cache.hits == 1
@@ -0,0 +1,66 @@
+"""Índice de intervalos por profissional e dia (user-031)"""
+
+from app.availability import AvailabilityIndex, DayIntervals, appointment_duration
+from app.database import JSONDatabase
+from conftest import at
+
+
+def _appointment(db, professional_id, start, duration=60, **fields):
+    return db.create_appointment({
+        "profissional_id": professional_id,
+        "data_hora": start.isoformat(),
+        "total_duration": duration,
+        **fields,
+    })
+
+
+def test_day_intervals_overlap_is_half_open():
+    day = DayIntervals()
+    day.add(600, 660, "a")
+    assert day.overlaps(630, 690)
+    assert not day.overlaps(660, 720)
+    assert not day.overlaps(540, 600)
+    assert day.find_conflict(630, 690) == (600, 660)
+    assert day.find_conflict(630, 690, exclude_id="a") is None
+
+
+def test_day_intervals_catch_long_earlier_interval():
+    # O intervalo longo começa antes de um curto: max_ends ainda o deteta
+    day = DayIntervals()
+    day.add(540, 720, "longo")
+    day.add(600, 615, "curto")
+    assert day.overlaps(690, 700)
+    day.remove("longo")
+    assert not day.overlaps(690, 700)
+    assert len(day) == 1
+
+
+def test_appointment_duration_formats():
+    assert appointment_duration({"total_duration": 45}) == 45
+    assert appointment_duration({"servicos": [{"duracao_estimada": 30}, {"duracao_estimada": 20}]}) == 50
+    assert appointment_duration({"services_details": [{"duration": 15}]}) == 15
+    assert appointment_duration({}) == 60
+
+
+def test_index_follows_database_writes(tmp_path, day):
+    db = JSONDatabase(str(tmp_path))
+    index = AvailabilityIndex(db)
+    apt = _appointment(db, "1", at(day, 10))
+
+    assert index.find_conflict("1", at(day, 10, 30), 30) == "10:00 - 11:00"
+    assert index.find_conflict("2", at(day, 10, 30), 30) is None
+    assert index.find_conflict("1", at(day, 10, 30), 30, exclude_id=apt["id"]) is None
+
+    # Cancelar liberta o horário sem reconstruir o índice
+    db.update_appointment_status(apt["id"], "cancelado")
+    assert index.find_conflict("1", at(day, 10, 30), 30) is None
+
+
+def test_index_rebuilds_after_external_write(tmp_path, day):
+    db = JSONDatabase(str(tmp_path))
+    index = AvailabilityIndex(db)
+    assert index.find_conflict("1", at(day, 15), 30) is None
+
+    # Outro worker escreve no mesmo arquivo
+    _appointment(JSONDatabase(str(tmp_path)), "1", at(day, 15))
+    assert index.find_conflict("1", at(day, 15), 30) == "15:00 - 16:00"
@@ -0,0 +1,76 @@
+"""Agendamento em lote com validação numa passagem (user-041)"""
+
+from app.appointment_service import appointment_service
+from app.availability import availability_index
+from conftest import at, auth_headers
+
+BATCH_URL = "/api/v1/appointments/schedule/batch"
+
+
+def _item(day, time, **fields):
+    return {"appointment_date": day.isoformat(), "appointment_time": time,
+            "servico": "manicure", "duration": 60, "professional_id": "4", **fields}
+
+
+def test_batch_requires_manage_permission(client, make_user, day):
+    payload = {"items": [_item(day, "10:00")]}
+    assert client.post(BATCH_URL, json=payload).status_code == 401
+    assert client.post(BATCH_URL, json=payload, headers=auth_headers(make_user())).status_code == 403
+    assert client.post(BATCH_URL, json=payload,
+                       headers=auth_headers(make_user("profissional"))).status_code == 403
+
+
+def test_batch_detects_conflicts_inside_the_batch(client, make_user, day):
+    admin = make_user("admin")
+    response = client.post(BATCH_URL, headers=auth_headers(admin), json={"items": [
+        _item(day, "10:00"),
+        _item(day, "10:30"),
+        _item(day, "11:00"),
+        _item(day, "08:00"),
+    ]})
+
+    body = response.json()
+    assert body["committed"] and body["created"] == 2 and body["failed"] == 2
+    assert [r["status"] for r in body["results"]] == ["created", "error", "created", "error"]
+
+    created = appointment_service.get(body["results"][0]["appointment_id"])
+    # Sem usuario_id, o agendamento fica em nome de quem faz o pedido
+    assert created["cliente_id"] == admin["id"]
+    assert availability_index.find_conflict("4", at(day, 11, 30), 15) is not None
+
+
+def test_batch_conflicts_with_existing_appointments(client, make_user, day):
+    appointment_service.create({"profissional_id": "5", "data_hora": at(day, 15).isoformat(),
+                                "total_duration": 60})
+    body = client.post(BATCH_URL, headers=auth_headers(make_user("admin")), json={"items": [
+        _item(day, "15:30", professional_id="5"),
+    ]}).json()
+    assert body["results"][0]["status"] == "error"
+
+
+def test_atomic_batch_rolls_back_everything(client, make_user, day):
+    body = client.post(BATCH_URL, headers=auth_headers(make_user("admin")), json={"atomic": True, "items": [
+        _item(day, "12:00", professional_id="2", servico="barba"),
+        _item(day, "12:00", professional_id="2", servico="barba"),
+    ]}).json()
+
+    assert not body["committed"] and body["created"] == 0
+    assert [r["status"] for r in body["results"]] == ["rolled_back", "error"]
+    assert availability_index.find_conflict("2", at(day, 12), 60) is None
+
+
+def test_batch_assigns_professionals_when_omitted(client, make_user, day):
+    body = client.post(BATCH_URL, headers=auth_headers(make_user("admin")), json={"items": [
+        _item(day, "16:00", professional_id=None),
+        _item(day, "16:00", professional_id=None),
+        _item(day, "16:00", professional_id=None),
+    ]}).json()
+
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses == ["created", "created", "error"]
+    assert {r["professional_id"] for r in body["results"][:2]} == {"4", "5"}
+
+
+def test_empty_batch_is_rejected(client, make_user):
+    assert client.post(BATCH_URL, json={"items": []},
+                       headers=auth_headers(make_user("admin"))).status_code == 400
@@ -0,0 +1,73 @@
+"""Rascunhos de /prepare com TTL, limite e backend SQLite (user-035)"""
+
+import time
+
+import pytest
+
+from app.booking_drafts import DraftStore, MemoryDraftStore, SQLiteDraftStore, create_draft_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store_factory(request, tmp_path):
+    def factory(**kwargs):
+        if request.param == "memory":
+            return MemoryDraftStore(**kwargs)
+        return SQLiteDraftStore(path=str(tmp_path / "drafts.sqlite3"), **kwargs)
+    return factory
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        DraftStore()
+
+
+def test_put_get_delete(store_factory):
+    store = store_factory()
+    store.put("BOOK-1", {"total_duration": 60})
+    assert store.get("BOOK-1") == {"total_duration": 60}
+    assert len(store) == 1
+    store.delete("BOOK-1")
+    assert store.get("BOOK-1") is None
+
+
+def test_drafts_expire(store_factory):
+    store = store_factory(ttl_seconds=0)
+    store.put("BOOK-1", {"x": 1})
+    assert store.get("BOOK-1") is None
+    assert store.update("BOOK-1", status="scheduled") is None
+    assert len(store) == 0
+
+
+def test_update_keeps_original_expiry(store_factory, monkeypatch):
+    store = store_factory(ttl_seconds=100)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    store.put("BOOK-1", {"status": "pending"})
+
+    monkeypatch.setattr(time, "time", lambda: now + 90)
+    assert store.update("BOOK-1", status="scheduled") == {"status": "scheduled"}
+
+    # Atualizar não prolonga: aos 101 s o rascunho já expirou
+    monkeypatch.setattr(time, "time", lambda: now + 101)
+    assert store.get("BOOK-1") is None
+
+
+def test_oldest_drafts_are_evicted(store_factory):
+    store = store_factory(max_entries=2)
+    for code in ("A", "B", "C"):
+        store.put(code, {"code": code})
+        time.sleep(0.001)
+    assert store.get("A") is None
+    assert store.get("B") and store.get("C")
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "drafts.sqlite3")
+    SQLiteDraftStore(path=path).put("BOOK-1", {"services": ["corte"]})
+    assert SQLiteDraftStore(path=path).get("BOOK-1") == {"services": ["corte"]}
+
+
+def test_factory_backends():
+    assert isinstance(create_draft_store("memory"), MemoryDraftStore)
+    with pytest.raises(ValueError):
+        create_draft_store("redis")
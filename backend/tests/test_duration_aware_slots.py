@@ -0,0 +1,63 @@
+"""Horários livres que respeitam a duração do serviço (user-037)"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.appointment_service import appointment_service
+from app.booking_drafts import booking_drafts
+from app.database import db
+from app.slot_calendar import mask_to_times
+from conftest import at
+
+
+@pytest.fixture(scope="module")
+def legacy_client():
+    # O router de app/appointments.py não está montado em app.main
+    from app.appointments import router
+    legacy = FastAPI()
+    legacy.include_router(router, prefix="/legacy")
+    return TestClient(legacy)
+
+
+def _book(professional_id, start, duration):
+    db.create_appointment({"profissional_id": professional_id, "data_hora": start.isoformat(),
+                           "total_duration": duration})
+
+
+def test_available_starts_leave_room_for_the_whole_service(day):
+    _book("4", at(day, 11), 60)
+    available, opening = appointment_service.available_starts(day, ["4"], 90, 30)
+    times = mask_to_times(available)
+
+    # 10:00 + 90 min colide com as 11:00; 09:30 termina às 11:00
+    assert "09:30" in times and "10:00" not in times and "10:30" not in times
+    assert "12:00" in times
+    # O serviço tem de terminar até às 19:00
+    assert mask_to_times(opening)[-1] == "17:30"
+
+
+def test_longer_service_has_fewer_starts(day):
+    short, _ = appointment_service.available_starts(day, ["5"], 30, 30)
+    long, _ = appointment_service.available_starts(day, ["5"], 120, 30)
+    assert long & ~short == 0
+    assert bin(long).count("1") < bin(short).count("1")
+
+
+def test_legacy_endpoint_uses_duration_and_booking(legacy_client, day):
+    _book("1", at(day, 14), 60)
+    url = f"/legacy/available-slots/{day.isoformat()}"
+
+    slots = legacy_client.get(url, params={"professional_id": "1", "duration": 90}).json()
+    assert slots["duration"] == 90
+    assert "13:00" not in slots["available_slots"]
+    assert "13:00" in slots["occupied_slots"]
+
+    booking_drafts.put("BOOK-037", {"total_duration": 30, "services": []})
+    slots = legacy_client.get(url, params={"professional_id": "1", "booking_code": "BOOK-037"}).json()
+    assert slots["duration"] == 30
+    assert "13:30" in slots["available_slots"]
+
+
+def test_legacy_endpoint_rejects_bad_date(legacy_client):
+    assert legacy_client.get("/legacy/available-slots/amanha").status_code == 400
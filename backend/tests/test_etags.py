@@ -0,0 +1,67 @@
+"""GET condicional com ETag / If-None-Match (user-044)"""
+
+from types import SimpleNamespace
+
+from app.appointment_service import appointment_service
+from app.etags import etag_matches, make_etag
+from conftest import at, auth_headers
+
+
+def _request(header=None):
+    return SimpleNamespace(headers={"if-none-match": header} if header else {})
+
+
+def test_make_etag_is_stable_and_strong():
+    assert make_etag("a", 1) == make_etag("a", 1)
+    assert make_etag("a", 1) != make_etag("a", 2)
+    assert make_etag("a").startswith('"') and make_etag("a").endswith('"')
+
+
+def test_etag_matches_lists_weak_and_star():
+    etag = make_etag("x")
+    assert etag_matches(_request(etag), etag)
+    assert etag_matches(_request(f'"outro", W/{etag}'), etag)
+    assert etag_matches(_request("*"), etag)
+    assert not etag_matches(_request('"outro"'), etag)
+    assert not etag_matches(_request(), etag)
+
+
+def test_professionals_not_modified(client):
+    first = client.get("/api/v1/professionals/")
+    etag = first.headers["ETag"]
+    second = client.get("/api/v1/professionals/", headers={"If-None-Match": etag})
+    assert second.status_code == 304 and second.headers["ETag"] == etag
+    assert client.get("/api/v1/professionals/", params={"tipo_servico": "unha"}).headers["ETag"] != etag
+
+
+def test_available_slots_etag_changes_with_the_day(client, day):
+    url = f"/api/v1/appointments/available-slots/{day.isoformat()}"
+    etag = client.get(url, params={"professional_id": "1"}).headers["ETag"]
+    assert client.get(url, params={"professional_id": "1"},
+                      headers={"If-None-Match": etag}).status_code == 304
+
+    appointment_service.create({"profissional_id": "1", "data_hora": at(day, 13).isoformat(),
+                                "total_duration": 30})
+    changed = client.get(url, params={"professional_id": "1"}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert "13:00" not in changed.json()["available_slots"]
+
+
+def test_list_etag_is_per_user(client, make_user, day):
+    alice, bob = make_user(), make_user()
+    params = {"de": day.isoformat(), "ate": day.isoformat()}
+    etag = client.get("/api/v1/appointments/list", params=params, headers=auth_headers(alice)).headers["ETag"]
+
+    again = client.get("/api/v1/appointments/list", params=params,
+                       headers={**auth_headers(alice), "If-None-Match": etag})
+    assert again.status_code == 304
+    # Outro cliente nunca recebe o 304 da lista de alice
+    other = client.get("/api/v1/appointments/list", params=params,
+                       headers={**auth_headers(bob), "If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_translations_etag(client):
+    etag = client.get("/api/v1/appointments/translations").headers["ETag"]
+    assert client.get("/api/v1/appointments/translations",
+                      headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,91 @@
+"""Paginação por cursor e filtros de /list (user-045)"""
+
+from datetime import timedelta
+
+from app.appointment_service import appointment_service, decode_cursor, encode_cursor
+from conftest import at, auth_headers
+
+LIST_URL = "/api/v1/appointments/list"
+
+
+def _create(day, hour, minute, client_id, professional_id="2", **fields):
+    return appointment_service.create({
+        "profissional_id": professional_id, "cliente_id": client_id,
+        "data_hora": at(day, hour, minute).isoformat(), "total_duration": 30, **fields,
+    })
+
+
+def _pages(client, headers, **params):
+    seen, cursor = [], None
+    while True:
+        body = client.get(LIST_URL, headers=headers,
+                          params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        seen.append([a["id"] for a in body["appointments"]])
+        cursor = body["next_cursor"]
+        if not cursor:
+            return seen
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor((123, "abc"))) == (123, "abc")
+
+
+def test_cursor_walks_every_appointment_once_in_order(client, make_user, day):
+    customer = make_user()
+    created = [_create(day, 9 + i // 2, 30 * (i % 2), customer["id"]) for i in range(7)]
+
+    pages = _pages(client, auth_headers(customer), de=day.isoformat(), ate=day.isoformat(), limit=3)
+    assert [len(p) for p in pages] == [3, 3, 1]
+    assert [i for page in pages for i in page] == [a["id"] for a in created]
+
+
+def test_admin_filters_by_client_professional_and_status(client, make_user, day):
+    customer, admin = make_user(), auth_headers(make_user("admin"))
+    confirmed = _create(day, 10, 0, customer["id"], professional_id="1", status="confirmado")
+    other_professional = _create(day, 11, 0, customer["id"], professional_id="3")
+    appointment_service.cancel(_create(day, 12, 0, customer["id"], professional_id="1")["id"])
+    window = {"de": day.isoformat(), "ate": day.isoformat(), "usuario_id": customer["id"]}
+
+    ids = lambda **p: [a["id"] for a in client.get(LIST_URL, headers=admin, params={**window, **p}).json()["appointments"]]
+    assert len(ids()) == 3
+    assert ids(professional_id="3") == [other_professional["id"]]
+    assert ids(status="confirmado", professional_id="1") == [confirmed["id"]]
+    assert len(ids(status="cancelado")) == 1
+
+
+def test_date_window_excludes_other_days(client, make_user, day):
+    customer = make_user()
+    inside = _create(day, 10, 0, customer["id"])
+    _create(day + timedelta(days=1), 10, 0, customer["id"])
+    body = client.get(LIST_URL, headers=auth_headers(customer),
+                      params={"de": day.isoformat(), "ate": day.isoformat()}).json()
+    assert [a["id"] for a in body["appointments"]] == [inside["id"]]
+
+
+def test_recurring_occurrences_are_merged(client, make_user, day):
+    customer = make_user()
+    headers = auth_headers(customer)
+    stored = _create(day, 9, 0, customer["id"], professional_id="4")
+    client.post("/api/v1/appointments/recurring", headers=headers, json={
+        "appointment_date": day.isoformat(), "appointment_time": "14:00", "freq": "daily",
+        "count": 2, "servico": "manicure", "duration": 30, "professional_id": "4",
+    })
+
+    body = client.get(LIST_URL, headers=headers, params={
+        "de": day.isoformat(), "ate": (day + timedelta(days=1)).isoformat(), "limit": 2,
+    }).json()
+    assert body["appointments"][0]["id"] == stored["id"]
+    assert body["appointments"][1]["id"].endswith(f"@{day.isoformat()}")
+
+    rest = client.get(LIST_URL, headers=headers, params={
+        "de": day.isoformat(), "ate": (day + timedelta(days=1)).isoformat(), "cursor": body["next_cursor"],
+    }).json()
+    assert [a["id"] for a in rest["appointments"]] == [
+        f"{body['appointments'][1]['id'].split('@')[0]}@{(day + timedelta(days=1)).isoformat()}"
+    ]
+
+
+def test_invalid_parameters_are_rejected(client, make_user):
+    headers = auth_headers(make_user())
+    assert client.get(LIST_URL, headers=headers, params={"cursor": "lixo"}).status_code == 400
+    assert client.get(LIST_URL, headers=headers, params={"de": "ontem"}).status_code == 400
@@ -0,0 +1,93 @@
+"""Etiquetas de falta, histórico por cliente e estado "faltou" (user-048)"""
+
+from datetime import timedelta
+
+import pytest
+
+from app.appointment_service import appointment_service
+from app.appointment_states import InvalidTransitionError
+from app.database import JSONDatabase
+from app.no_show import LATE_CANCEL_HOURS, NoShowPredictor, no_show_label, training_set
+from app.salon_time import local_iso, now_epoch, salon_now
+from conftest import at
+
+HOUR = 3600
+
+
+def _past(hours_ago, **fields):
+    ts = now_epoch() - hours_ago * HOUR
+    return {"id": fields.pop("id", f"A{hours_ago}"), "cliente_id": "c1", "profissional_id": "1",
+            "data_hora": local_iso(ts), "data_hora_ts": ts, **fields}
+
+
+def test_labels_come_only_from_recorded_outcomes():
+    now = now_epoch()
+    assert no_show_label(_past(48, status="concluido"), now) == 0
+    assert no_show_label(_past(48, status="faltou"), now) == 1
+    assert no_show_label(_past(48, status="no_show"), now) == 1
+    # Passado mas sem resultado registado: não é falta
+    assert no_show_label(_past(48, status="pendente"), now) is None
+    assert no_show_label(_past(48, status="confirmado"), now) is None
+    assert no_show_label(_past(-48, status="faltou"), now) is None
+
+
+def test_late_cancellation_counts_as_no_show():
+    now = now_epoch()
+    apt = _past(48, status="cancelado")
+    apt["cancelled_at"] = local_iso(apt["data_hora_ts"] - HOUR)
+    assert no_show_label(apt, now) == 1
+    apt["cancelled_at"] = local_iso(apt["data_hora_ts"] - (LATE_CANCEL_HOURS + 1) * HOUR)
+    assert no_show_label(apt, now) is None
+
+
+def test_training_history_only_uses_earlier_appointments():
+    appointments = [_past(72, status="faltou"), _past(48, status="concluido"), _past(24, status="faltou")]
+    X, y = training_set(appointments, now_epoch())
+    assert list(y) == [1, 0, 1]
+    # Feature de taxa de faltas suavizada: (faltas + 1) / (visitas + 2)
+    assert [round(row[3], 3) for row in X] == [0.5, round(2 / 3, 3), 0.5]
+
+
+def test_history_follows_status_changes(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    predictor = NoShowPredictor(db, model_path=str(tmp_path / "modelo.json"))
+    db.create_appointments([_past(48, id="p1", status="confirmado"), _past(30, id="p2", status="confirmado")])
+    predictor.ensure_fresh()
+    assert predictor._history == {}
+
+    db.update_appointment_status("p1", "faltou")
+    assert predictor._history["c1"] == [1, 1]
+    db.update_appointment_status("p2", "concluido")
+    assert predictor._history["c1"] == [2, 1]
+
+    # A reconstrução completa chega ao mesmo histórico
+    predictor._rebuild()
+    assert predictor._history["c1"] == [2, 1]
+
+
+def test_trained_model_scores_frequent_no_shows_higher(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    history = []
+    for i in range(30):
+        history.append(_past(500 - i * 10, id=f"f{i}", cliente_id="faltoso", status="faltou" if i % 5 else "concluido"))
+        history.append(_past(495 - i * 10, id=f"a{i}", cliente_id="assiduo", status="concluido" if i % 5 else "faltou"))
+    db.create_appointments(history)
+    predictor = NoShowPredictor(db, model_path=str(tmp_path / "modelo.json"))
+    summary = predictor.train()
+    assert summary["samples"] == 60 and summary["model"] is not None
+
+    start = salon_now() + timedelta(days=3)
+    db.create_appointments([
+        {"id": "x", "cliente_id": "faltoso", "profissional_id": "1", "data_hora": start.isoformat()},
+        {"id": "y", "cliente_id": "assiduo", "profissional_id": "1", "data_hora": start.isoformat()},
+    ])
+    faltoso, assiduo = predictor.probabilities(["x", "y"])
+    assert faltoso > assiduo
+
+
+def test_faltou_is_a_final_state(day):
+    apt = appointment_service.create({"profissional_id": "2", "data_hora": at(day, 9).isoformat(),
+                                      "total_duration": 30})
+    assert appointment_service.update_status(apt["id"], "no_show")["status"] == "faltou"
+    with pytest.raises(InvalidTransitionError):
+        appointment_service.update_status(apt["id"], "confirmado")
@@ -0,0 +1,44 @@
+"""Custo de hash calibrado e rehash no login (user-027)"""
+
+import json
+
+from app import auth, password_hashing
+from app.database import db
+from app.password_hashing import (
+    BCRYPT_MIN_ROUNDS, DEFAULT_HASH_CONFIG, build_crypt_context, calibrate_bcrypt, load_hash_config
+)
+
+
+def context(rounds: int):
+    return build_crypt_context({**DEFAULT_HASH_CONFIG, "bcrypt_rounds": rounds})
+
+
+def test_load_hash_config_defaults_and_file(tmp_path, monkeypatch):
+    path = tmp_path / "password_hashing.json"
+    monkeypatch.setattr(password_hashing, "HASH_CONFIG_FILE", path)
+    assert load_hash_config()["bcrypt_rounds"] == DEFAULT_HASH_CONFIG["bcrypt_rounds"]
+
+    path.write_text(json.dumps({"bcrypt_rounds": 11}))
+    assert load_hash_config()["bcrypt_rounds"] == 11
+
+
+def test_hash_with_other_cost_needs_update():
+    old = context(4).hash("segredo")
+    assert context(5).needs_update(old)
+    assert not context(4).needs_update(old)
+
+
+def test_login_rehashes_outdated_hash(monkeypatch, make_user):
+    user = make_user(senha=context(4).hash("segredo"))
+    monkeypatch.setattr(auth, "pwd_context", context(5))
+
+    assert auth.authenticate_user(user["email"], "errada") is None
+    assert db.get_user_by_id(user["id"])["senha"].startswith("$2b$04$")
+
+    assert auth.authenticate_user(user["email"], "segredo")
+    assert db.get_user_by_id(user["id"])["senha"].startswith("$2b$05$")
+
+
+def test_calibrate_bcrypt_respects_minimum():
+    result = calibrate_bcrypt(target_ms=0.001)
+    assert result["bcrypt_rounds"] == BCRYPT_MIN_ROUNDS
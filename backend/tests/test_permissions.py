@@ -0,0 +1,49 @@
+"""Permissões compiladas em máscaras de bits (user-028)"""
+
+from types import SimpleNamespace
+
+from app.permissions import (
+    ROLE_GRANTS, ROLE_MASKS, Permission, compile_mask, has_permission, role_mask
+)
+from conftest import auth_headers
+
+
+def test_compile_mask_joins_bits():
+    mask = compile_mask([Permission.VIEW_STATISTICS, Permission.VIEW_REVENUE])
+    assert mask == Permission.VIEW_STATISTICS | Permission.VIEW_REVENUE
+    assert compile_mask([]) == 0
+
+
+def test_role_masks_match_grants():
+    for role, grants in ROLE_GRANTS.items():
+        assert ROLE_MASKS[role] == compile_mask(grants)
+    assert role_mask("cliente") == 0
+    assert role_mask("desconhecida") == 0
+
+
+def test_role_mask_accepts_enum_roles():
+    from app.models import UserRole
+    assert role_mask(UserRole.ADMIN) == ROLE_MASKS["admin"]
+
+
+def test_has_permission_requires_every_bit():
+    professional = SimpleNamespace(role="profissional")
+    assert has_permission(professional, Permission.VIEW_PROFESSIONAL_AGENDA)
+    assert not has_permission(professional, Permission.VIEW_PROFESSIONAL_AGENDA,
+                              Permission.MANAGE_APPOINTMENTS)
+    assert has_permission(SimpleNamespace(role="admin"), Permission.MANAGE_APPOINTMENTS)
+    assert not has_permission(SimpleNamespace(), Permission.VIEW_STATISTICS)
+
+
+def test_admin_route_rejects_client(client, make_user):
+    response = client.get("/api/v1/admin/stats", headers=auth_headers(make_user("cliente")))
+    assert response.status_code == 403
+
+
+def test_admin_route_accepts_admin(client, make_user):
+    response = client.get("/api/v1/admin/stats", headers=auth_headers(make_user("admin")))
+    assert response.status_code == 200
+
+
+def test_route_without_token_is_unauthorized(client):
+    assert client.get("/api/v1/admin/stats").status_code == 401
@@ -0,0 +1,68 @@
+"""Limitador de login (user-026): buckets por IP e por email"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.rate_limit import (
+    IDLE_SECONDS, LOGIN_EMAIL_CAPACITY, InMemoryRateLimitStore, LoginRateLimiter, RateLimitStore
+)
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimitStore()
+
+
+def test_bucket_refills_over_time():
+    store = InMemoryRateLimitStore()
+    bucket = [("k", 2, 1.0)]
+    assert store.take(bucket, 0)[0]
+    assert store.take(bucket, 0)[0]
+    allowed, retry_after = store.take(bucket, 0)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    assert store.take(bucket, 1.0)[0]
+
+
+def test_rejected_take_does_not_consume_other_buckets():
+    store = InMemoryRateLimitStore()
+    store.take([("email", 1, 0.001)], 0)
+
+    # O email está vazio: o IP não pode perder o token
+    for _ in range(5):
+        assert not store.take([("ip", 3, 0.001), ("email", 1, 0.001)], 0)[0]
+    assert store.take([("ip", 3, 0.001)], 0)[0]
+    assert store.take([("ip", 3, 0.001)], 0)[0]
+    assert store.take([("ip", 3, 0.001)], 0)[0]
+
+
+def test_evicts_least_recently_used_over_max_keys():
+    store = InMemoryRateLimitStore(max_keys=3)
+    for key in "abcd":
+        store.take([(key, 5, 1.0)], 0)
+    assert len(store) == 3
+
+    # "b" volta a ser usado: o próximo a sair é "c"
+    store.take([("b", 5, 1.0)], 1)
+    store.take([("e", 5, 1.0)], 1)
+    assert set(store._buckets) == {"b", "d", "e"}
+
+
+def test_evicts_idle_buckets():
+    store = InMemoryRateLimitStore()
+    store.take([("old", 5, 1.0)], 0)
+    store.take([("new", 5, 1.0)], IDLE_SECONDS + 1)
+    assert list(store._buckets) == ["new"]
+
+
+def test_login_check_raises_429_with_retry_after():
+    limiter = LoginRateLimiter()
+    for _ in range(LOGIN_EMAIL_CAPACITY):
+        limiter.check("1.2.3.4", "Ana@Salao.pt")
+
+    with pytest.raises(HTTPException) as exc:
+        limiter.check("5.6.7.8", "  ana@salao.pt ")
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) > 0
+
+    limiter.reset_email("ana@salao.pt")
+    limiter.check("5.6.7.8", "ana@salao.pt")
@@ -0,0 +1,83 @@
+"""created_at_ts / completed_at_ts gravados na escrita e filtros de estatísticas (user-047)"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.appointment_service import appointment_service
+from app.database import JSONDatabase
+from app.salon_time import now_epoch, record_epoch, stamp_appointment, to_epoch
+from conftest import at, auth_headers
+
+
+@pytest.fixture
+def stats(tmp_path, monkeypatch):
+    """Router de estatísticas sobre um db próprio (o router não está montado em app.main)"""
+    from app.routes import statistics
+    database = JSONDatabase(str(tmp_path))
+    monkeypatch.setattr(statistics, "db", database)
+    app = FastAPI()
+    app.include_router(statistics.router, prefix="/stats")
+    return database, TestClient(app)
+
+
+def test_stamp_sets_created_at_ts():
+    record = stamp_appointment({"data_hora": "2030-01-10T10:00:00", "created_at": "2030-01-01T08:00:00"})
+    assert record["created_at_ts"] == to_epoch("2030-01-01T08:00:00")
+    assert record["data_hora_ts"] == to_epoch("2030-01-10T10:00:00")
+    # Um created_at_ts já gravado não é recalculado
+    assert stamp_appointment({"created_at": "2031-01-01", "created_at_ts": 5})["created_at_ts"] == 5
+
+
+def test_record_epoch_falls_back_for_old_records():
+    assert record_epoch({"created_at_ts": 7, "created_at": "2030-01-01"}, "created_at") == 7
+    assert record_epoch({"created_at": "2030-01-01T00:00:00"}, "created_at") == to_epoch("2030-01-01T00:00:00")
+    assert record_epoch({}, "created_at") is None
+
+
+def test_writes_store_the_write_instant(tmp_path, day):
+    # created_at é hora do servidor sem fuso: o _ts vem do instante da escrita,
+    # não da string (o servidor pode não estar no fuso do salão)
+    db = JSONDatabase(str(tmp_path))
+    before = now_epoch()
+    apt = db.create_appointment({"profissional_id": "1", "data_hora": at(day, 10).isoformat()})
+    assert before <= apt["created_at_ts"] <= now_epoch()
+
+    db.update_appointment_status(apt["id"], "concluido")
+    assert before <= db.get_appointment_by_id(apt["id"])["completed_at_ts"] <= now_epoch()
+
+    created = appointment_service.create({"profissional_id": "1", "data_hora": at(day, 12).isoformat(),
+                                          "total_duration": 30})
+    assert before <= created["created_at_ts"] <= now_epoch()
+    stored = db.get_appointment_by_id(apt["id"])
+    assert appointment_service.get(created["id"])["created_at_ts"] == created["created_at_ts"]
+    assert stored["created_at_ts"] == apt["created_at_ts"]
+
+
+def test_invalid_dates_return_400(stats, make_user):
+    _, client = stats
+    headers = auth_headers(make_user("admin"))
+    assert client.get("/stats/appointments", params={"start_date": "31/12/2030"}, headers=headers).status_code == 400
+    assert client.get("/stats/revenue", params={"end_date": "ontem"}, headers=headers).status_code == 400
+    assert client.get("/stats/appointments", params={"start_date": "2030-01-01"}, headers=headers).status_code == 200
+
+
+def test_date_filters_use_stored_epochs(stats, make_user):
+    database, client = stats
+    for day in ("2030-01-05", "2030-01-15", "2030-01-25"):
+        database.create_appointment({"profissional_id": "1", "data_hora": f"{day}T10:00:00"})
+
+    body = client.get("/stats/appointments", headers=auth_headers(make_user("admin")),
+                      params={"start_date": "2030-01-10", "end_date": "2030-01-20"}).json()
+    assert body["total"] == 1 and body["by_professional"] == {"1": 1}
+
+
+def test_overview_counts_this_month_from_created_at_ts(stats, make_user):
+    database, client = stats
+    database.create_appointment({"profissional_id": "1", "data_hora": "2030-01-05T10:00:00"})
+    database.create_appointments([{"id": "antigo", "profissional_id": "1",
+                                   "created_at": "2000-01-01T00:00:00", "created_at_ts": 946684800}])
+
+    body = client.get("/stats/overview", headers=auth_headers(make_user("admin"))).json()
+    assert body["appointments"]["total"] == 2
+    assert body["appointments"]["this_month"] == 1
@@ -0,0 +1,97 @@
+"""Agendamentos recorrentes expandidos na consulta (user-040)"""
+
+from datetime import date, timedelta
+
+from app.availability import availability_index
+from app.recurrence import expand, occurrence_id, recurrence_rules, split_occurrence_id
+from conftest import at, auth_headers
+
+RECURRING_URL = "/api/v1/appointments/recurring"
+
+
+def _rule(**fields):
+    return {"id": "R1", "profissional_id": "1", "total_duration": 60,
+            "dtstart": "2030-01-31T10:00:00", "freq": "weekly", "interval": 1, **fields}
+
+
+def _days(occurrences):
+    return [o["data_hora"][:10] for o in occurrences]
+
+
+def test_weekly_expansion_with_interval_and_count():
+    rule = _rule(interval=2, count=3)
+    assert _days(expand(rule, date(2030, 1, 1), date(2030, 12, 31))) == [
+        "2030-01-31", "2030-02-14", "2030-02-28"
+    ]
+    # Janela a meio da série: só as datas dentro dela
+    assert _days(expand(rule, date(2030, 2, 10), date(2030, 2, 20))) == ["2030-02-14"]
+
+
+def test_monthly_skips_months_without_the_day():
+    rule = _rule(freq="monthly", until="2030-05-31")
+    assert _days(expand(rule, date(2030, 1, 1), date(2030, 12, 31))) == [
+        "2030-01-31", "2030-03-31", "2030-05-31"
+    ]
+
+
+def test_exceptions_cancel_and_move_occurrences():
+    rule = _rule(freq="daily", count=3, exceptions={
+        "2030-02-01": {"status": "cancelado"},
+        "2030-02-02": {"data_hora": "2030-02-05T15:00:00"},
+    })
+    occurrences = expand(rule, date(2030, 1, 1), date(2030, 2, 28))
+    assert [o["data_hora"] for o in occurrences] == ["2030-01-31T10:00:00", "2030-02-05T15:00:00"]
+    assert occurrences[1]["id"] == occurrence_id("R1", date(2030, 2, 2))
+
+
+def test_split_occurrence_id():
+    assert split_occurrence_id("R1@2030-02-02") == ("R1", "2030-02-02")
+    assert split_occurrence_id("APT-1") is None
+
+
+def test_rule_occupies_the_calendar_and_move_frees_it(client, make_user, day):
+    owner = make_user()
+    response = client.post(RECURRING_URL, headers=auth_headers(owner), json={
+        "appointment_date": day.isoformat(), "appointment_time": "18:30", "freq": "weekly",
+        "count": 2, "servico": "tratamentos", "duration": 30, "professional_id": "3",
+    })
+    assert response.status_code == 200
+    rule = response.json()["rule"]
+    next_week = day + timedelta(days=7)
+    assert availability_index.find_conflict("3", at(next_week, 18, 30), 30) is not None
+
+    moved = client.post(f"{RECURRING_URL}/{rule['id']}/move", headers=auth_headers(owner), json={
+        "date": next_week.isoformat(), "new_date": next_week.isoformat(), "new_time": "17:00",
+    })
+    assert moved.status_code == 200
+    assert availability_index.find_conflict("3", at(next_week, 18, 30), 30) is None
+    assert availability_index.find_conflict("3", at(next_week, 17), 30) is not None
+
+    # Uma regra nova sobre a primeira ocorrência é recusada
+    clash = client.post(RECURRING_URL, headers=auth_headers(make_user()), json={
+        "appointment_date": day.isoformat(), "appointment_time": "18:30", "freq": "daily",
+        "count": 1, "servico": "tratamentos", "duration": 30, "professional_id": "3",
+    })
+    assert clash.status_code == 409
+
+
+def test_rules_are_private_to_their_owner(client, make_user, day):
+    owner, other, admin = make_user(), make_user(), make_user("admin")
+    rule = client.post(RECURRING_URL, headers=auth_headers(owner), json={
+        "appointment_date": day.isoformat(), "appointment_time": "18:30", "freq": "daily",
+        "count": 1, "servico": "manicure", "duration": 30, "professional_id": "5",
+    }).json()["rule"]
+
+    assert rule["id"] not in [r["id"] for r in client.get(RECURRING_URL, headers=auth_headers(other)).json()["rules"]]
+    assert client.delete(f"{RECURRING_URL}/{rule['id']}", headers=auth_headers(other)).status_code == 404
+    assert client.delete(f"{RECURRING_URL}/{rule['id']}", headers=auth_headers(admin)).status_code == 200
+    assert recurrence_rules.get(rule["id"])["status"] == "terminado"
+
+
+def test_invalid_rules_are_rejected(client, make_user, day):
+    headers = auth_headers(make_user())
+    base = {"appointment_date": day.isoformat(), "appointment_time": "10:00", "duration": 30,
+            "servico": "manicure", "professional_id": "4"}
+    assert client.post(RECURRING_URL, headers=headers, json={**base, "freq": "yearly"}).status_code == 400
+    assert client.post(RECURRING_URL, headers=headers, json={**base, "freq": "daily", "count": 0}).status_code == 400
+    assert client.post(RECURRING_URL, json={**base, "freq": "daily"}).status_code == 401
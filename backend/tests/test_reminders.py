@@ -0,0 +1,216 @@
+"""Lembretes na roda temporal e eleição do worker que envia (user-049)"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.database import JSONDatabase
+from app.reminders import ReminderScheduler, ReminderSender
+from app.salon_time import local_iso, now_epoch
+from app.timing_wheel import TimingWheel
+
+DAY = 24 * 3600
+
+
+class RecordingSender(ReminderSender):
+    """Guarda os lotes; falha as primeiras `failures` chamadas"""
+
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+
+    def send_batch(self, messages):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("SMTP em baixo")
+        self.batches.append(list(messages))
+        return len(messages)
+
+    @property
+    def messages(self):
+        return [m for batch in self.batches for m in batch]
+
+
+def _features(email=True, sms=False):
+    return SimpleNamespace(email_notifications_enabled=email, sms_notifications_enabled=sms)
+
+
+def _scheduler(db, senders, **features):
+    service = SimpleNamespace(get=db.get_appointment_by_id)
+    return ReminderScheduler(db, service=service, senders=senders, features=_features(**features))
+
+
+@pytest.fixture
+def salon(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    client = db.create_user({"nome": "Ana", "email": "ana@example.com", "telefone": "910000000"})
+    # Daqui a 3 dias, alinhado ao minuto
+    start = (now_epoch() // 60 + 3 * 24 * 60) * 60
+    return db, client, start
+
+
+def _book(db, start, cliente_id=None, **fields):
+    return db.create_appointment({"profissional_id": "1", "data_hora": local_iso(start),
+                                  "total_duration": 60, "cliente_id": cliente_id, **fields})
+
+
+# ====================================================================
+# RODA TEMPORAL
+# ====================================================================
+
+def test_wheel_fires_in_order_and_cascades():
+    wheel = TimingWheel(0, 60)
+    wheel.schedule("tarde", 5 * 3600, "b")
+    wheel.schedule("cedo", 120, "a")
+    wheel.schedule("longe", 40 * DAY, "c")
+    assert len(wheel) == 3 and "longe" in wheel
+
+    assert wheel.advance(60) == []
+    assert wheel.advance(180) == [("cedo", "a")]
+    assert wheel.advance(5 * 3600) == [("tarde", "b")]
+    assert wheel.advance(40 * DAY) == [("longe", "c")]
+    assert len(wheel) == 0
+
+
+def test_wheel_cancel_and_reschedule():
+    wheel = TimingWheel(0, 60)
+    wheel.schedule("a", 600)
+    wheel.schedule("b", 600)
+    assert wheel.cancel("a") and not wheel.cancel("a")
+    # Reagendar deixa a entrada antiga sem efeito
+    wheel.schedule("b", 1200, "nova")
+    assert wheel.advance(900) == []
+    assert wheel.advance(1200) == [("b", "nova")]
+
+
+def test_wheel_overdue_fires_on_next_advance():
+    wheel = TimingWheel(3600, 60)
+    wheel.schedule("atrasado", 60)
+    assert wheel.advance(3600) == [("atrasado", None)]
+
+
+# ====================================================================
+# AGENDADOR
+# ====================================================================
+
+def test_due_reminders_are_sent_once(salon):
+    db, client, start = salon
+    email = RecordingSender()
+    scheduler = _scheduler(db, {"email": email})
+    appointment = _book(db, start, client["id"])
+    scheduler.load()
+    assert len(scheduler) == 2
+
+    assert scheduler.run_due(start - DAY - 60) == 0
+    assert scheduler.run_due(start - DAY) == 1
+    message = email.messages[0]
+    assert message["to"] == "ana@example.com"
+    assert message["appointment_id"] == appointment["id"]
+    assert message["key"].endswith(":24h:%d:email" % start)
+
+    assert scheduler.run_due(start - 2 * 3600) == 1
+    assert [r["label"] for r in db._read_file("reminders")] == ["24h", "2h"]
+
+    # Um reinício não volta a enviar o que já está em reminders.json
+    restarted = _scheduler(db, {"email": email})
+    restarted.load(start - DAY)
+    assert len(restarted) == 0
+
+
+def test_disabled_channel_does_not_send(salon):
+    db, client, start = salon
+    email, sms = RecordingSender(), RecordingSender()
+    scheduler = _scheduler(db, {"email": email, "sms": sms}, email=False, sms=True)
+    _book(db, start, client["id"])
+    scheduler.load()
+
+    assert scheduler.run_due(start - DAY) == 1
+    assert email.messages == []
+    assert sms.messages[0]["to"] == "910000000"
+
+
+def test_cancel_and_reschedule_update_the_wheel(salon):
+    db, client, start = salon
+    email = RecordingSender()
+    scheduler = _scheduler(db, {"email": email})
+    scheduler.load()
+
+    cancelled = _book(db, start, client["id"])
+    moved = _book(db, start, client["id"])
+    assert len(scheduler) == 4
+
+    db.update_appointment_status(cancelled["id"], "cancelado")
+    db.update_appointment(moved["id"], {"data_hora": local_iso(start + DAY)})
+    assert len(scheduler) == 2
+
+    assert scheduler.run_due(start - 2 * 3600) == 0
+    assert scheduler.run_due(start) == 1
+    assert email.messages[0]["appointment_id"] == moved["id"]
+
+
+def test_recurring_and_anonymous_bookings_get_no_reminder(salon):
+    db, client, start = salon
+    email = RecordingSender()
+    scheduler = _scheduler(db, {"email": email})
+    _book(db, start, client["id"], recurring=True)
+    _book(db, start)
+    scheduler.load()
+    assert len(scheduler) == 2
+
+    assert scheduler.run_due(start - DAY) == 0
+    assert scheduler.stats["skipped"] == 1
+    assert email.messages == []
+
+
+def test_failed_batch_retries_only_failed_channel(salon):
+    db, client, start = salon
+    email, sms = RecordingSender(failures=1), RecordingSender()
+    scheduler = _scheduler(db, {"email": email, "sms": sms}, email=True, sms=True)
+    _book(db, start, client["id"])
+    scheduler.load()
+
+    assert scheduler.run_due(start - DAY) == 1
+    assert scheduler.stats["failed"] == 1
+    assert len(sms.messages) == 1 and email.messages == []
+    assert db._read_file("reminders") == []
+
+    assert scheduler.run_due(start - DAY + 60) == 1
+    assert len(sms.messages) == 1 and len(email.messages) == 1
+    record = db._read_file("reminders")[0]
+    assert sorted(record["channels"]) == ["email", "sms"]
+
+
+def test_reloads_after_write_from_another_worker(salon, tmp_path):
+    db, client, start = salon
+    email = RecordingSender()
+    scheduler = _scheduler(db, {"email": email})
+    scheduler.load()
+    assert len(scheduler) == 0
+
+    # Outro worker (outra instância do db): o observador não é chamado
+    other = JSONDatabase(str(tmp_path))
+    _book(other, start, client["id"])
+    assert len(scheduler) == 0
+
+    assert scheduler.run_due(start - DAY) == 1
+
+
+def test_only_one_scheduler_owns_the_lock(salon, tmp_path):
+    db, _, _ = salon
+    first = _scheduler(db, {})
+    second = _scheduler(JSONDatabase(str(tmp_path)), {})
+    try:
+        assert first.acquire_owner()
+        assert first.acquire_owner()
+        assert not second.acquire_owner()
+        assert os.path.exists(os.path.join(str(tmp_path), "reminders.lock"))
+
+        # O dono morreu: o lock fica livre para outro worker
+        first._owner_file.close()
+        first._owner_file = None
+        assert second.acquire_owner()
+    finally:
+        for scheduler in (first, second):
+            if scheduler._owner_file is not None:
+                scheduler._owner_file.close()
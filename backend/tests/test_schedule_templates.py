@@ -0,0 +1,84 @@
+"""Horários de funcionamento por profissional (user-036)"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app.database import JSONDatabase
+from app.schedule_templates import ScheduleTemplates, intervals_mask, parse_hhmm
+from app.slot_calendar import span_mask
+from conftest import auth_headers
+
+MONDAY = date(2030, 1, 7)
+
+
+@pytest.fixture
+def templates(tmp_path):
+    return ScheduleTemplates(JSONDatabase(str(tmp_path)))
+
+
+def test_parse_hhmm():
+    assert parse_hhmm("09:30") == 570
+    assert parse_hhmm("24:00") == 1440
+    with pytest.raises(ValueError):
+        parse_hhmm("25:00")
+    with pytest.raises(ValueError):
+        parse_hhmm("10:75")
+
+
+def test_default_template_opens_nine_to_seven(templates):
+    assert templates.open_mask("1", MONDAY) == span_mask(9 * 60, 19 * 60)
+    assert templates.open_mask(None, MONDAY + timedelta(days=6)) == span_mask(9 * 60, 19 * 60)
+
+
+def test_professional_template_with_breaks_and_closed_days(templates):
+    templates.save_template("1", {
+        "weekly": {"0": [["10:00", "18:00"]]},
+        "breaks": [["13:00", "14:00"]],
+    })
+    assert templates.open_mask("1", MONDAY) == span_mask(600, 780) | span_mask(840, 1080)
+    # Terça não está no weekly: fechado
+    assert templates.open_mask("1", MONDAY + timedelta(days=1)) == 0
+    # Os outros profissionais continuam no default
+    assert templates.open_mask("2", MONDAY) == span_mask(540, 1140)
+
+
+def test_holidays_and_exceptions(templates):
+    templates.save_template("default", {
+        "holidays": [MONDAY.isoformat()],
+        "exceptions": {(MONDAY + timedelta(days=1)).isoformat(): [["09:00", "13:00"]]},
+    })
+    templates.save_template("2", {"exceptions": {MONDAY.isoformat(): [["15:00", "16:00"]]}})
+
+    assert templates.open_mask("1", MONDAY) == 0
+    # A exceção do profissional sobrepõe-se ao feriado do salão
+    assert templates.open_mask("2", MONDAY) == intervals_mask([["15:00", "16:00"]])
+    assert templates.open_mask("1", MONDAY + timedelta(days=1)) == span_mask(540, 780)
+
+
+def test_delete_template_restores_default(templates):
+    templates.save_template("3", {"weekly": {}})
+    assert templates.open_mask("3", MONDAY) == 0
+    assert templates.delete_template("3")
+    assert templates.open_mask("3", MONDAY) == span_mask(540, 1140)
+    assert not templates.delete_template("3")
+
+
+def test_invalid_template_is_rejected(templates):
+    with pytest.raises(ValueError):
+        templates.save_template("1", {"weekly": {"7": [["09:00", "10:00"]]}})
+    with pytest.raises(ValueError):
+        templates.save_template("1", {"holidays": ["amanhã"]})
+
+
+def test_admin_endpoints(client, make_user):
+    url = "/api/v1/admin/schedule-templates/99"
+    admin = auth_headers(make_user("admin"))
+
+    assert client.put(url, json={"weekly": {"0": [["09:00", "12:00"]]}},
+                      headers=auth_headers(make_user("cliente"))).status_code == 403
+    assert client.put(url, json={"breaks": [["13:00", "99:00"]]}, headers=admin).status_code == 400
+    assert client.put(url, json={"weekly": {"0": [["09:00", "12:00"]]}}, headers=admin).status_code == 200
+    assert "99" in [t["id"] for t in client.get("/api/v1/admin/schedule-templates", headers=admin).json()]
+    assert client.delete(url, headers=admin).status_code == 200
+    assert client.delete(url, headers=admin).status_code == 404
@@ -0,0 +1,73 @@
+"""Dias em bitsets de 15 minutos e intervalos que passam da meia-noite (user-033)"""
+
+from datetime import datetime, timedelta
+
+from app.availability import AvailabilityIndex, DayIntervals, day_pieces
+from app.database import JSONDatabase
+from app.slot_calendar import (
+    FULL_DAY_MASK, QUANTA_PER_DAY, duration_to_quanta, fits_mask, free_starts, grid_mask,
+    mask_to_times, span_mask, time_mask
+)
+from conftest import at
+
+
+def test_span_mask_rounds_outwards():
+    assert span_mask(0, 15) == 0b1
+    assert span_mask(10, 20) == 0b11
+    assert span_mask(60, 60) == 0
+    assert span_mask(23 * 60, 25 * 60).bit_length() == QUANTA_PER_DAY
+
+
+def test_duration_to_quanta_rounds_up():
+    assert duration_to_quanta(15) == 1
+    assert duration_to_quanta(20) == 2
+    assert duration_to_quanta(0) == 1
+
+
+def test_fits_mask_requires_consecutive_free_quanta():
+    free = 0b1110111
+    assert fits_mask(free, 3) == 0b0010001
+    assert fits_mask(free, 4) == 0
+    assert fits_mask(FULL_DAY_MASK, 6) == (1 << (QUANTA_PER_DAY - 5)) - 1
+
+
+def test_free_starts_respects_busy_open_and_grid():
+    open_mask = span_mask(9 * 60, 12 * 60)
+    busy = time_mask(datetime(2030, 1, 1, 10), 60)
+    starts = free_starts(busy, open_mask, 60, grid_mask(30))
+    assert mask_to_times(starts) == ["09:00", "11:00"]
+
+
+def test_day_intervals_busy_mask_and_counter():
+    day = DayIntervals()
+    day.add(600, 645, "a")
+    day.add(900, 960, "b")
+    assert day.busy_mask == span_mask(600, 645) | span_mask(900, 960)
+    assert day.booked_minutes == 105
+    day.remove("a")
+    assert day.busy_mask == span_mask(900, 960)
+
+
+def test_day_pieces_split_at_midnight():
+    start = datetime(2030, 3, 1, 23)
+    assert day_pieces(start, 120) == [("2030-03-01", 1380, 1440), ("2030-03-02", 0, 60)]
+    assert day_pieces(start, 60) == [("2030-03-01", 1380, 1440)]
+    assert day_pieces(datetime(2030, 3, 1, 22), 27 * 60)[-1] == ("2030-03-03", 0, 60)
+
+
+def test_overnight_appointment_blocks_next_morning(tmp_path, day):
+    db = JSONDatabase(str(tmp_path))
+    index = AvailabilityIndex(db)
+    apt = db.create_appointment({
+        "profissional_id": "1", "data_hora": at(day, 23).isoformat(), "total_duration": 120
+    })
+
+    next_day = day + timedelta(days=1)
+    assert index.find_conflict("1", at(next_day, 0, 30), 30) == "00:00 - 01:00"
+    assert index.find_conflict("1", at(next_day, 1), 30) is None
+    assert index.busy_mask("1", next_day.isoformat()) == span_mask(0, 60)
+    # Um novo agendamento na véspera que entra no dia seguinte também colide
+    assert index.find_conflict("1", at(day, 22), 150) is not None
+
+    db.update_appointment_status(apt["id"], "cancelado")
+    assert index.busy_mask("1", next_day.isoformat()) == 0
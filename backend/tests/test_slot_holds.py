@@ -0,0 +1,110 @@
+"""Reservas temporárias e gravação compare-and-set (user-034)"""
+
+import pytest
+
+from app.appointment_service import appointment_service
+from app.availability import AvailabilityIndex
+from app.booking_holds import HoldNotFoundError, SlotHoldRegistry, SlotUnavailableError
+from app.database import JSONDatabase
+from conftest import at
+
+HOLD_URL = "/api/v1/appointments/hold"
+SCHEDULE_URL = "/api/v1/appointments/schedule"
+
+
+@pytest.fixture
+def registry(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    return db, SlotHoldRegistry(AvailabilityIndex(db))
+
+
+def _persist(db, professional_id, start, duration=60):
+    return lambda: db.create_appointment({
+        "profissional_id": professional_id, "data_hora": start.isoformat(), "total_duration": duration
+    })
+
+
+def test_hold_blocks_overlapping_hold(registry, day):
+    _, holds = registry
+    holds.place_hold("1", at(day, 10), 60)
+    with pytest.raises(SlotUnavailableError):
+        holds.place_hold("1", at(day, 10, 30), 60)
+    holds.place_hold("2", at(day, 10, 30), 60)
+    holds.place_hold("1", at(day, 11), 60)
+
+
+def test_commit_with_hold_drops_it(registry, day):
+    db, holds = registry
+    hold = holds.place_hold("1", at(day, 10), 60)
+    holds.commit("1", at(day, 10), 60, _persist(db, "1", at(day, 10)), hold_id=hold["hold_id"])
+
+    assert holds.get(hold["hold_id"]) is None
+    assert holds.version("1") == 1
+    with pytest.raises(SlotUnavailableError):
+        holds.place_hold("1", at(day, 10), 30)
+
+
+def test_commit_without_hold_respects_other_holds(registry, day):
+    db, holds = registry
+    holds.place_hold("1", at(day, 10), 60)
+    with pytest.raises(SlotUnavailableError):
+        holds.commit("1", at(day, 10), 60, _persist(db, "1", at(day, 10)))
+    assert db.get_all_appointments() == []
+
+
+def test_commit_rejects_unknown_or_mismatched_hold(registry, day):
+    db, holds = registry
+    hold = holds.place_hold("1", at(day, 10), 30)
+    with pytest.raises(HoldNotFoundError):
+        holds.commit("1", at(day, 10), 60, _persist(db, "1", at(day, 10)), hold_id=hold["hold_id"])
+    with pytest.raises(HoldNotFoundError):
+        holds.commit("1", at(day, 10), 30, _persist(db, "1", at(day, 10)), hold_id="HOLD-X")
+
+
+def test_stale_hold_revalidates_against_new_appointments(registry, day):
+    db, holds = registry
+    hold = holds.place_hold("1", at(day, 10), 60)
+    # Outro worker grava um agendamento sobreposto: a versão do calendário avança
+    db.create_appointment({"profissional_id": "1", "data_hora": at(day, 10, 30).isoformat(),
+                           "total_duration": 30})
+    holds._bump("1")
+    with pytest.raises(SlotUnavailableError):
+        holds.commit("1", at(day, 10), 60, _persist(db, "1", at(day, 10)), hold_id=hold["hold_id"])
+
+
+def test_expired_hold_is_purged(tmp_path, day):
+    db = JSONDatabase(str(tmp_path))
+    holds = SlotHoldRegistry(AvailabilityIndex(db), ttl_seconds=0)
+    hold = holds.place_hold("1", at(day, 10), 60)
+    assert holds.get(hold["hold_id"]) is None
+    holds.place_hold("1", at(day, 10), 60)
+
+
+def test_hold_then_schedule_endpoint(client, day):
+    slot = {"booking_code": "BOOK-HOLD", "appointment_date": day.isoformat(), "appointment_time": "12:00"}
+    hold = client.post(HOLD_URL, json={**slot, "professional_id": "2"})
+    assert hold.status_code == 200
+    assert client.post(HOLD_URL, json={**slot, "professional_id": "2"}).status_code == 409
+
+    scheduled = client.post(SCHEDULE_URL, json={**slot, "hold_id": hold.json()["hold_id"]})
+    assert scheduled.status_code == 200
+    assert scheduled.json()["professional_id"] == "2"
+
+    # A reserva foi consumida
+    again = client.post(SCHEDULE_URL, json={**slot, "hold_id": hold.json()["hold_id"]})
+    assert again.status_code in (409, 410)
+    assert client.delete(f"{HOLD_URL}/{hold.json()['hold_id']}").status_code == 404
+
+
+def test_reschedule_goes_through_conflict_check(day):
+    first = appointment_service.create({"profissional_id": "3", "data_hora": at(day, 10).isoformat(),
+                                        "total_duration": 60})
+    second = appointment_service.create({"profissional_id": "3", "data_hora": at(day, 12).isoformat(),
+                                         "total_duration": 60})
+
+    with pytest.raises(SlotUnavailableError):
+        appointment_service.update(second["id"], {"data_hora": at(day, 10, 30).isoformat()})
+
+    # Mover para um horário que só se sobrepõe a si próprio é permitido
+    moved = appointment_service.update(first["id"], {"data_hora": at(day, 10, 30).isoformat()})
+    assert moved["data_hora"].startswith(at(day, 10, 30).isoformat())
@@ -0,0 +1,51 @@
+"""Pesquisa de horários livres entre profissionais e dias (user-032)"""
+
+from app.availability import professional_offers
+from app.database import db
+from conftest import at, auth_headers
+
+SEARCH_URL = "/api/v1/appointments/search"
+
+
+def test_professional_offers_matches_whole_words():
+    professional = {"especialidades": ["hidratação profunda", "luzes", "corte feminino"]}
+    assert professional_offers(professional, "Hidratacao")
+    assert professional_offers(professional, "corte feminino com mechas") is True
+    assert not professional_offers(professional, "luz")
+    assert professional_offers(professional, None)
+    assert not professional_offers({"especialidades": [""]}, "mechas")
+
+
+def test_search_returns_earliest_free_slots(client, make_user, day):
+    db.create_appointment({"profissional_id": "1", "data_hora": at(day, 9).isoformat(), "total_duration": 60})
+
+    response = client.get(SEARCH_URL, headers=auth_headers(make_user()), params={
+        "data_inicio": day.isoformat(), "data_fim": day.isoformat(),
+        "servico": "mechas", "duracao": 60, "limite": 3,
+    })
+
+    assert response.status_code == 200
+    results = response.json()["resultados"]
+    # Só a Maria faz mechas; às 09:00 já está ocupada
+    assert {r["profissional_id"] for r in results} == {"1"}
+    assert [r["inicio"][11:16] for r in results] == ["10:00", "10:30", "11:00"]
+
+
+def test_search_across_professionals_is_chronological(client, make_user, day):
+    response = client.get(SEARCH_URL, headers=auth_headers(make_user()), params={
+        "data_inicio": day.isoformat(), "data_fim": day.isoformat(),
+        "tipo_servico": "unha", "duracao": 30, "limite": 4,
+    })
+
+    results = response.json()["resultados"]
+    assert len(results) == 4
+    assert [r["inicio"] for r in results] == sorted(r["inicio"] for r in results)
+    assert {r["profissional_id"] for r in results} <= {"4", "5"}
+
+
+def test_search_rejects_invalid_range(client, make_user, day):
+    headers = auth_headers(make_user())
+    params = {"data_inicio": day.isoformat(), "data_fim": "2000-01-01"}
+    assert client.get(SEARCH_URL, headers=headers, params=params).status_code == 400
+    assert client.get(SEARCH_URL, headers=headers, params={"data_inicio": "ontem"}).status_code == 400
+    assert client.get(SEARCH_URL, params={"data_inicio": day.isoformat()}).status_code == 401
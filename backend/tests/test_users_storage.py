@@ -0,0 +1,95 @@
+"""Email único e escrita por append em users.json (user-030)"""
+
+import json
+import multiprocessing
+import threading
+import uuid
+
+import pytest
+
+from app.database import DuplicateEmailError, JSONDatabase, normalize_email
+
+
+def _register(data_dir: str, email: str, results):
+    try:
+        JSONDatabase(data_dir).create_user({"email": email, "nome": "Concorrente"})
+        results.put("ok")
+    except DuplicateEmailError:
+        results.put("duplicado")
+
+
+def test_normalize_email():
+    assert normalize_email("  Ana@Example.COM ") == "ana@example.com"
+    assert normalize_email(None) == ""
+
+
+def test_duplicate_email_is_case_insensitive(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    created = db.create_user({"email": "Ana@Example.com", "nome": "Ana"})
+    with pytest.raises(DuplicateEmailError):
+        db.create_user({"email": " ana@EXAMPLE.com", "nome": "Outra"})
+    assert db.get_user_by_email("ANA@example.com")["id"] == created["id"]
+
+
+def test_append_keeps_file_valid_json(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    for i in range(3):
+        db.create_user({"email": f"u{i}@example.com", "nome": f"U{i}"})
+    with open(db.files["users"], encoding="utf-8") as f:
+        users = json.load(f)
+    assert [u["email"] for u in users] == ["u0@example.com", "u1@example.com", "u2@example.com"]
+
+
+def test_append_record_accepts_list(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    db._append_record("waitlist", [{"id": "a"}])
+    db._append_record("waitlist", [{"id": "b"}, {"id": "c"}])
+    db._append_record("waitlist", [])
+    assert [r["id"] for r in db._read_file("waitlist")] == ["a", "b", "c"]
+
+
+def test_concurrent_threads_register_email_once(tmp_path):
+    db = JSONDatabase(str(tmp_path))
+    outcomes = []
+
+    def register():
+        try:
+            db.create_user({"email": "mesmo@example.com", "nome": "Thread"})
+            outcomes.append("ok")
+        except DuplicateEmailError:
+            outcomes.append("duplicado")
+
+    threads = [threading.Thread(target=register) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert outcomes.count("ok") == 1
+    assert len(db._read_file("users")) == 1
+
+
+def test_concurrent_processes_register_email_once(tmp_path):
+    # Cada processo tem a sua instância (como os workers do uvicorn)
+    data_dir = str(tmp_path)
+    JSONDatabase(data_dir)
+    email = f"{uuid.uuid4().hex[:8]}@example.com"
+
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_register, args=(data_dir, email, results)) for _ in range(6)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(timeout=30)
+
+    outcomes = [results.get(timeout=5) for _ in workers]
+    assert outcomes.count("ok") == 1
+    assert len(JSONDatabase(data_dir)._read_file("users")) == 1
+
+
+def test_register_endpoint_returns_conflict(client):
+    payload = {"email": f"Dup-{uuid.uuid4().hex[:6]}@Example.com", "nome": "Dup", "senha": "segredo1"}
+    assert client.post("/api/v1/auth/register", json=payload).status_code == 201
+    payload["email"] = payload["email"].lower()
+    assert client.post("/api/v1/auth/register", json=payload).status_code == 409
@@ -0,0 +1,78 @@
+"""Lista de espera com oferta automática no cancelamento (user-039)"""
+
+from app.appointment_service import appointment_service
+from app.booking_holds import slot_holds
+from app.waitlist import STATUS_ACCEPTED, STATUS_OFFERED, STATUS_WAITING, waitlist
+from conftest import at, auth_headers
+
+WAITLIST_URL = "/api/v1/appointments/waitlist"
+
+
+def _join(client, user, day, **fields):
+    payload = {
+        "servico": "barba", "duration": 60,
+        "window_start": at(day, 14).isoformat(), "window_end": at(day, 18).isoformat(),
+        **fields,
+    }
+    return client.post(WAITLIST_URL, json=payload, headers=auth_headers(user))
+
+
+def test_join_requires_authentication(client, day):
+    assert client.post(WAITLIST_URL, json={
+        "servico": "barba", "duration": 60,
+        "window_start": at(day, 14).isoformat(), "window_end": at(day, 18).isoformat(),
+    }).status_code == 401
+
+
+def test_join_validates_window(client, make_user, day):
+    user = make_user()
+    assert _join(client, user, day, window_end=at(day, 13).isoformat()).status_code == 400
+    assert _join(client, user, day, servico=None, duration=None).status_code == 400
+
+
+def test_cancellation_offers_slot_and_booking_accepts_it(client, make_user, day):
+    customer, admin = make_user(), make_user("admin")
+    apt = appointment_service.create({"profissional_id": "2", "data_hora": at(day, 15).isoformat(),
+                                      "total_duration": 60})
+    entry = _join(client, customer, day).json()
+    assert entry["status"] == STATUS_WAITING
+
+    assert client.delete(f"/api/v1/appointments/{apt['id']}", headers=auth_headers(admin)).status_code == 200
+
+    offered = waitlist.get(entry["id"])
+    assert offered["status"] == STATUS_OFFERED
+    offer = offered["offer"]
+    assert offer["professional_id"] == "2" and offer["start"] == at(day, 15).isoformat()
+    assert slot_holds.get(offer["hold_id"]) is not None
+
+    scheduled = client.post("/api/v1/appointments/schedule", headers=auth_headers(customer), json={
+        "booking_code": offered["booking_code"], "appointment_date": day.isoformat(),
+        "appointment_time": "15:00", "hold_id": offer["hold_id"],
+    })
+    assert scheduled.status_code == 200
+    assert waitlist.get(entry["id"])["status"] == STATUS_ACCEPTED
+
+
+def test_offer_ignores_entries_outside_window(make_user, day):
+    entry = waitlist.join(make_user()["id"], "barba", 60, at(day, 9), at(day, 11))
+    apt = appointment_service.create({"profissional_id": "2", "data_hora": at(day, 16).isoformat(),
+                                      "total_duration": 60})
+    appointment_service.cancel(apt["id"])
+    assert waitlist.get(entry["id"])["status"] == STATUS_WAITING
+
+
+def test_clients_only_see_and_remove_their_own_entries(client, make_user, day):
+    owner, other, admin = make_user(), make_user(), make_user("admin")
+    entry = _join(client, owner, day, window_start=at(day, 9).isoformat(),
+                  window_end=at(day, 10).isoformat()).json()
+
+    listed = client.get(WAITLIST_URL, headers=auth_headers(other),
+                        params={"usuario_id": owner["id"]}).json()
+    assert entry["id"] not in [e["id"] for e in listed["entries"]]
+    admin_view = client.get(WAITLIST_URL, headers=auth_headers(admin),
+                            params={"usuario_id": owner["id"]}).json()
+    assert [e["id"] for e in admin_view["entries"]] == [entry["id"]]
+
+    assert client.delete(f"{WAITLIST_URL}/{entry['id']}", headers=auth_headers(other)).status_code == 404
+    assert client.delete(f"{WAITLIST_URL}/{entry['id']}", headers=auth_headers(owner)).status_code == 200
+    assert waitlist.get(entry["id"]) is None